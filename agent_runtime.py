@@ -0,0 +1,122 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+
+
+def _model_config_key(llm) -> tuple:
+    """A hashable fingerprint of the model settings that affect the compiled agent."""
+    params = getattr(llm, "_identifying_params", {}) or {}
+    return (type(llm).__name__,) + tuple(sorted((k, repr(v)) for k, v in params.items()))
+
+
+class AgentRuntime:
+    """
+    Long-lived holder for the compiled tool-calling agent and its AgentExecutor.
+
+    The agent is compiled once per (tool set, model config) and shared by every
+    session; `AgentExecutor.invoke` keeps no per-call state on the executor, so the
+    same instance can serve concurrent turns. Call `rebuild()` after changing tools
+    or the model.
+
+    Turns run on the executor's async path, where all tool calls the model emits in one
+    step are started together (`asyncio.gather`) and their results returned in the
+    original order. Tools without native async support run on `tool_pool`, a thread pool
+    bounded by `tool_concurrency` and shared by every turn.
+    """
+
+    def __init__(self, llm, tools, prompt, verbose=True, tool_concurrency=None):
+        self._llm = llm
+        self._tools = list(tools)
+        self._prompt = prompt
+        self._verbose = verbose
+        self._lock = threading.Lock()
+        self._executors = {}
+        self._loop = None
+        self.tool_pool = ThreadPoolExecutor(
+            max_workers=tool_concurrency or int(os.getenv("AGENT_TOOL_CONCURRENCY", "8")),
+            thread_name_prefix="agent-tool",
+        )
+
+    @property
+    def llm(self):
+        return self._llm
+
+    @property
+    def tools(self):
+        return list(self._tools)
+
+    def _key(self, tools) -> tuple:
+        return (tuple(t.name for t in tools), _model_config_key(self._llm))
+
+    def _compile(self, tools) -> AgentExecutor:
+        agent = create_tool_calling_agent(llm=self._llm, tools=tools, prompt=self._prompt)
+        return AgentExecutor(agent=agent, tools=tools, verbose=self._verbose)
+
+    def get_executor(self, tools=None) -> AgentExecutor:
+        """Return the compiled executor for `tools` (default: the full tool set), compiling it on first use."""
+        tools = list(tools) if tools is not None else self._tools
+        key = self._key(tools)
+        executor = self._executors.get(key)
+        if executor is not None:
+            return executor
+        with self._lock:
+            executor = self._executors.get(key)
+            if executor is None:
+                executor = self._compile(tools)
+                self._executors[key] = executor
+            return executor
+
+    def rebuild(self, tools=None, llm=None, prompt=None) -> AgentExecutor:
+        """Swap in new tools/model/prompt, drop every compiled executor and compile the default one."""
+        with self._lock:
+            if tools is not None:
+                self._tools = list(tools)
+            if llm is not None:
+                self._llm = llm
+            if prompt is not None:
+                self._prompt = prompt
+            self._executors = {}
+        return self.get_executor()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """The runtime's background event loop, started on first use; async agent runs execute on it."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(self.tool_pool)  # sync tools run here via run_in_executor
+                threading.Thread(target=loop.run_forever, name="agent-runtime-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """Run a coroutine on the runtime loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self._event_loop()).result()
+
+    def iterate(self, agen):
+        """Consume an async generator on the runtime loop, yielding its items to synchronous code as they arrive."""
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((done, e))
+                raise
+            items.put((done, None))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._event_loop())
+        try:
+            while True:
+                item, error = items.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
@@ -8,10 +8,11 @@ from langchain.agents import create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_experimental.tools.python.tool import PythonREPLTool
 from langchain.tools import tool
-from gmail_tools import send_gmail, read_gmail
+from gmail_tools import send_gmail, read_gmail, send_bulk_gmail
 from calender_tools import create_calendar_event, list_calendar_events, delete_calendar_event, update_calendar_event, schedule_google_meet_event
 from gdrive_tools import upload_drive_file, download_drive_file, list_drive_files
 from image_generation_tools import generate_image_from_prompt
+from file_tools import write_to_file, read_from_file, search_file, file_info
 
 
 
@@ -38,43 +39,6 @@ llm = ChatOpenAI(
     timeout=60,
 )
 
-@tool
-def write_to_file(filename: str, content: str) -> str:
-    """
-    Writes text content to a file within the 'agent_working' directory.
-    """
-    filepath = os.path.abspath(os.path.join(AGENT_DIR, filename))
-    working_dir = os.path.abspath(AGENT_DIR)
-
-    if not filepath.startswith(working_dir):
-        return "Error: Attempt to write outside agent_working is not allowed."
-
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(content)
-        return f"Successfully wrote to {filename}."
-    except Exception as e:
-        return f"Write failed: {str(e)}"
-    
-@tool
-def read_from_file(filename: str) -> str:
-    """
-    Reads the contents of a file from 'agent_working'.
-    """
-    filepath = os.path.abspath(os.path.join(AGENT_DIR, filename))
-    working_dir = os.path.abspath(AGENT_DIR)
-
-    if not filepath.startswith(working_dir):
-        return "Error: Attempt to read outside agent_working is not allowed."
-
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception as e:
-        return f"Read failed: {str(e)}"
-    
-
-
 # `TavilySearchResults` returns the *content* (snippets) of the results.  
 # If you prefer only URLs, use `TavilySearchResultsJson`.
 search_tool = TavilySearch(
@@ -88,8 +52,11 @@ tools = [
     python_tool,
     write_to_file,
     read_from_file,
+    search_file,
+    file_info,
     send_gmail,
     read_gmail,
+    send_bulk_gmail,
     create_calendar_event,
     list_calendar_events,
     delete_calendar_event,
@@ -0,0 +1,252 @@
+"""
+Offline benchmarks for the agent plumbing. No model or API calls are made.
+
+    python benchmark.py setup --iterations 50
+    python benchmark.py agent --iterations 20 --llm-latency 0.05 --api-latency 0.02
+    python benchmark.py startup --runs 3
+
+`agent` drives the real `main.get_agent_response` path with a scripted chat model and
+local stand-ins for Gmail, Calendar, Drive, Tavily and Gemini (see benchmark_fakes.py).
+It runs in a scratch working directory, so it never touches ./agent_working.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+# The benchmarks never reach the network; placeholder keys let `main` import without a .env
+for _key in ("OPENROUTER_API_KEY", "TAVILY_API_KEY", "GEMINI_API_KEY"):
+    os.environ.setdefault(_key, "benchmark-placeholder")
+
+
+def _summarize(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p90_ms": round(pick(0.90) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def _peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KiB on Linux
+
+
+# Scripted turns: (user message, model steps). A step is a list of (tool, args) calls made
+# together, or the final answer. Messages mention their tool group so the router binds it.
+SCENARIOS = {
+    "chat": ("Tell me a short joke.", ["Why do programmers prefer dark mode? Because light attracts bugs."]),
+    "search": (
+        "Search the web for the latest Python release.",
+        [[("tavily_search", {"query": "latest Python release"})], "The latest Python release is 3.13."],
+    ),
+    "email": (
+        "Summarize my unread emails.",
+        [[("read_gmail", {"query": "is:unread", "max_results": 20})], "You have 20 unread emails, mostly updates."],
+    ),
+    "calendar": (
+        "What is on my calendar, and schedule a review meeting tomorrow at 3pm.",
+        [
+            [("list_calendar_events", {"max_results": 10}),
+             ("create_calendar_event", {"event_name": "Review", "start_time": "2030-01-01T15:00:00", "end_time": "2030-01-01T15:30:00"})],
+            "Here are your next events; the review meeting is booked.",
+        ],
+    ),
+    "drive": ("List my Drive files.", [[("list_drive_files", {"input_data": {}})], "Here are your latest files."]),
+    "image": (
+        "Generate an image of a lighthouse at dusk.",
+        [[("generate_image_from_prompt", {"prompt": "a lighthouse at dusk", "filename": "lighthouse.png"})], "Done."],
+    ),
+    "python": (
+        "Use Python to add up the numbers below one million.",
+        [[("Python_REPL", {"query": "print(sum(range(10**6)))"})], "The sum is 499999500000."],
+    ),
+    "bulk": (
+        "Send the launch announcement mail merge to our 50 beta users.",
+        [
+            [("send_bulk_gmail", {
+                "subject_template": "You're in, {first_name}",
+                "body_template": "Hi {first_name},\nThe beta is live for {company}.",
+                "rows": [{"email": f"user{i}@example.com", "first_name": f"User{i}", "company": f"Co {i}"} for i in range(50)],
+            })],
+            "Sent all 50 announcements.",
+        ],
+    ),
+    "multi": (
+        "Check my email and my calendar, and search the web for today's news.",
+        [
+            [("read_gmail", {"query": "", "max_results": 10}), ("list_calendar_events", {"max_results": 5}),
+             ("tavily_search", {"query": "today's news"})],
+            "Here's your briefing.",
+        ],
+    ),
+}
+
+
+def bench_setup(iterations: int) -> dict:
+    """Per-turn agent setup cost: rebuilding the agent every turn vs. reusing the compiled runtime."""
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    import main
+
+    before = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        agent = create_tool_calling_agent(llm=main.llm, tools=main.tools, prompt=main.prompt)
+        AgentExecutor(agent=agent, tools=main.tools, verbose=True)
+        before.append(time.perf_counter() - start)
+
+    main.runtime.rebuild()
+    after = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        main.runtime.get_executor()
+        after.append(time.perf_counter() - start)
+
+    return {"tools": len(main.tools), "per_turn_rebuild": _summarize(before), "shared_runtime": _summarize(after)}
+
+
+def _offline_environment(workdir: str, caches: bool):
+    """Settings for an isolated, network-free run; must be applied before `main` is imported."""
+    os.chdir(workdir)
+    os.environ["LLM_CACHE"] = "0"
+    os.environ.setdefault("GEMINI_IMAGE_RPM", "1000000")  # the stand-in has no quota to protect
+    os.environ.setdefault("GEMINI_IMAGE_BURST", "1000000")
+    os.environ.setdefault("GMAIL_SEND_RATE", "1000000")
+    os.environ.setdefault("GMAIL_SEND_BURST", "1000000")
+    if not caches:
+        for name in ("SEARCH_CACHE", "IMAGE_CACHE", "CALENDAR_CACHE", "GMAIL_MIRROR"):
+            os.environ[name] = "0"
+
+
+def bench_agent(iterations: int, scenarios, latency, concurrency: int = 1, warmup: int = 1, caches: bool = False,
+                workdir: str = None, verbose: bool = False) -> dict:
+    """Per-turn latency and per-tool time of scripted turns through `main.get_agent_response`."""
+    _offline_environment(workdir or tempfile.mkdtemp(prefix="agent-bench-"), caches)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr if verbose else open(os.devnull, "w")):
+        import main
+    import_seconds = time.perf_counter() - started
+
+    import benchmark_fakes
+    from metering import SessionUsage
+    benchmark_fakes.install(latency)
+    scripts = {SCENARIOS[name][0]: SCENARIOS[name][1] for name in scenarios}
+    main.runtime.rebuild(llm=benchmark_fakes.ScriptedChatModel(scripts=scripts, latency=latency["llm"]))
+
+    def turn(name):
+        usage = SessionUsage()
+        start = time.perf_counter()
+        main.get_agent_response(SCENARIOS[name][0], [], usage)
+        return name, time.perf_counter() - start, usage.turns[-1]
+
+    jobs = [name for _ in range(iterations) for name in scenarios]
+    with contextlib.redirect_stdout(sys.stderr if verbose else open(os.devnull, "w")):
+        for name in scenarios * warmup:
+            turn(name)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(turn, jobs))
+        elapsed = time.perf_counter() - started
+
+    by_scenario, tools = {}, {}
+    for name, wall, usage in results:
+        by_scenario.setdefault(name, []).append(wall)
+        for call in usage.calls:
+            if call.kind == "tool":
+                tools.setdefault(call.name, []).append(call.seconds)
+    overhead = [max(wall - usage.llm_seconds - usage.tool_seconds, 0.0) for _, wall, usage in results]
+    return {
+        "config": {"iterations": iterations, "concurrency": concurrency, "warmup": warmup, "caches": caches,
+                   "latency_seconds": latency.seconds, "scenarios": list(scenarios)},
+        "import_main_seconds": round(import_seconds, 3),
+        "turns": _summarize([wall for _, wall, _ in results]),
+        "throughput_turns_per_second": round(len(results) / elapsed, 2),
+        "agent_loop_overhead": _summarize(overhead),
+        "by_scenario": {name: _summarize(samples) for name, samples in by_scenario.items()},
+        "per_tool": {name: _summarize(samples) for name, samples in sorted(tools.items())},
+        "tool_import_seconds": main.tool_registry.report(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench_startup(runs: int) -> dict:
+    """Cold `import main` in fresh interpreters: wall time and peak memory."""
+    probe = (
+        "import json, resource, time; start = time.perf_counter(); import main; "
+        "print(json.dumps({'seconds': time.perf_counter() - start, "
+        "'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))"
+    )
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHON_POOL_SIZE="0", LLM_CACHE="0")
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="agent-bench-") as workdir:
+            out = subprocess.run(
+                [sys.executable, "-c", probe], cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "import_main": _summarize([s["seconds"] for s in samples]),
+        "peak_rss_mb": round(max(s["rss_mb"] for s in samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    setup = sub.add_parser("setup", help="per-turn agent construction cost")
+    setup.add_argument("--iterations", type=int, default=50)
+    agent = sub.add_parser("agent", help="scripted turns through main.get_agent_response with local stand-ins")
+    agent.add_argument("--iterations", type=int, default=20, help="runs of each scenario")
+    agent.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    agent.add_argument("--concurrency", type=int, default=1, help="turns in flight at once")
+    agent.add_argument("--warmup", type=int, default=1, help="untimed runs of each scenario")
+    agent.add_argument("--llm-latency", type=float, default=0.0, help="seconds per model call")
+    agent.add_argument("--api-latency", type=float, default=0.0, help="seconds per Gmail/Calendar/Drive request")
+    agent.add_argument("--tavily-latency", type=float, default=0.0)
+    agent.add_argument("--gemini-latency", type=float, default=0.0)
+    agent.add_argument("--caches", action="store_true", help="keep the search/image/calendar/mail caches on")
+    agent.add_argument("--verbose", action="store_true", help="show the agent's output on stderr")
+    startup = sub.add_parser("startup", help="cold import time and memory of main")
+    startup.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    if args.command == "setup":
+        report = bench_setup(args.iterations)
+    elif args.command == "agent":
+        from benchmark_fakes import Latency
+        scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        latency = Latency(
+            llm=args.llm_latency, gmail=args.api_latency, calendar=args.api_latency, drive=args.api_latency,
+            tavily=args.tavily_latency, gemini=args.gemini_latency,
+        )
+        report = bench_agent(args.iterations, scenarios, latency, args.concurrency, args.warmup, args.caches, verbose=args.verbose)
+    elif args.command == "startup":
+        report = bench_startup(args.runs)
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Local stand-ins for every remote dependency of the agent, for offline benchmarks.
+
+- ScriptedChatModel: a chat model that replays a fixed sequence of tool calls per user message.
+- FakeGmail / FakeCalendar / FakeDrive: in-memory Google API clients with the call shapes
+  the tools use (`service.users().messages().list(...).execute()` and so on).
+- FakeTavily: an api_wrapper for TavilySearch.
+- FakeGenaiClient: a google-genai client whose generate_content returns a small PNG.
+
+Every stand-in sleeps for its configured latency, so runs resemble real network waits
+without making any calls.
+"""
+import asyncio
+import base64
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# 1x1 transparent PNG
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+class Latency:
+    """Injected latency in seconds per backend ("llm", "gmail", "calendar", "drive", "tavily", "gemini")."""
+
+    def __init__(self, **seconds: float):
+        self.seconds = {"llm": 0.0, "gmail": 0.0, "calendar": 0.0, "drive": 0.0, "tavily": 0.0, "gemini": 0.0}
+        self.seconds.update(seconds)
+
+    def __getitem__(self, backend: str) -> float:
+        return self.seconds.get(backend, 0.0)
+
+    def sleep(self, backend: str):
+        if self[backend]:
+            time.sleep(self[backend])
+
+
+# --- Model ---
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Replays `scripts[user_message]`: a list of steps, each a list of (tool_name, args) calls
+    or a final answer string. The step is derived from the number of tool-calling AI
+    messages since the last human message, so concurrent turns never share state.
+    """
+
+    scripts: Dict[str, List[Any]]
+    latency: float = 0.0
+    output_tokens: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-benchmark"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.bind(tools=[getattr(t, "name", t) for t in tools], **kwargs)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        script = self.scripts.get(messages[last_human].content if last_human >= 0 else "", ["OK"])
+        step = sum(1 for m in messages[last_human + 1:] if isinstance(m, AIMessage) and m.tool_calls)
+        planned = script[min(step, len(script) - 1)]
+        usage = {
+            "input_tokens": sum(len(str(m.content)) for m in messages) // 4,
+            "output_tokens": self.output_tokens,
+            "total_tokens": sum(len(str(m.content)) for m in messages) // 4 + self.output_tokens,
+        }
+        if isinstance(planned, str):
+            message = AIMessage(content=planned, usage_metadata=usage)
+        else:
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": name, "args": args, "id": uuid.uuid4().hex, "type": "tool_call"} for name, args in planned],
+                usage_metadata=usage,
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+# --- Google APIs ---
+
+class _Call:
+    """An API call; `execute()` sleeps for the backend latency and returns the result."""
+
+    def __init__(self, latency: Latency, backend: str, result):
+        self._latency = latency
+        self._backend = backend
+        self._result = result
+
+    def execute(self, *args, **kwargs):
+        self._latency.sleep(self._backend)
+        return self._result() if callable(self._result) else self._result
+
+
+class _Batch:
+    def __init__(self, latency: Latency, callback):
+        self._latency = latency
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request: _Call, request_id: str = None):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        self._latency.sleep("gmail")  # one round trip for the whole batch
+        for request_id, request in self._requests:
+            result = request._result() if callable(request._result) else request._result
+            self._callback(request_id, result, None)
+
+
+class FakeGmail:
+    def __init__(self, latency: Latency, messages: int = 200):
+        self._latency = latency
+        self.history_id = "1000"
+        self.store = {
+            f"m{i:05d}": {
+                "id": f"m{i:05d}",
+                "threadId": f"t{i:05d}",
+                "labelIds": ["INBOX"] + (["UNREAD"] if i % 3 == 0 else []),
+                "snippet": f"Benchmark message {i} about the quarterly report and next steps.",
+                "internalDate": str(1_700_000_000_000 - i * 60_000),
+                "payload": {"headers": [
+                    {"name": "From", "value": f"Sender {i % 17} <sender{i % 17}@example.com>"},
+                    {"name": "To", "value": "me@example.com"},
+                    {"name": "Subject", "value": f"Update #{i}"},
+                ]},
+            }
+            for i in range(messages)
+        }
+        self.sent = []
+        self._lock = threading.Lock()
+
+    # service.users()...
+    def users(self):
+        return self
+
+    def _list(self, maxResults: int = 100, pageToken: Optional[str] = None, **kwargs) -> dict:
+        ids = sorted(self.store)
+        start = int(pageToken or 0)
+        result = {"messages": [{"id": i, "threadId": self.store[i]["threadId"]} for i in ids[start:start + maxResults]]}
+        if start + maxResults < len(ids):
+            result["nextPageToken"] = str(start + maxResults)
+        return result
+
+    def messages(self):
+        return SimpleNamespace(
+            list=lambda userId="me", **kw: _Call(self._latency, "gmail", lambda: self._list(**kw)),
+            get=lambda userId="me", id=None, **kw: _Call(self._latency, "gmail", lambda: self.store[id]),
+            send=lambda userId="me", body=None, media_body=None, **kw: _Call(self._latency, "gmail", lambda: self._send(body, media_body)),
+        )
+
+    def _send(self, body, media_body=None):
+        if media_body is not None:
+            body = dict(body or {}, media_bytes=media_body.size(), mimetype=media_body.mimetype())
+        with self._lock:
+            self.sent.append(body)
+            return {"id": f"sent{len(self.sent)}", "threadId": f"sent{len(self.sent)}"}
+
+    def getProfile(self, userId="me"):
+        return _Call(self._latency, "gmail", {"historyId": self.history_id})
+
+    def history(self):
+        return SimpleNamespace(list=lambda **kw: _Call(self._latency, "gmail", {"history": [], "historyId": self.history_id}))
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self._latency, callback)
+
+
+class FakeCalendar:
+    def __init__(self, latency: Latency, events: int = 30):
+        self._latency = latency
+        self._lock = threading.Lock()
+        now = time.time()
+        self.store: Dict[str, dict] = {}
+        for i in range(events):
+            start = now + (i + 1) * 3600
+            self._add({
+                "id": f"e{i:04d}",
+                "status": "confirmed",
+                "summary": f"Benchmark event {i}",
+                "start": {"dateTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start))},
+                "end": {"dateTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start + 1800))},
+            })
+
+    def _add(self, event: dict) -> dict:
+        with self._lock:
+            self.store[event["id"]] = event
+        return event
+
+    def _insert(self, body: dict) -> dict:
+        event = dict(body, id=uuid.uuid4().hex[:12], status="confirmed", htmlLink="https://calendar.example/event")
+        if "conferenceData" in body:
+            event["hangoutLink"] = "https://meet.example/abc-defg-hij"
+        return self._add(event)
+
+    def _list(self, maxResults: int = 250, **kwargs):
+        with self._lock:
+            items = sorted(self.store.values(), key=lambda e: e["start"].get("dateTime", ""))
+        return {"items": items[:maxResults] if "syncToken" not in kwargs else [], "nextSyncToken": "sync-1"}
+
+    def _delete(self, eventId: str):
+        with self._lock:
+            self.store.pop(eventId, None)
+        return ""
+
+    def events(self):
+        return SimpleNamespace(
+            list=lambda calendarId="primary", **kw: _Call(self._latency, "calendar", lambda: self._list(**kw)),
+            insert=lambda calendarId="primary", body=None, **kw: _Call(self._latency, "calendar", lambda: self._insert(body)),
+            get=lambda calendarId="primary", eventId=None: _Call(self._latency, "calendar", lambda: dict(self.store[eventId])),
+            update=lambda calendarId="primary", eventId=None, body=None: _Call(self._latency, "calendar", lambda: self._add(dict(body, id=eventId))),
+            patch=lambda calendarId="primary", eventId=None, body=None: _Call(self._latency, "calendar", lambda: self._add({**self.store[eventId], **body})),
+            delete=lambda calendarId="primary", eventId=None: _Call(self._latency, "calendar", lambda: self._delete(eventId)),
+        )
+
+
+class FakeDrive:
+    def __init__(self, latency: Latency, files: int = 50):
+        self._latency = latency
+        self.files_by_id = {
+            f"f{i:04d}": {"id": f"f{i:04d}", "name": f"file_{i}.txt", "mimeType": "text/plain"} for i in range(files)
+        }
+
+    def files(self):
+        return SimpleNamespace(
+            list=lambda pageSize=10, **kw: _Call(self._latency, "drive", {"files": list(self.files_by_id.values())[:pageSize]}),
+            create=lambda body=None, **kw: _Call(
+                self._latency, "drive", {"id": uuid.uuid4().hex[:12], "webViewLink": "https://drive.example/file"}
+            ),
+        )
+
+
+# --- Tavily and Gemini ---
+
+class FakeTavily:
+    """Replacement for TavilySearch.api_wrapper."""
+
+    def __init__(self, latency: Latency, results: int = 5):
+        self._latency = latency
+        self._results = results
+
+    def _payload(self, query: str) -> dict:
+        return {
+            "query": query,
+            "results": [
+                {"title": f"Result {i} for {query}", "url": f"https://example.com/{i}", "content": f"Snippet {i} about {query}.", "score": 1 - i / 10}
+                for i in range(self._results)
+            ],
+            "response_time": self._latency["tavily"],
+        }
+
+    def raw_results(self, query: str, **kwargs) -> dict:
+        self._latency.sleep("tavily")
+        return self._payload(query)
+
+    async def raw_results_async(self, query: str, **kwargs) -> dict:
+        await asyncio.sleep(self._latency["tavily"])
+        return self._payload(query)
+
+
+class FakeGenaiClient:
+    """Stands in for `google.genai.Client`; generate_content returns PNG_BYTES."""
+
+    def __init__(self, latency: Latency):
+        self._latency = latency
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _generate_content(self, model: str, contents: Any, config: Any = None):
+        self._latency.sleep("gemini")
+        part = SimpleNamespace(inline_data=SimpleNamespace(mime_type="image/png", data=PNG_BYTES), text=None)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def install(latency: Latency, gmail_messages: int = 200, calendar_events: int = 30, drive_files: int = 50) -> dict:
+    """Route the Google API clients, Tavily and Gemini to local stand-ins. `main` must already be imported."""
+    import get_google_service
+    import image_generation_tools
+    import main
+
+    fakes = {
+        "gmail": FakeGmail(latency, gmail_messages),
+        "calendar": FakeCalendar(latency, calendar_events),
+        "drive": FakeDrive(latency, drive_files),
+        "tavily": FakeTavily(latency),
+        "gemini": FakeGenaiClient(latency),
+    }
+    get_google_service.set_service("gmail", "v1", fakes["gmail"])
+    get_google_service.set_service("calendar", "v3", fakes["calendar"])
+    get_google_service.set_service("drive", "v3", fakes["drive"])
+    object.__setattr__(main.search_tool, "api_wrapper", fakes["tavily"])
+    image_generation_tools._get_client = lambda key: fakes["gemini"]
+    return fakes
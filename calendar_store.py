@@ -0,0 +1,132 @@
+"""
+Local store of the primary calendar's events (SQLite under agent_working/), kept current
+with Calendar's syncToken incremental sync.
+
+Listing and lookup-by-ID are served from the store, which re-syncs (one cheap delta request)
+only when it is older than CALENDAR_CACHE_MAX_AGE seconds. Calendar tools write through to
+both the API and the store. Set CALENDAR_CACHE=0 to always query the API directly.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+import sqlite_store
+
+AGENT_DIR = "agent_working"
+STORE_PATH = os.path.join(AGENT_DIR, "calendar_store.sqlite3")
+CALENDAR_ID = "primary"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    start_ts REAL,
+    end_ts REAL,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS events_start ON events (start_ts);
+"""
+
+
+def enabled() -> bool:
+    return os.getenv("CALENDAR_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def _timestamp(when: dict) -> float:
+    """Event start/end ({'dateTime': ...} or all-day {'date': ...}) → epoch seconds."""
+    value = when.get("dateTime") or when.get("date")
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class CalendarStore:
+    def __init__(self, path: str = STORE_PATH, max_age: float = None):
+        self.path = path
+        self.max_age = max_age if max_age is not None else float(os.getenv("CALENDAR_CACHE_MAX_AGE", "60"))
+        self._sync_lock = threading.Lock()
+        sqlite_store.create(path, _SCHEMA)
+
+    def _apply(self, conn, event: dict):
+        if event.get("status") == "cancelled":
+            conn.execute("DELETE FROM events WHERE id = ?", (event["id"],))
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO events (id, start_ts, end_ts, body) VALUES (?, ?, ?, ?)",
+            (event["id"], _timestamp(event["start"]), _timestamp(event["end"]), json.dumps(event)),
+        )
+
+    def _pull(self, service, sync_token: Optional[str]):
+        """Page through events().list (full or from `sync_token`); return (events, next_sync_token)."""
+        events, page_token = [], None
+        while True:
+            params = {"calendarId": CALENDAR_ID, "singleEvents": True, "maxResults": 2500, "pageToken": page_token}
+            if sync_token:
+                params["syncToken"] = sync_token
+            resp = service.events().list(**params).execute()
+            events.extend(resp.get("items", []))
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return events, resp.get("nextSyncToken")
+
+    def sync(self, service, force: bool = False):
+        """Apply changes since the last sync, unless the store was synced within `max_age` seconds."""
+        from googleapiclient.errors import HttpError  # the API client is loaded by then anyway
+        with self._sync_lock:
+            with sqlite_store.connect(self.path) as conn:
+                sync_token = sqlite_store.get_state(conn, "sync_token")
+                last_sync = float(sqlite_store.get_state(conn, "last_sync") or 0)
+            if not force and sync_token and time.time() - last_sync < self.max_age:
+                return
+            full = not sync_token
+            try:
+                events, next_token = self._pull(service, sync_token)
+            except HttpError as e:
+                if e.resp.status != 410:  # 410 Gone: token expired, Calendar requires a full resync
+                    raise
+                full = True
+                events, next_token = self._pull(service, None)
+            with sqlite_store.connect(self.path) as conn:
+                if full:
+                    conn.execute("DELETE FROM events")
+                for event in events:
+                    self._apply(conn, event)
+                sqlite_store.set_state(conn, sync_token=next_token, last_sync=time.time())
+
+    def upcoming(self, service, max_results: int = 10) -> List[dict]:
+        """Events that have not ended yet, ordered by start time (same semantics as timeMin=now)."""
+        self.sync(service)
+        with sqlite_store.connect(self.path) as conn:
+            rows = conn.execute(
+                "SELECT body FROM events WHERE end_ts > ? ORDER BY start_ts LIMIT ?", (time.time(), max_results)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get(self, service, event_id: str) -> Optional[dict]:
+        self.sync(service)
+        with sqlite_store.connect(self.path) as conn:
+            row = conn.execute("SELECT body FROM events WHERE id = ?", (event_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, event: dict):
+        """Record an event returned by a successful insert/update."""
+        with sqlite_store.connect(self.path) as conn:
+            self._apply(conn, event)
+
+    def remove(self, event_id: str):
+        with sqlite_store.connect(self.path) as conn:
+            conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[CalendarStore]:
+    """The shared store, or None when CALENDAR_CACHE is disabled."""
+    global _store
+    if not enabled():
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = CalendarStore()
+        return _store
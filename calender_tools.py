@@ -2,12 +2,17 @@ from langchain.tools import tool
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-from get_google_service import get_google_credentials
+import calendar_store
 
 def get_calendar_service():
-    creds = get_google_credentials()
-    return build('calendar', 'v3', credentials=creds)
+    from get_google_service import get_service  # Google API client libraries load on first use
+    return get_service('calendar', 'v3')
+
+def _store_put(event):
+    """Write an event returned by the API through to the local store."""
+    store = calendar_store.get_store()
+    if store:
+        store.put(event)
 
 class ScheduleMeetInput(BaseModel):
     event_title: str = Field(..., description="The title of the event.")
@@ -21,7 +26,7 @@ class ScheduleMeetInput(BaseModel):
 def schedule_google_meet_event(event_title: str, start_time: str, end_time: str, description: str = "", attendees: Optional[List[str]] = None, timezone: str = "Asia/Kolkata") -> str:
     """Create a calendar event with a Google Meet link."""
     try:
-        service = build('calendar', 'v3', credentials=get_google_credentials())
+        service = get_calendar_service()
         event = {
             "summary": event_title,
             "description": description,
@@ -40,6 +45,7 @@ def schedule_google_meet_event(event_title: str, start_time: str, end_time: str,
             body=event,
             conferenceDataVersion=1
         ).execute()
+        _store_put(created_event)
         meet_link = created_event.get("conferenceData", {}).get("entryPoints", [{}])[0].get("uri", "Meet link not generated")
         event_link = created_event.get("htmlLink")
         return f"Event scheduled: {event_link}\nGoogle Meet Link: {meet_link}"
@@ -65,6 +71,7 @@ def create_calendar_event(event_name: str, start_time: str, end_time: str, descr
             "end": {"dateTime": end_time, "timeZone": timezone}
         }
         created_event = service.events().insert(calendarId='primary', body=event).execute()
+        _store_put(created_event)
         return f"Event '{event_name}' created: {created_event.get('htmlLink')}"
     except Exception as e:
         return f"Failed to create event: {e}"
@@ -77,13 +84,17 @@ def list_calendar_events(max_results: int = 10) -> str:
     """List upcoming Google Calendar events."""
     try:
         service = get_calendar_service()
-        now = datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(
-            calendarId='primary', timeMin=now,
-            maxResults=max_results, singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        events = events_result.get('items', [])
+        store = calendar_store.get_store()
+        if store:
+            events = store.upcoming(service, max_results)
+        else:
+            now = datetime.utcnow().isoformat() + 'Z'
+            events_result = service.events().list(
+                calendarId='primary', timeMin=now,
+                maxResults=max_results, singleEvents=True,
+                orderBy='startTime'
+            ).execute()
+            events = events_result.get('items', [])
         if not events:
             return "No upcoming events found."
         msg = ""
@@ -103,6 +114,9 @@ def delete_calendar_event(event_id: str) -> str:
     try:
         service = get_calendar_service()
         service.events().delete(calendarId='primary', eventId=event_id).execute()
+        store = calendar_store.get_store()
+        if store:
+            store.remove(event_id)
         return f"Event with ID '{event_id}' deleted."
     except Exception as e:
         return f"Failed to delete event: {e}"
@@ -119,19 +133,22 @@ class UpdateEventInput(BaseModel):
 def update_calendar_event(event_id: str, new_summary: Optional[str] = None, new_start: Optional[str] = None, new_end: Optional[str] = None, new_description: Optional[str] = None, timezone: str = "Asia/Kolkata") -> str:
     """Update a calendar event's title, time, or description."""
     try:
-        service = get_calendar_service()
-        event = service.events().get(calendarId='primary', eventId=event_id).execute()
+        # Send only the changed fields with patch(): a full update() built from a cached or
+        # earlier read would overwrite changes made elsewhere in the meantime
+        changes = {}
         if new_summary:
-            event['summary'] = new_summary
+            changes['summary'] = new_summary
         if new_description:
-            event['description'] = new_description
+            changes['description'] = new_description
         if new_start:
-            event['start']['dateTime'] = new_start
-            event['start']['timeZone'] = timezone
+            changes['start'] = {'dateTime': new_start, 'timeZone': timezone}
         if new_end:
-            event['end']['dateTime'] = new_end
-            event['end']['timeZone'] = timezone
-        updated_event = service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
+            changes['end'] = {'dateTime': new_end, 'timeZone': timezone}
+        if not changes:
+            return "Nothing to update: give a new summary, start, end or description."
+        service = get_calendar_service()
+        updated_event = service.events().patch(calendarId='primary', eventId=event_id, body=changes).execute()
+        _store_put(updated_event)
         return f"Event updated: {updated_event.get('htmlLink')}"
     except Exception as e:
         return f"Failed to update event: {e}"
@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, List, Optional
+
+# Summaries for every session run here, off the request path
+_summarizer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarizer")
+
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "4000"))
+
+
+class ConversationMemory:
+    """
+    Memory of one chat session: a cumulative summary plus the turns not yet folded into it.
+
+    Once the summary and pending turns exceed `token_budget` tokens, `maybe_summarize()`
+    folds them into a new summary on a background thread. The summary counts for at most
+    half the budget, so a summary that is itself near the budget doesn't trigger a new
+    summarization on every turn. The new summary is swapped in atomically; turns recorded
+    while it was being written are kept.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, List[dict]], str],
+        count_tokens: Callable[[str], int],
+        token_budget: int = SUMMARY_TOKEN_BUDGET,
+        summary_path: Optional[str] = None,
+    ):
+        self._summarize = summarize
+        self._count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.summary_path = summary_path
+        self.summary = ""
+        self.turns = []
+        self._summary_tokens = 0
+        self._lock = threading.Lock()
+        self._pending: Optional[Future] = None
+        self._generation = 0  # bumped by clear() so in-flight summaries are discarded
+
+    def add_turn(self, user: str, assistant: str):
+        tokens = self._count_tokens(f"User: {user}\nAssistant: {assistant}\n")
+        with self._lock:
+            self.turns.append({"user": user, "assistant": assistant, "tokens": tokens})
+
+    def history_tokens(self) -> int:
+        with self._lock:
+            return self._summary_tokens + sum(t["tokens"] for t in self.turns)
+
+    def build_input(self, user_input: str, recent_turns: int = 2) -> str:
+        """Prefix the user's message with the summary and the most recent turns, if any."""
+        with self._lock:
+            summary, turns = self.summary, self.turns[-recent_turns:]
+        if not summary:
+            return user_input
+        full_input = f"Summary of previous conversation:\n{summary}\n\nRecent messages:\n"
+        for turn in turns:
+            full_input += f"User: {turn['user']}\nAssistant: {turn['assistant']}\n"
+        return full_input + f"\nUser: {user_input}"
+
+    def maybe_summarize(self) -> Optional[Future]:
+        """Start a background summary if the history is over budget and none is running."""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return None
+            summary_share = min(self._summary_tokens, self.token_budget // 2)
+            if summary_share + sum(t["tokens"] for t in self.turns) < self.token_budget or not self.turns:
+                return None
+            snapshot = (self.summary, list(self.turns), self._generation)
+            self._pending = _summarizer_pool.submit(self._run, *snapshot)
+            return self._pending
+
+    def _run(self, previous_summary: str, turns: List[dict], generation: int):
+        try:
+            summary = self._summarize(previous_summary, turns)
+        except Exception as e:
+            print(f"[Memory Summary Error] Keeping the unsummarized history: {e}")
+            return
+        summary_tokens = self._count_tokens(summary)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.summary = summary
+            self._summary_tokens = summary_tokens
+            self.turns = self.turns[len(turns):]
+        if self.summary_path:
+            try:
+                os.makedirs(os.path.dirname(self.summary_path) or ".", exist_ok=True)
+                with open(self.summary_path, "w", encoding="utf-8") as f:
+                    f.write(summary)
+            except Exception as e:
+                print(f"[Memory Save Error] Could not write summary: {e}")
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until any in-flight summary has been applied."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self._summary_tokens = 0
+            self.turns = []
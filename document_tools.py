@@ -1,12 +1,12 @@
 from langchain.tools import tool
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from pptx import Presentation
-from pptx.util import Inches
-from docx import Document
-from docx.shared import Inches
 import os
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from image_generation_tools import generate_image_from_prompt
+import tracing
 
 class DocxContent(BaseModel):
     text: str = Field(..., description="A paragraph of text for the document.")
@@ -15,6 +15,78 @@ class DocxContent(BaseModel):
 
 
 AGENT_DIR = "agent_working"
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))  # parallel image generations per document
+IMAGE_DPI = int(os.getenv("DOCUMENT_IMAGE_DPI", "150"))  # pixel density of embedded images
+PPTX_IMAGE_WIDTH_IN = 3.5
+DOCX_IMAGE_WIDTH_IN = 5.0
+JPEG_QUALITY = 85
+
+def prepare_image(path: str, width_in: float, dpi: int = IMAGE_DPI) -> str:
+    """
+    Returns a copy of the image downscaled to `width_in` inches at `dpi` and recompressed
+    (JPEG, or optimized PNG when it has transparency), so documents don't embed full-resolution
+    originals. Prepared copies are reused while the source file is unchanged. Falls back to
+    the original path if it is already small enough or can't be processed.
+    """
+    from PIL import Image
+
+    try:
+        target_width = int(width_in * dpi)
+        st = os.stat(path)
+        digest = hashlib.sha1(f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{target_width}".encode()).hexdigest()[:16]
+        base = os.path.join(AGENT_DIR, "images", "prepared", f"{os.path.splitext(os.path.basename(path))[0]}_{digest}")
+        for ext in (".jpg", ".png"):
+            if os.path.exists(base + ext):
+                return base + ext
+
+        with Image.open(path) as img:
+            if img.width <= target_width:
+                return path
+            img = img.resize((target_width, max(1, round(img.height * target_width / img.width))), Image.LANCZOS)
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if has_alpha:
+                out = base + ".png"
+                img.save(out, "PNG", optimize=True)
+            else:
+                out = base + ".jpg"
+                img.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out
+    except Exception as e:
+        print(f"[Image Prepare Error] Using original {path}: {e}")
+        return path
+
+def _generate_image(prompt: str, filename: str) -> Optional[str]:
+    result = generate_image_from_prompt.invoke({"prompt": prompt, "filename": filename})
+    if result.startswith("✅"):
+        # Extract the returned path after the arrow
+        return result.split("→", 1)[-1].strip()
+    return None
+
+def generate_images(jobs: dict) -> dict:
+    """
+    Generates images concurrently, at most IMAGE_CONCURRENCY at a time.
+    `jobs` maps a caller key to (prompt, filename); returns {key: image_path} for the
+    images that were generated. Failed keys are simply absent.
+    """
+    paths = {}
+    if not jobs:
+        return paths
+    with ThreadPoolExecutor(max_workers=min(IMAGE_CONCURRENCY, len(jobs))) as pool:
+        # Each job runs in a copy of the caller's context, so its tool run (and trace span) nests under the caller
+        futures = {
+            pool.submit(contextvars.copy_context().run, _generate_image, prompt, filename): key
+            for key, (prompt, filename) in jobs.items()
+        }
+        for future in as_completed(futures):
+            try:
+                path = future.result()
+            except Exception as e:
+                print(f"[Image Generation Error] {futures[future]}: {e}")
+                continue
+            if path:
+                paths[futures[future]] = path
+    return paths
 
 class SlideData(BaseModel):
     title: str = Field(..., description="The title of the slide.")
@@ -34,12 +106,24 @@ def create_pptx_presentation(
     """
     Generates a PowerPoint presentation and inserts images per slide.
     If `image_prompt` is provided without `image_path`, it auto-generates
-    the image via `generate_image_from_prompt.invoke(...)`.
+    the image via `generate_image_from_prompt.invoke(...)`. All such images are
+    generated concurrently before the deck is assembled; a slide whose image
+    fails is kept without one.
     """
+    from pptx import Presentation
+    from pptx.util import Inches
+
     # Ensure output directory exists
     os.makedirs(AGENT_DIR, exist_ok=True)
     prs = Presentation()
 
+    # Generate every prompted image up front, in parallel
+    generated = generate_images({
+        idx: (slide_info.image_prompt, f"slide_{idx}.png")
+        for idx, slide_info in enumerate(slides_data, start=1)
+        if not slide_info.image_path and slide_info.image_prompt
+    })
+
     for idx, slide_info in enumerate(slides_data, start=1):
         # 1) Add slide with title & content
         slide = prs.slides.add_slide(prs.slide_layouts[1])
@@ -53,15 +137,9 @@ def create_pptx_presentation(
             p.text = point
             p.level = 1
 
-        # 3) Auto-generate image if only a prompt is supplied
-        if not slide_info.image_path and slide_info.image_prompt:
-            img_name = f"slide_{idx}.png"
-            result = generate_image_from_prompt.invoke(
-                {"prompt": slide_info.image_prompt, "filename": img_name}
-            )
-            if result.startswith("✅"):
-                # Extract the returned path after the arrow
-                slide_info.image_path = result.split("→", 1)[-1].strip()
+        # 3) Use the auto-generated image if only a prompt was supplied
+        if idx in generated:
+            slide_info.image_path = generated[idx]
 
         # 4) Insert the image if available and adjust layout
         if slide_info.image_path and os.path.exists(slide_info.image_path):
@@ -76,15 +154,17 @@ def create_pptx_presentation(
             # Add the image to the right of the text
             left_img = Inches(6.0)
             top_img = Inches(1.5)
-            width_img = Inches(3.5)
+            width_img = Inches(PPTX_IMAGE_WIDTH_IN)
             pic = slide.shapes.add_picture(
-                slide_info.image_path,
+                prepare_image(slide_info.image_path, PPTX_IMAGE_WIDTH_IN),
                 left_img, top_img, width=width_img
             )
 
     # 5) Save & return confirmation
     out_path = os.path.join(AGENT_DIR, output_filename)
-    prs.save(out_path)
+    with tracing.span("save pptx", kind="io") as span:
+        prs.save(out_path)
+        span.set(bytes=os.path.getsize(out_path))
     return f"✅ Presentation saved to {out_path}"
 
 
@@ -93,25 +173,31 @@ def create_docx_document(title: str, content: List[DocxContent], output_filename
     """
     Creates a Word document with a title, paragraphs, and optional images.
     """
+    from docx import Document
+    from docx.shared import Inches
+
     document = Document()
     document.add_heading(title, level=1)
 
+    generated = generate_images({
+        i: (item.image_prompt, f"doc_image_{i+1}.png")
+        for i, item in enumerate(content)
+        if not item.image_path and item.image_prompt
+    })
+
     for i, item in enumerate(content):
         document.add_paragraph(item.text)
         
-        if not item.image_path and item.image_prompt:
-            img_name = f"doc_image_{i+1}.png"
-            result = generate_image_from_prompt.invoke(
-                {"prompt": item.image_prompt, "filename": img_name}
-            )
-            if result.startswith("✅"):
-                item.image_path = result.split("→", 1)[-1].strip()
+        if i in generated:
+            item.image_path = generated[i]
 
         if item.image_path and os.path.exists(item.image_path):
-            document.add_picture(item.image_path, width=Inches(5.0))
+            document.add_picture(prepare_image(item.image_path, DOCX_IMAGE_WIDTH_IN), width=Inches(DOCX_IMAGE_WIDTH_IN))
 
     output_path = os.path.join(AGENT_DIR, output_filename)
-    document.save(output_path)
+    with tracing.span("save docx", kind="io") as span:
+        document.save(output_path)
+        span.set(bytes=os.path.getsize(output_path))
     return f"✅ Document saved to {output_path}"
 
 
@@ -0,0 +1,275 @@
+"""
+File tools confined to the agent_working directory.
+
+Reads return at most FILE_READ_MAX_BYTES per call and take byte or line ranges, so the
+agent can page through files far larger than its context (or memory). Searching scans
+the file through mmap, and writes replace files atomically.
+"""
+import mmap
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Literal, Optional
+from langchain.tools import tool
+from pydantic import BaseModel, Field
+
+AGENT_DIR = "agent_working"
+MAX_READ_BYTES = int(os.getenv("FILE_READ_MAX_BYTES", str(64 * 1024)))
+MAX_LINE_CHARS = 500  # longer lines are cut in search results
+CHUNK_BYTES = 1024 * 1024
+
+def resolve_path(filename: str) -> Optional[str]:
+    """Absolute path of `filename` inside agent_working, or None if it points outside."""
+    working_dir = os.path.abspath(AGENT_DIR)
+    filepath = os.path.abspath(os.path.join(working_dir, filename))
+    if os.path.commonpath([working_dir, filepath]) != working_dir:
+        return None
+    return filepath
+
+def _decode(data: bytes) -> str:
+    # Ranges can start or end inside a multi-byte character
+    return data.decode("utf-8", errors="replace")
+
+def _count_lines(f) -> int:
+    """Newlines in an open binary file, read in chunks."""
+    f.seek(0)
+    count = 0
+    for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+        count += chunk.count(b"\n")
+    return count
+
+def _tail(f, size: int, lines: int) -> tuple:
+    """(offset, bytes) of the last `lines` lines, reading blocks backwards from the end."""
+    end = size
+    if size:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            end = size - 1  # a trailing newline doesn't start another line
+    position, newlines, offset = end, 0, 0
+    while position > 0:
+        step = min(CHUNK_BYTES, position)
+        position -= step
+        f.seek(position)
+        block = f.read(step)
+        found = block.count(b"\n")
+        if newlines + found >= lines:
+            # The wanted part starts after the (lines - newlines)-th newline from this block's end
+            cut = len(block)
+            for _ in range(lines - newlines):
+                cut = block.rfind(b"\n", 0, cut)
+            offset = position + cut + 1
+            break
+        newlines += found
+    f.seek(offset)
+    return offset, f.read(size - offset)
+
+class WriteFileInput(BaseModel):
+    filename: str = Field(..., description="Path of the file, relative to agent_working.")
+    content: str = Field(..., description="The text to write.")
+    mode: Literal["overwrite", "append"] = Field(
+        "overwrite", description="'overwrite' atomically replaces the file; 'append' adds to the end of it."
+    )
+
+@tool(args_schema=WriteFileInput)
+def write_to_file(filename: str, content: str, mode: str = "overwrite") -> str:
+    """
+    Writes text content to a file within the 'agent_working' directory. Overwrites are
+    atomic (readers see the old or the new file, never a partial one); use mode='append'
+    to add to a log or CSV without rewriting it.
+    """
+    filepath = resolve_path(filename)
+    if filepath is None:
+        return "Error: Attempt to write outside agent_working is not allowed."
+
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        if mode == "append":
+            with open(filepath, "a", encoding="utf-8") as f:
+                f.write(content)
+            return f"Successfully appended {len(content)} characters to {filename}."
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=".tmp-", suffix=os.path.basename(filepath))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(filepath):
+                os.chmod(tmp_path, os.stat(filepath).st_mode & 0o777)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return f"Successfully wrote to {filename}."
+    except Exception as e:
+        return f"Write failed: {str(e)}"
+
+class ReadFileInput(BaseModel):
+    filename: str = Field(..., description="Path of the file, relative to agent_working.")
+    start_line: Optional[int] = Field(None, description="First line to read (1-based). Use with end_line for a line range.")
+    end_line: Optional[int] = Field(None, description="Last line to read (inclusive). start_line=1, end_line=20 gives the head.")
+    tail_lines: Optional[int] = Field(None, description="Read only the last N lines.")
+    byte_offset: Optional[int] = Field(None, description="Byte position to start reading from.")
+    max_bytes: int = Field(MAX_READ_BYTES, description=f"Most bytes to return (at most {MAX_READ_BYTES}).")
+
+@tool(args_schema=ReadFileInput)
+def read_from_file(
+    filename: str,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    tail_lines: Optional[int] = None,
+    byte_offset: Optional[int] = None,
+    max_bytes: int = MAX_READ_BYTES,
+) -> str:
+    """
+    Reads a file from 'agent_working': the whole file if it is small, otherwise a slice.
+    Select a line range (start_line/end_line), the last lines (tail_lines) or a byte
+    range (byte_offset/max_bytes). Longer output is cut off with a note saying where to
+    continue. Use file_info for a file's size and search_file to find lines in it.
+    """
+    filepath = resolve_path(filename)
+    if filepath is None:
+        return "Error: Attempt to read outside agent_working is not allowed."
+
+    for name, value in (("tail_lines", tail_lines), ("start_line", start_line), ("end_line", end_line)):
+        if value is not None and value < 1:
+            return f"Read failed: {name} must be at least 1."
+
+    try:
+        max_bytes = max(1, min(max_bytes, MAX_READ_BYTES))
+        size = os.path.getsize(filepath)
+        with open(filepath, "rb") as f:
+            if tail_lines:
+                offset, data = _tail(f, size, tail_lines)
+                if len(data) > max_bytes:
+                    offset, data = size - max_bytes, data[-max_bytes:]
+                header = f"[last {tail_lines} lines of {filename}, bytes {offset}-{offset + len(data)} of {size}]\n"
+                return header + _decode(data)
+
+            if start_line is not None or end_line is not None:
+                first = max(start_line or 1, 1)
+                last = end_line if end_line is not None else float("inf")
+                # Read in bounded pieces, so neither skipped lines nor one huge line is loaded whole
+                number = 1
+                while number < first:
+                    piece = f.readline(CHUNK_BYTES)
+                    if not piece:
+                        break
+                    number += piece.endswith(b"\n")
+                lines, taken, cut = [], 0, False
+                while number <= last:
+                    line_start = f.tell()
+                    line = f.readline(max_bytes - taken + 1)
+                    if not line:
+                        break
+                    if len(line) > max_bytes - taken:
+                        if lines:
+                            cut = True
+                            break
+                        # This line alone is longer than max_bytes: return its start, continue by bytes
+                        end = line_start + max_bytes
+                        return (
+                            f"[line {number} of {filename} is longer than {max_bytes} bytes; bytes {line_start}-{end} of {size}]\n"
+                            + _decode(line[:max_bytes]) + f"\n[continue with byte_offset={end}]"
+                        )
+                    lines.append(line)
+                    taken += len(line)
+                    number += 1
+                shown = f"{first}-{number - 1}" if lines else "none"
+                header = f"[lines {shown} of {filename}]\n"
+                note = f"\n[cut at {max_bytes} bytes; continue with start_line={number}]" if cut else ""
+                return header + _decode(b"".join(lines)) + note
+
+            offset = min(max(byte_offset or 0, 0), size)
+            f.seek(offset)
+            data = f.read(max_bytes)
+            if offset == 0 and len(data) == size:
+                return _decode(data)
+            end = offset + len(data)
+            note = f"\n[bytes {offset}-{end} of {size}; continue with byte_offset={end}]" if end < size else ""
+            return f"[bytes {offset}-{end} of {size} of {filename}]\n" + _decode(data) + note
+    except Exception as e:
+        return f"Read failed: {str(e)}"
+
+class SearchFileInput(BaseModel):
+    filename: str = Field(..., description="Path of the file, relative to agent_working.")
+    pattern: str = Field(..., description="Text to find, or a regular expression if regex is true.")
+    regex: bool = Field(False, description="Treat the pattern as a regular expression.")
+    ignore_case: bool = Field(False, description="Match case-insensitively.")
+    max_matches: int = Field(50, description="Stop after this many matching lines.")
+
+@tool(args_schema=SearchFileInput)
+def search_file(filename: str, pattern: str, regex: bool = False, ignore_case: bool = False, max_matches: int = 50) -> str:
+    """
+    Finds lines in a file in 'agent_working' that match a pattern, like grep -n, and
+    returns them with their line numbers. Works on files of any size without loading them.
+    """
+    filepath = resolve_path(filename)
+    if filepath is None:
+        return "Error: Attempt to read outside agent_working is not allowed."
+
+    try:
+        # MULTILINE, so ^ and $ anchor at each line as in grep
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        expr = re.compile((pattern if regex else re.escape(pattern)).encode("utf-8"), flags)
+        if os.path.getsize(filepath) == 0:
+            return f"No matches for {pattern!r} in {filename}."
+        results = []
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            line_number, counted_to, next_line = 1, 0, 0
+            for match in expr.finditer(mm):
+                if match.start() < next_line:
+                    continue  # another match on a line already reported
+                line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                # Count newlines up to this line in chunks, so a long gap never becomes one big copy
+                for chunk_start in range(counted_to, line_start, CHUNK_BYTES):
+                    line_number += mm[chunk_start:min(chunk_start + CHUNK_BYTES, line_start)].count(b"\n")
+                counted_to = line_start
+                line_end = mm.find(b"\n", match.end())
+                line_end = len(mm) if line_end == -1 else line_end
+                text = _decode(mm[line_start:min(line_end, line_start + MAX_LINE_CHARS)]).rstrip("\r")
+                results.append(f"{line_number}: {text}")
+                next_line = line_end + 1
+                if len(results) >= max_matches:
+                    results.append(f"[stopped after {max_matches} matches]")
+                    break
+        if not results:
+            return f"No matches for {pattern!r} in {filename}."
+        return "\n".join(results)
+    except re.error as e:
+        return f"Search failed: invalid regular expression: {e}"
+    except Exception as e:
+        return f"Search failed: {str(e)}"
+
+class FileInfoInput(BaseModel):
+    filename: str = Field(..., description="Path of the file, relative to agent_working.")
+
+@tool(args_schema=FileInfoInput)
+def file_info(filename: str) -> str:
+    """
+    Size, line count, modification time and first line of a file in 'agent_working',
+    to decide how to read it in slices.
+    """
+    filepath = resolve_path(filename)
+    if filepath is None:
+        return "Error: Attempt to read outside agent_working is not allowed."
+
+    try:
+        stat = os.stat(filepath)
+        if os.path.isdir(filepath):
+            entries = sorted(os.listdir(filepath))
+            return f"{filename}: directory with {len(entries)} entries: {', '.join(entries[:50])}"
+        with open(filepath, "rb") as f:
+            head = f.read(8192)
+            binary = b"\0" in head
+            lines = None if binary else _count_lines(f)
+        first_line = "" if binary else _decode(head.split(b"\n", 1)[0][:MAX_LINE_CHARS]).rstrip("\r")
+        info = [
+            f"{filename}: {stat.st_size} bytes",
+            "binary" if binary else f"{lines} lines",
+            f"modified {datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')}",
+        ]
+        return ", ".join(info) + (f"\nFirst line: {first_line}" if first_line else "")
+    except Exception as e:
+        return f"Stat failed: {str(e)}"
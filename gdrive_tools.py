@@ -1,12 +1,13 @@
 from langchain.tools import tool
 from pydantic import BaseModel, Field
 from typing import Optional
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import io
-from googleapiclient.discovery import build
-from get_google_service import get_google_credentials
 import os
 
+def get_drive_service():
+    from get_google_service import get_service  # Google API client libraries load on first use
+    return get_service('drive', 'v3')
+
 class UploadDriveInput(BaseModel):
     local_path: str = Field(..., description="The local path of the file to upload.")
     drive_folder_id: Optional[str] = Field(None, description="The ID of the Google Drive folder to upload to.")
@@ -14,8 +15,9 @@ class UploadDriveInput(BaseModel):
 @tool
 def upload_drive_file(input_data: UploadDriveInput) -> str:
     """Uploads a local file to Google Drive, optionally to a specific folder."""
+    from googleapiclient.http import MediaFileUpload
     try:
-        service = build('drive', 'v3', credentials=get_google_credentials())
+        service = get_drive_service()
         file_metadata = {'name': os.path.basename(input_data.local_path)}
         if input_data.drive_folder_id:
             file_metadata['parents'] = [input_data.drive_folder_id]
@@ -34,8 +36,9 @@ class DownloadDriveInput(BaseModel):
 @tool
 def download_drive_file(input_data: DownloadDriveInput) -> str:
     """Downloads a file from Google Drive to a local path."""
+    from googleapiclient.http import MediaIoBaseDownload
     try:
-        service = build('drive', 'v3', credentials=get_google_credentials())
+        service = get_drive_service()
         request = service.files().get_media(fileId=input_data.file_id)
         fh = io.FileIO(input_data.local_path, 'wb')
         downloader = MediaIoBaseDownload(fh, request)
@@ -56,7 +59,7 @@ def list_drive_files(input_data: ListDriveInput) -> str:
     Lists files in Google Drive matching a search query.
     """
     try:
-        service = build('drive', 'v3', credentials=get_google_credentials())
+        service = get_drive_service()
         results = service.files().list(q=input_data.query, pageSize=input_data.max_results, fields="files(id, name, mimeType)").execute()
         files = results.get('files', [])
         if not files:
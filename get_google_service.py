@@ -2,9 +2,15 @@ from langchain.tools import tool
 from datetime import datetime, timedelta
 import os
 import pickle
+import threading
+import time
+import httplib2
+import google_auth_httplib2
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 from google.auth.transport.requests import Request
+import tracing
 
 # Add calendar scope + your previous scopes
 GOOGLE_SCOPES = [
@@ -14,18 +20,146 @@ GOOGLE_SCOPES = [
     "https://www.googleapis.com/auth/drive", # Google Drive scope
 ]
 
-def get_google_credentials(scopes=None):
-    scopes = scopes or GOOGLE_SCOPES
+TOKEN_FILE = "token.pickle"
+CLIENT_SECRETS_FILE = "credentials.json"
+REFRESH_MARGIN = timedelta(minutes=5)  # refresh this long before the access token expires
+HTTP_TIMEOUT = 60
+
+# Process-wide state: one credentials object, one built client per (api, version),
+# and one pooled (keep-alive) HTTP connection set per thread, since httplib2 is not thread-safe.
+_creds = None
+_creds_lock = threading.RLock()
+_services = {}
+_services_lock = threading.Lock()
+_local = threading.local()
+_refresher = None
+
+
+def _save_credentials(creds):
+    with open(TOKEN_FILE, 'wb') as token:
+        pickle.dump(creds, token)
+
+
+def _needs_refresh(creds) -> bool:
+    if not creds.valid:
+        return True
+    return creds.expiry is not None and creds.expiry - REFRESH_MARGIN <= datetime.utcnow()
+
+
+def _load_credentials(scopes):
     creds = None
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, 'rb') as token:
             creds = pickle.load(token)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', scopes)
+            flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, scopes)
             creds = flow.run_local_server(port=8080)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    return creds
\ No newline at end of file
+        _save_credentials(creds)
+    return creds
+
+
+def _refresh_loop():
+    """Background thread: refresh the shared token shortly before it expires."""
+    while True:
+        with _creds_lock:
+            creds = _creds
+        if creds is None or creds.expiry is None or not creds.refresh_token:
+            return
+        wait = (creds.expiry - REFRESH_MARGIN - datetime.utcnow()).total_seconds()
+        if wait > 0:
+            time.sleep(wait)
+            continue
+        try:
+            with _creds_lock:
+                creds.refresh(Request())
+                _save_credentials(creds)
+        except Exception as e:
+            print(f"[Google Auth Error] Background token refresh failed: {e}")
+            time.sleep(60)
+
+
+def _start_refresher():
+    global _refresher
+    if _refresher is None or not _refresher.is_alive():
+        _refresher = threading.Thread(target=_refresh_loop, name="google-token-refresh", daemon=True)
+        _refresher.start()
+
+
+def get_google_credentials(scopes=None):
+    """
+    Returns the process-wide Google credentials, loading token.pickle (or running the
+    OAuth flow) only on first use. A background thread keeps the token refreshed.
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            _creds = _load_credentials(scopes or GOOGLE_SCOPES)
+            _start_refresher()
+        elif _needs_refresh(_creds) and _creds.refresh_token:
+            _creds.refresh(Request())
+            _save_credentials(_creds)
+        return _creds
+
+
+class _TracedHttp(google_auth_httplib2.AuthorizedHttp):
+    """AuthorizedHttp that records each request as a span of the current agent turn (see tracing.py)."""
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        with tracing.span(f"{method} {uri.split('?', 1)[0]}", kind="http", method=method, request_bytes=_body_size(body)) as span:
+            response, content = super().request(uri, method=method, body=body, headers=headers, **kwargs)
+            span.set(status=response.status, response_bytes=len(content or b""))
+            return response, content
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return -1  # a stream; its size is not known up front
+
+
+def _thread_http():
+    """The calling thread's authorized, connection-reusing HTTP object."""
+    creds = get_google_credentials()
+    http = getattr(_local, "http", None)
+    if http is None or http.credentials is not creds:
+        http = _TracedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        _local.http = http
+    return http
+
+
+def _build_request(http, *args, **kwargs):
+    # Route every request of a shared client through the calling thread's own HTTP object
+    return HttpRequest(_thread_http(), *args, **kwargs)
+
+
+def get_service(api: str, version: str):
+    """
+    Returns the shared client for a Google API, building it (and parsing its discovery
+    document) once per process. Safe to use from multiple threads.
+    """
+    key = (api, version)
+    service = _services.get(key)
+    if service is not None:
+        return service
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = build(api, version, http=_thread_http(), requestBuilder=_build_request, cache_discovery=False)
+            _services[key] = service
+        return service
+
+def set_service(api: str, version: str, service):
+    """
+    Install `service` as the shared client for (api, version), e.g. a local stand-in for
+    offline benchmarks. Passing None drops it, so the next call builds the real client.
+    """
+    with _services_lock:
+        if service is None:
+            _services.pop((api, version), None)
+        else:
+            _services[(api, version)] = service
@@ -0,0 +1,317 @@
+"""
+Optional local mirror of the mailbox (SQLite + FTS5 under agent_working/).
+
+Enable with GMAIL_MIRROR=1. The first sync pulls the newest GMAIL_MIRROR_INITIAL_MESSAGES
+messages; after that only the deltas reported by users.history.list are fetched. Headers
+and the plain-text body of every message go into a full-text index, so free-text terms and
+from:/to:/subject: match whole words the way Gmail does. `read_gmail` answers from the
+mirror when it is fresher than GMAIL_MIRROR_MAX_AGE seconds and the query only uses syntax
+the mirror can evaluate (words, "phrases", OR, from:, to:, subject:, label:/in:/is:,
+after:/before: ...); anything else goes to the API.
+"""
+import base64
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from html import unescape
+from typing import List, Optional
+import sqlite_store
+
+AGENT_DIR = "agent_working"
+MIRROR_PATH = os.path.join(AGENT_DIR, "gmail_mirror.sqlite3")
+MIRROR_BODY_CHARS = int(os.getenv("GMAIL_MIRROR_BODY_CHARS", "20000"))  # body text indexed per message
+SCHEMA_VERSION = "2"  # older mirrors have no body index and are rebuilt
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+
+# Labels the mirror can filter on; user label names are not mirrored (only their IDs are)
+_SYSTEM_LABELS = {"INBOX", "SENT", "DRAFT", "STARRED", "UNREAD", "IMPORTANT"}
+_EXCLUDED_LABELS = ("SPAM", "TRASH")  # Gmail search skips these unless asked explicitly
+_TOKEN = re.compile(r'(-?)(\w+):("[^"]*"|\S+)|(-?)("[^"]*"|\S+)')
+_RELATIVE = re.compile(r"^(\d+)([dmy])$")
+_TEXT_COLUMNS = {"from": "sender", "to": "recipients", "subject": "subject"}
+_TAGS = re.compile(r"<[^>]*>")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    doc INTEGER PRIMARY KEY,  -- rowid of the message's messages_fts row
+    id TEXT UNIQUE,
+    thread_id TEXT,
+    internal_date INTEGER,
+    sender TEXT,
+    recipients TEXT,
+    subject TEXT,
+    snippet TEXT,
+    labels TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (internal_date DESC);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    sender, recipients, subject, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def enabled() -> bool:
+    return os.getenv("GMAIL_MIRROR", "").lower() in ("1", "true", "yes")
+
+
+def _parse_date(value: str) -> Optional[int]:
+    """Gmail after:/before: dates (YYYY/MM/DD, local midnight) → epoch milliseconds."""
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            pass
+    return None
+
+
+def _parse_relative(value: str) -> Optional[int]:
+    """Gmail newer_than:/older_than: spans (2d, 3m, 1y) → cutoff in epoch milliseconds."""
+    m = _RELATIVE.match(value)
+    if not m:
+        return None
+    days = int(m.group(1)) * {"d": 1, "m": 30, "y": 365}[m.group(2)]
+    return int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
+
+
+def _fts_term(column: Optional[str], value: str) -> Optional[str]:
+    """An FTS5 phrase for `value` (limited to `column` if given), matching whole words in order."""
+    words = re.findall(r"\w+", value)
+    if not words:
+        return None
+    phrase = '"' + " ".join(words) + '"'
+    return f"{column} : {phrase}" if column else phrase
+
+
+def _translate(query: str):
+    """
+    Translate a Gmail search query into (where_clauses, params), or None if it uses
+    syntax the mirror cannot answer faithfully (parentheses, braces, has:, user labels,
+    negated labels or dates, ...). Words, phrases and from:/to:/subject: become one
+    full-text MATCH over the mirrored headers and bodies; OR joins two of them.
+    """
+    clauses = [f"labels NOT LIKE '% {label} %'" for label in _EXCLUDED_LABELS]
+    params = []
+    groups, excluded = [], []  # ANDed groups of ORed FTS terms; FTS terms to exclude
+    can_join = join_next = False
+    for m in _TOKEN.finditer(query):
+        negated, op, value, bare_negated, bare = m.groups()
+        if op is None:
+            if bare == "OR":  # Gmail only treats the upper-case word as an operator
+                if not can_join or join_next:
+                    return None
+                join_next = True
+                continue
+            if bare == "AND":
+                continue
+            if any(c in bare for c in "(){}"):
+                return None
+            column, value, negated = None, bare, bare_negated
+        else:
+            op = op.lower()
+            if op not in _TEXT_COLUMNS:
+                if negated or join_next:
+                    return None
+                can_join = False
+            column = _TEXT_COLUMNS.get(op)
+        if op is None or column is not None:
+            term = _fts_term(column, value)
+            if term is None or (negated and join_next):
+                return None
+            if negated:
+                excluded.append(term)
+            elif join_next:
+                groups[-1].append(term)
+            else:
+                groups.append([term])
+            can_join, join_next = not negated, False
+            continue
+        value = value.strip('"')
+        if op in ("is", "in", "label", "category"):
+            label = value.upper()
+            if op == "is" and label == "READ":
+                clauses.append("labels NOT LIKE '% UNREAD %'")
+                continue
+            if op == "category":
+                label = f"CATEGORY_{label}"
+            elif label not in _SYSTEM_LABELS:
+                return None
+            clauses.append("labels LIKE ?")
+            params.append(f"% {label} %")
+        elif op in ("after", "before", "newer_than", "older_than"):
+            cutoff = _parse_date(value) if op in ("after", "before") else _parse_relative(value)
+            if cutoff is None:
+                return None
+            clauses.append("internal_date >= ?" if op in ("after", "newer_than") else "internal_date < ?")
+            params.append(cutoff)
+        else:
+            return None
+    if join_next:
+        return None  # a trailing OR
+    if groups:
+        clauses.append("doc IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+        params.append(" AND ".join(g[0] if len(g) == 1 else "(" + " OR ".join(g) + ")" for g in groups))
+    for term in excluded:
+        clauses.append("doc NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+        params.append(term)
+    return clauses, params
+
+
+def _body_text(payload: dict) -> str:
+    """Text of a format=full payload: its text/plain parts, else its text/html parts without tags."""
+    plain, html = [], []
+    parts = [payload]
+    while parts:
+        part = parts.pop(0)
+        parts.extend(part.get("parts", []))
+        data = part.get("body", {}).get("data")
+        if not data or part.get("filename"):
+            continue
+        text = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", "replace")
+        if part.get("mimeType") == "text/plain":
+            plain.append(text)
+        elif part.get("mimeType") == "text/html":
+            html.append(text)
+    text = "\n".join(plain) if plain else unescape(_TAGS.sub(" ", "\n".join(html)))
+    return text[:MIRROR_BODY_CHARS]
+
+
+class GmailMirror:
+    def __init__(self, path: str = MIRROR_PATH, max_age: float = None, initial_messages: int = None):
+        self.path = path
+        self.max_age = max_age if max_age is not None else float(os.getenv("GMAIL_MIRROR_MAX_AGE", "60"))
+        self.initial_messages = initial_messages or int(os.getenv("GMAIL_MIRROR_INITIAL_MESSAGES", "2000"))
+        self._sync_lock = threading.Lock()
+        sqlite_store.create(path, _SCHEMA)
+        with sqlite_store.connect(self.path) as conn:
+            if sqlite_store.get_state(conn, "schema_version") != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE messages; DROP TABLE messages_fts; DELETE FROM state;" + _SCHEMA)
+                sqlite_store.set_state(conn, schema_version=SCHEMA_VERSION)
+
+    def _upsert(self, conn, msg: dict):
+        payload = msg.get("payload", {})
+        headers = {h["name"].lower(): h["value"] for h in payload.get("headers", [])}
+        recipients = ", ".join(v for v in (headers.get("to"), headers.get("cc")) if v)  # Gmail's to: covers Cc
+        self._delete(conn, msg["id"])
+        doc = conn.execute(
+            "INSERT INTO messages (id, thread_id, internal_date, sender, recipients, subject, snippet, labels) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                msg["id"], msg.get("threadId"), int(msg.get("internalDate", 0)),
+                headers.get("from", ""), recipients, headers.get("subject", ""),
+                msg.get("snippet", ""), " " + " ".join(msg.get("labelIds", [])) + " ",
+            ),
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO messages_fts (rowid, sender, recipients, subject, body) VALUES (?, ?, ?, ?, ?)",
+            (doc, headers.get("from", ""), recipients, headers.get("subject", ""), _body_text(payload) or msg.get("snippet", "")),
+        )
+
+    def _delete(self, conn, msg_id: str):
+        conn.execute("DELETE FROM messages_fts WHERE rowid = (SELECT doc FROM messages WHERE id = ?)", (msg_id,))
+        conn.execute("DELETE FROM messages WHERE id = ?", (msg_id,))
+
+    def full_sync(self, service):
+        from gmail_tools import list_message_ids, fetch_message_metadata
+
+        # Take the history checkpoint first so changes made while listing are replayed later
+        history_id = service.users().getProfile(userId="me").execute()["historyId"]
+        ids = list_message_ids(service, "", self.initial_messages)
+        messages = fetch_message_metadata(service, ids, format="full")
+        with sqlite_store.connect(self.path) as conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM messages_fts")
+            for msg in messages:
+                self._upsert(conn, msg)
+            sqlite_store.set_state(
+                conn, history_id=history_id, last_sync=time.time(),
+                complete=int(len(ids) < self.initial_messages),
+            )
+
+    def incremental_sync(self, service, history_id: str):
+        from googleapiclient.errors import HttpError  # the API client is loaded by then anyway
+        from gmail_tools import fetch_message_metadata
+
+        added, deleted, relabeled = [], set(), {}
+        page_token = None
+        try:
+            while True:
+                resp = service.users().history().list(
+                    userId="me", startHistoryId=history_id, historyTypes=HISTORY_TYPES,
+                    maxResults=500, pageToken=page_token,
+                ).execute()
+                for record in resp.get("history", []):
+                    for item in record.get("messagesAdded", []):
+                        added.append(item["message"]["id"])
+                    for item in record.get("messagesDeleted", []):
+                        deleted.add(item["message"]["id"])
+                    for item in record.get("labelsAdded", []) + record.get("labelsRemoved", []):
+                        relabeled[item["message"]["id"]] = item["message"].get("labelIds", [])
+                new_history_id = resp.get("historyId", history_id)
+                page_token = resp.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status == 404:  # checkpoint too old; Gmail requires a full resync
+                return self.full_sync(service)
+            raise
+
+        added = [msg_id for msg_id in dict.fromkeys(added) if msg_id not in deleted]
+        messages = fetch_message_metadata(service, added, format="full") if added else []
+        with sqlite_store.connect(self.path) as conn:
+            for msg in messages:
+                self._upsert(conn, msg)
+            for msg_id in deleted:
+                self._delete(conn, msg_id)
+            for msg_id, labels in relabeled.items():
+                if msg_id not in deleted:
+                    conn.execute("UPDATE messages SET labels = ? WHERE id = ?", (" " + " ".join(labels) + " ", msg_id))
+            sqlite_store.set_state(conn, history_id=new_history_id, last_sync=time.time())
+
+    def sync(self, service, force: bool = False):
+        """Bring the mirror up to date unless it was synced within `max_age` seconds."""
+        with self._sync_lock:
+            with sqlite_store.connect(self.path) as conn:
+                history_id = sqlite_store.get_state(conn, "history_id")
+                last_sync = float(sqlite_store.get_state(conn, "last_sync") or 0)
+            if not force and history_id and time.time() - last_sync < self.max_age:
+                return
+            if history_id:
+                self.incremental_sync(service, history_id)
+            else:
+                self.full_sync(service)
+
+    def search(self, service, query: str = "", max_results: int = 5) -> Optional[List[dict]]:
+        """
+        Answer a Gmail search from the mirror, newest first. Returns None when the query can't
+        be translated, or when the mirror holds only part of the mailbox and the match count
+        alone can't rule out older results; callers should then query the API.
+        """
+        translated = _translate(query)
+        if translated is None:
+            return None
+        self.sync(service)
+        clauses, params = translated
+        sql = "SELECT id, sender, subject, snippet FROM messages"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY internal_date DESC LIMIT ?"
+        with sqlite_store.connect(self.path) as conn:
+            rows = conn.execute(sql, params + [max_results]).fetchall()
+            complete = sqlite_store.get_state(conn, "complete") == "1"
+        if len(rows) < max_results and not complete:
+            return None
+        return [{"id": r[0], "from": r[1], "subject": r[2], "snippet": r[3]} for r in rows]
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> GmailMirror:
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = GmailMirror()
+        return _mirror
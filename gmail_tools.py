@@ -1,14 +1,103 @@
 from langchain.tools import tool
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import os
+import base64
+import contextvars
+import csv
 import pickle
-from googleapiclient.discovery import build
-from get_google_service import get_google_credentials
+import re
+import time
+import gmail_mirror
+import tracing
+from file_tools import resolve_path
+from rate_limiter import TokenBucket, backoff_delay
 
 def get_gmail_service():
-    creds = get_google_credentials()
-    return build('gmail', 'v1', credentials=creds)
+    from get_google_service import get_service  # Google API client libraries load on first use
+    return get_service('gmail', 'v1')
+
+GMAIL_MAX_MESSAGE_BYTES = 35 * 1024 * 1024  # messages.send media upload limit, after base64
+GMAIL_RESUMABLE_THRESHOLD = 5 * 1024 * 1024  # larger messages are uploaded in resumable chunks
+GMAIL_UPLOAD_CHUNK_BYTES = int(os.getenv("GMAIL_UPLOAD_CHUNK_BYTES", str(4 * 1024 * 1024)))  # multiple of 256 KiB
+MIME_SPOOL_BYTES = 1024 * 1024  # messages up to this size are built in memory, larger ones in a temp file
+BASE64_READ_BYTES = 57 * 1024  # whole 76-character base64 lines per read
+
+def _header_block(headers) -> bytes:
+    """RFC 5322 header lines (non-ASCII values encoded) followed by the blank line."""
+    from email import policy
+    from email.message import EmailMessage
+    message = EmailMessage(policy=policy.SMTP)
+    for name, value, params in headers:
+        message.add_header(name, value, **params)
+    return b"".join(policy.SMTP.fold_binary(name, value) for name, value in message.items()) + b"\r\n"
+
+def _write_base64(out, src):
+    for chunk in iter(lambda: src.read(BASE64_READ_BYTES), b""):
+        out.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+
+def write_mime(out, recipient: str, subject: str, body: str, attachments: Optional[List[str]] = None,
+               message_id: Optional[str] = None):
+    """
+    Write a multipart/mixed message to the binary file `out`, streaming each attachment
+    through base64 in small blocks, so memory use doesn't grow with attachment size.
+    `message_id` sets the Message-ID header (one is generated if not given).
+    """
+    import io
+    import mimetypes
+    import uuid
+    from email.utils import make_msgid
+
+    boundary = f"=============={uuid.uuid4().hex}=="
+    out.write(_header_block([
+        ("To", recipient, {}),
+        ("Subject", subject, {}),
+        ("Message-ID", message_id or make_msgid(), {}),
+        ("MIME-Version", "1.0", {}),
+        ("Content-Type", "multipart/mixed", {"boundary": boundary}),
+    ]))
+    out.write(f"--{boundary}\r\n".encode())
+    out.write(_header_block([
+        ("Content-Type", "text/plain", {"charset": "utf-8"}),
+        ("Content-Transfer-Encoding", "base64", {}),
+    ]))
+    _write_base64(out, io.BytesIO(body.encode("utf-8")))
+    for file_path in attachments or []:
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        out.write(f"\r\n--{boundary}\r\n".encode())
+        out.write(_header_block([
+            ("Content-Type", content_type, {}),
+            ("Content-Disposition", "attachment", {"filename": os.path.basename(file_path)}),
+            ("Content-Transfer-Encoding", "base64", {}),
+        ]))
+        with open(file_path, "rb") as f:
+            _write_base64(out, f)
+    out.write(f"\r\n--{boundary}--\r\n".encode())
+
+def send_message(service, recipient: str, subject: str, body: str, attachments: Optional[List[str]] = None,
+                 message_id: Optional[str] = None) -> dict:
+    """
+    Send a message through the Gmail media upload endpoint as message/rfc822. The MIME is
+    spooled to a temp file once it outgrows MIME_SPOOL_BYTES, and messages over
+    GMAIL_RESUMABLE_THRESHOLD are uploaded in GMAIL_UPLOAD_CHUNK_BYTES chunks.
+    """
+    import tempfile
+    from googleapiclient.http import MediaIoBaseUpload
+
+    with tempfile.SpooledTemporaryFile(max_size=MIME_SPOOL_BYTES) as spool:
+        write_mime(spool, recipient, subject, body, attachments, message_id)
+        size = spool.tell()
+        if size > GMAIL_MAX_MESSAGE_BYTES:
+            raise ValueError(
+                f"the encoded message is {size / 2**20:.1f} MB and Gmail accepts at most "
+                f"{GMAIL_MAX_MESSAGE_BYTES / 2**20:.0f} MB; upload large files to Drive and send a link instead"
+            )
+        spool.seek(0)
+        media = MediaIoBaseUpload(
+            spool, mimetype="message/rfc822", chunksize=GMAIL_UPLOAD_CHUNK_BYTES, resumable=size > GMAIL_RESUMABLE_THRESHOLD
+        )
+        return service.users().messages().send(userId="me", body={}, media_body=media).execute()
 
 class SendGmailInput(BaseModel):
     recipient: str = Field(..., description="The recipient's email address.")
@@ -20,35 +109,72 @@ class SendGmailInput(BaseModel):
 def send_gmail(recipient: str, subject: str, body: str, attachments: Optional[List[str]] = None) -> str:
     """Send an email with optional attachments."""
     try:
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        from email.mime.base import MIMEBase
-        from email import encoders
-        import base64
-
-        service = get_gmail_service()
-        message = MIMEMultipart()
-        message["to"] = recipient
-        message["subject"] = subject
-        message.attach(MIMEText(body, "plain"))
-
-        if attachments:
-            for file_path in attachments:
-                with open(file_path, "rb") as f:
-                    part = MIMEBase("application", "octet-stream")
-                    part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition", f"attachment; filename={os.path.basename(file_path)}"
-                )
-                message.attach(part)
-
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        result = service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
+        result = send_message(get_gmail_service(), recipient, subject, body, attachments)
         return f"Email sent! Message ID: {result['id']}"
     except Exception as e:
         return f"Failed to send email: {e}"
 
+GMAIL_LIST_PAGE_SIZE = 500  # messages().list hard limit per page
+GMAIL_BATCH_SIZE = 50  # Gmail recommends at most 50 calls per batch request
+GMAIL_BATCH_RETRIES = 3
+
+def list_message_ids(service, query: str = "", max_results: int = 5) -> List[str]:
+    """Collect up to `max_results` message IDs matching `query`, following nextPageToken."""
+    ids = []
+    page_token = None
+    while len(ids) < max_results:
+        results = service.users().messages().list(
+            userId="me", q=query, maxResults=min(GMAIL_LIST_PAGE_SIZE, max_results - len(ids)), pageToken=page_token
+        ).execute()
+        ids.extend(m["id"] for m in results.get("messages", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+    return ids[:max_results]
+
+def fetch_message_metadata(service, message_ids: List[str], headers=("Subject", "From"), format: str = "metadata") -> List[dict]:
+    """
+    Fetch metadata (selected headers, snippet, labels) for many messages through the Gmail
+    batch endpoint, one HTTP round trip per GMAIL_BATCH_SIZE messages. Calls that fail inside
+    a batch (mostly per-user rate limits) are re-batched up to GMAIL_BATCH_RETRIES times,
+    after an exponential backoff. Results keep the order of `message_ids`.
+    format="full" also returns the body parts (and every header).
+    """
+    fetched = {}
+
+    def run_batch(ids):
+        failed = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            else:
+                failed.append(request_id)
+
+        for start in range(0, len(ids), GMAIL_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for msg_id in ids[start:start + GMAIL_BATCH_SIZE]:
+                if format == "metadata":
+                    request = service.users().messages().get(userId="me", id=msg_id, format=format, metadataHeaders=list(headers))
+                else:
+                    request = service.users().messages().get(userId="me", id=msg_id, format=format)
+                batch.add(request, request_id=msg_id)
+            batch.execute()
+        return failed
+
+    failed = run_batch(list(dict.fromkeys(message_ids)))
+    for attempt in range(GMAIL_BATCH_RETRIES):
+        if not failed:
+            break
+        # Rate-limited calls fail the same way if retried at once
+        time.sleep(backoff_delay(attempt, base=1.0))
+        failed = run_batch(failed)
+    return [fetched[msg_id] for msg_id in message_ids if msg_id in fetched]
+
+def _header(msg_data: dict, name: str) -> str:
+    headers = msg_data.get("payload", {}).get("headers", [])
+    return next((h["value"] for h in headers if h["name"].lower() == name.lower()), "")
+
 class ReadGmailInput(BaseModel):
     query: str = Field("", description="The query to search for in emails.")
     max_results: int = Field(5, description="The maximum number of emails to return.")
@@ -57,24 +183,253 @@ class ReadGmailInput(BaseModel):
 def read_gmail(query: str = "", max_results: int = 5) -> str:
     """Read recent emails matching a query."""
     try:
-        import base64
-        from email import message_from_bytes
-
         service = get_gmail_service()
-        results = service.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-        messages = results.get("messages", [])
-        if not messages:
+        emails = None
+        if gmail_mirror.enabled():
+            try:
+                emails = gmail_mirror.get_mirror().search(service, query, max_results)
+            except Exception as e:
+                print(f"[Gmail Mirror Error] Falling back to the API: {e}")
+        if emails is None:
+            message_ids = list_message_ids(service, query, max_results)
+            emails = [
+                {"from": _header(m, "From"), "subject": _header(m, "Subject"), "snippet": m.get("snippet", "")}
+                for m in fetch_message_metadata(service, message_ids)
+            ]
+        if not emails:
             return "No emails found."
         summary = ""
-        for msg in messages:
-            msg_id = msg["id"]
-            msg_data = service.users().messages().get(userId="me", id=msg_id, format="full").execute()
-            headers = msg_data["payload"].get("headers", [])
-            subject = next((h["value"] for h in headers if h["name"] == "Subject"), "")
-            from_ = next((h["value"] for h in headers if h["name"] == "From"), "")
-            snippet = msg_data.get("snippet", "")
+        for email in emails:
+            subject = email["subject"]
+            from_ = email["from"]
+            snippet = email["snippet"]
             summary += f"From: {from_}\nSubject: {subject}\nSnippet: {snippet[:250]}...\n{'-'*40}\n"
         return summary
     except Exception as e:
         return f"Failed to read email: {e}"
 
+# --- Mail merge ---
+AGENT_DIR = "agent_working"
+BULK_MAX_RECIPIENTS = int(os.getenv("GMAIL_BULK_MAX_RECIPIENTS", "500"))  # roughly a consumer account's daily send limit
+BULK_CONCURRENCY = int(os.getenv("GMAIL_SEND_CONCURRENCY", "4"))
+BULK_MAX_ATTEMPTS = 4
+BULK_REPORT_FAILURES = 20  # failed rows listed in the tool's reply; all rows are in the CSV report
+SERVER_ERROR_STATUSES = {500, 502, 503, 504}  # the send may still have gone through
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}  # sent as 403s
+EMAIL_PATTERN = re.compile(r"^[^@\s,;<>]+@[^@\s,;<>]+\.[^@\s,;<>]+$")
+
+# Shared by every thread and every agent process using agent_working/; Gmail allows about
+# 2.5 sends/s per user (100 quota units per send, 250 units/s)
+send_limiter = TokenBucket(
+    rate_per_sec=float(os.getenv("GMAIL_SEND_RATE", "2")),
+    capacity=float(os.getenv("GMAIL_SEND_BURST", "5")),
+    state_file=os.path.join(AGENT_DIR, ".gmail_send_ratelimit.json"),
+)
+
+class _Row(dict):
+    """Template fields of one recipient; a missing field raises KeyError naming the column."""
+
+    def __missing__(self, key):
+        raise KeyError(key)
+
+def _send_error(error) -> tuple:
+    """
+    (outcome, retry_after seconds) for an exception raised while sending. outcome is
+    "retry" when Gmail refused the message (rate limits), "check" when it may have
+    accepted it anyway (5xx, dropped connection), and "fail" otherwise.
+    """
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is None:
+        return ("check" if isinstance(error, (ConnectionError, TimeoutError)) else "fail"), None
+    retry_after = getattr(error, "resp", {}).get("retry-after")
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+        retry_after = None
+    if status == 429:
+        return "retry", retry_after
+    if status == 403:
+        reasons = {d.get("reason") for d in getattr(error, "error_details", None) or [] if isinstance(d, dict)}
+        limited = bool(reasons & RATE_LIMIT_REASONS) or "rateLimitExceeded" in str(error)
+        return ("retry" if limited else "fail"), retry_after
+    return ("check" if status in SERVER_ERROR_STATUSES else "fail"), retry_after
+
+def _find_sent(service, message_id: str) -> Optional[str]:
+    """Gmail ID of the sent message with this Message-ID header, if Gmail has it."""
+    result = service.users().messages().list(userId="me", q=f"rfc822msgid:{message_id.strip('<>')}", maxResults=1).execute()
+    found = result.get("messages") or []
+    return found[0]["id"] if found else None
+
+def _send_with_retries(service, message: dict) -> dict:
+    """
+    Send one rendered message, waiting on the shared rate limit; returns its status row.
+    After a 5xx or dropped connection Gmail may already have the message, so it is only
+    resent once a search by its Message-ID comes back empty.
+    """
+    from email.utils import make_msgid
+
+    message_id = make_msgid()  # the same for every attempt, so a delivered copy can be found
+    for attempt in range(BULK_MAX_ATTEMPTS):
+        send_limiter.acquire()
+        try:
+            with tracing.span("gmail.send", kind="http", recipient=message["recipient"], attempt=attempt + 1):
+                result = send_message(
+                    service, message["recipient"], message["subject"], message["body"], message["attachments"], message_id
+                )
+            return {"status": "sent", "message_id": result.get("id", ""), "attempts": attempt + 1, "error": ""}
+        except Exception as e:
+            outcome, retry_after = _send_error(e)
+            failed = {"status": "failed", "message_id": "", "attempts": attempt + 1, "error": str(e)[:300]}
+            if outcome == "fail" or attempt == BULK_MAX_ATTEMPTS - 1:
+                if outcome == "check":
+                    failed["error"] = f"may have been sent; check Sent before resending: {failed['error']}"
+                return failed
+            time.sleep(backoff_delay(attempt, base=1.0, retry_after=retry_after))
+            if outcome == "check":
+                try:
+                    sent_id = _find_sent(service, message_id)
+                except Exception as lookup_error:
+                    failed["error"] = f"may have been sent (lookup failed: {lookup_error}); check Sent before resending"
+                    return failed
+                if sent_id:
+                    return {"status": "sent", "message_id": sent_id, "attempts": attempt + 1, "error": ""}
+
+def _load_rows(csv_file: Optional[str], rows: Optional[List[Dict[str, Any]]]) -> List[dict]:
+    if rows:
+        return [dict(r) for r in rows]
+    if not csv_file:
+        raise ValueError("give either csv_file or rows")
+    path = resolve_path(csv_file)
+    if path is None:
+        raise ValueError("the CSV file must be inside agent_working")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [{k.strip(): (v or "").strip() for k, v in r.items() if k} for r in csv.DictReader(f)]
+
+def render_messages(
+    rows: List[dict], subject_template: str, body_template: str, recipient_column: str = "email",
+    attachments: Optional[List[str]] = None, attachment_column: Optional[str] = None,
+) -> List[dict]:
+    """
+    One message per row, with {column} placeholders filled in. Rows that can't be sent
+    (bad address, unknown placeholder, missing attachment) get status "skipped" and an error.
+    Every attachment must be inside agent_working; a shared one outside it raises ValueError.
+    """
+    shared = []
+    for path in attachments or []:
+        resolved = resolve_path(path)
+        if resolved is None:
+            raise ValueError(f"attachment outside agent_working: {path}")
+        shared.append(resolved)
+    messages = []
+    for number, row in enumerate(rows, 1):
+        fields = _Row(row)
+        recipient = str(row.get(recipient_column) or "").strip()
+        message = {"row": number, "recipient": recipient, "status": "ready", "error": ""}
+        try:
+            if not EMAIL_PATTERN.match(recipient):
+                raise ValueError(f"invalid address in column '{recipient_column}': {recipient!r}")
+            files = list(shared)
+            if attachment_column and row.get(attachment_column):
+                # Paths from the data are confined to agent_working too, like the CSV itself
+                for path in (p.strip() for p in str(row[attachment_column]).split(";") if p.strip()):
+                    resolved = resolve_path(path)
+                    if resolved is None:
+                        raise ValueError(f"attachment outside agent_working: {path}")
+                    files.append(resolved)
+            missing = [p for p in files if not os.path.isfile(p)]
+            if missing:
+                raise ValueError(f"attachment not found: {', '.join(missing)}")
+            message.update(
+                subject=subject_template.format_map(fields), body=body_template.format_map(fields), attachments=files
+            )
+        except KeyError as e:
+            message.update(status="skipped", error=f"no column {e} for a template placeholder")
+        except (ValueError, IndexError) as e:
+            message.update(status="skipped", error=str(e))
+        messages.append(message)
+    return messages
+
+def _write_report(messages: List[dict]) -> str:
+    import uuid
+    from datetime import datetime
+    path = os.path.join(AGENT_DIR, f"mail_merge_report_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["row", "recipient", "status", "attempts", "message_id", "error"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(messages)
+    return path
+
+class SendBulkGmailInput(BaseModel):
+    subject_template: str = Field(..., description="Subject with {column} placeholders, e.g. 'Invoice {invoice_no}'.")
+    body_template: str = Field(..., description="Plain-text body with {column} placeholders; write {{ and }} for literal braces.")
+    csv_file: Optional[str] = Field(None, description="CSV file in agent_working with a header row, one recipient per row.")
+    rows: Optional[List[Dict[str, Any]]] = Field(None, description="Recipient rows given inline instead of csv_file.")
+    recipient_column: str = Field("email", description="Column holding each recipient's email address.")
+    attachments: Optional[List[str]] = Field(None, description="File paths in agent_working attached to every message.")
+    attachment_column: Optional[str] = Field(
+        None, description="Column with per-recipient attachment paths in agent_working, separated by ';'."
+    )
+    dry_run: bool = Field(False, description="Only render and validate the messages, and preview the first one.")
+
+@tool(args_schema=SendBulkGmailInput)
+def send_bulk_gmail(
+    subject_template: str,
+    body_template: str,
+    csv_file: Optional[str] = None,
+    rows: Optional[List[Dict[str, Any]]] = None,
+    recipient_column: str = "email",
+    attachments: Optional[List[str]] = None,
+    attachment_column: Optional[str] = None,
+    dry_run: bool = False,
+) -> str:
+    """
+    Mail merge: send a personalized email to every row of a CSV file (or inline rows) in
+    one call. Placeholders like {first_name} are filled from the row's columns. Sends run
+    in parallel under a shared rate limit with retries, and the reply is a short status
+    summary; the per-recipient status is saved as a CSV report in agent_working. Use this
+    instead of calling send_gmail once per recipient.
+    """
+    try:
+        messages = render_messages(
+            _load_rows(csv_file, rows), subject_template, body_template, recipient_column, attachments, attachment_column
+        )
+        ready = [m for m in messages if m["status"] == "ready"]
+        if len(ready) > BULK_MAX_RECIPIENTS:
+            return f"Failed to send emails: {len(ready)} recipients exceeds the limit of {BULK_MAX_RECIPIENTS} per call."
+        if dry_run:
+            lines = [f"Dry run: {len(ready)} of {len(messages)} rows ready to send."]
+            if ready:
+                first = ready[0]
+                lines.append(f"First message, to {first['recipient']}:\nSubject: {first['subject']}\n{first['body'][:1000]}")
+            lines += [f"Row {m['row']} skipped: {m['error']}" for m in messages if m["status"] == "skipped"][:BULK_REPORT_FAILURES]
+            return "\n".join(lines)
+
+        started = time.perf_counter()
+        if ready:
+            service = get_gmail_service()  # one shared client; each thread keeps its own pooled connection
+            with ThreadPoolExecutor(max_workers=max(1, min(BULK_CONCURRENCY, len(ready))), thread_name_prefix="gmail-send") as pool:
+                # Each send runs in a copy of the caller's context so its trace span nests under this tool
+                results = pool.map(
+                    lambda m, ctx: ctx.run(_send_with_retries, service, m),
+                    ready, [contextvars.copy_context() for _ in ready],
+                )
+                for message, result in zip(ready, results):
+                    message.update(result)
+        elapsed = time.perf_counter() - started
+
+        sent = sum(m["status"] == "sent" for m in messages)
+        failed = [m for m in messages if m["status"] != "sent"]
+        retried = sum(m.get("attempts", 1) > 1 for m in messages)
+        report = _write_report(messages)
+        lines = [
+            f"Sent {sent} of {len(messages)} emails in {elapsed:.1f}s "
+            f"({sum(m['status'] == 'failed' for m in messages)} failed, {sum(m['status'] == 'skipped' for m in messages)} skipped, "
+            f"{retried} needed retries). Report: {report}"
+        ]
+        lines += [f"Row {m['row']} {m['recipient'] or '-'}: {m['status']}: {m['error']}" for m in failed[:BULK_REPORT_FAILURES]]
+        if len(failed) > BULK_REPORT_FAILURES:
+            lines.append(f"... and {len(failed) - BULK_REPORT_FAILURES} more in the report.")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Failed to send emails: {e}"
+
@@ -1,15 +1,30 @@
 import streamlit as st
-from main import get_agent_response, HumanMessage, AIMessage
+from main import stream_agent_response, count_tokens
+from metering import SessionUsage, TurnUsage
+from history_window import HistoryWindow
+from image_cache import IMAGE_EXTENSIONS
 import re
 import os
+import uuid
 
 st.title("Gemini Powered AI Agent")
 
+# "✅ Saved image → <path>" replies from generate_image_from_prompt, for any format it can save
+SAVED_IMAGE = re.compile(
+    r"✅ Saved image → (agent_working/images/.*?(?:" + "|".join(re.escape(ext) for ext in IMAGE_EXTENSIONS) + r"))"
+)
+
 # Initialize chat history and total cost
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "total_cost" not in st.session_state:
     st.session_state.total_cost = 0.0
+if "usage" not in st.session_state:
+    st.session_state.usage = SessionUsage()
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HistoryWindow(count_tokens=count_tokens)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # keys this browser session's Python sandbox
 
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
@@ -27,32 +42,42 @@ if prompt := st.chat_input("What can I help you with?"):
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
 
+    # Recent turns verbatim, older ones condensed, within a fixed token budget.
+    # The new prompt itself is sent as the agent's input, not as history.
+    chat_history = st.session_state.history_window.build(st.session_state.messages[:-1])
+
     # Check if the prompt is for image generation
     is_image_prompt = "generate an image" in prompt.lower() or "create an image" in prompt.lower()
 
-    # Get agent response
-    spinner_message = "Generating image..." if is_image_prompt else "Agent is thinking..."
-    with st.spinner(spinner_message):
-        chat_history = []
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                chat_history.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                chat_history.append(AIMessage(content=msg["content"]))
+    # Stream the agent's output into the assistant message as it is produced
+    with st.chat_message("assistant"):
+        status = st.status("Generating image..." if is_image_prompt else "Agent is thinking...", expanded=False)
+        placeholder = st.empty()
+        streamed_text = ""
+        response, usage = "", TurnUsage()
+        for event in stream_agent_response(prompt, chat_history, st.session_state.usage, st.session_state.session_id):
+            if event["type"] == "token":
+                streamed_text += event["text"]
+                placeholder.markdown(streamed_text + "▌")
+            elif event["type"] == "tool_start":
+                status.update(label=f"Running {event['name']}...")
+                status.write(f"🔧 `{event['name']}` started")
+            elif event["type"] == "tool_end":
+                status.write(f"✅ `{event['name']}` finished")
+            elif event["type"] == "final":
+                response = event["output"]
+                usage = event["usage"]
+        status.update(label="Done", state="complete")
+        placeholder.markdown(response)
 
-        response, prompt_tokens, completion_tokens, cost = get_agent_response(prompt, chat_history)
-    
-    # Update total cost
-    st.session_state.total_cost += cost
+        # Update total cost
+        st.session_state.total_cost += usage.cost
 
-    # Display assistant response in chat message container
-    with st.chat_message("assistant"):
-        st.markdown(response)
-        cost_info = f"Prompt Tokens: {prompt_tokens}, Completion Tokens: {completion_tokens}, Cost: ${cost:.6f}"
+        cost_info = usage.summary()
         st.caption(cost_info)
 
         # Check if an image was generated and display it
-        image_path_match = re.search(r"✅ Saved image → (agent_working/images/.*?\.(?:png|jpg|jpeg))", response)
+        image_path_match = SAVED_IMAGE.search(response)
         if image_path_match:
             image_path = image_path_match.group(1)
             if os.path.exists(image_path):
@@ -66,4 +91,12 @@ if prompt := st.chat_input("What can I help you with?"):
 
 
 # Display total cost at the bottom
-st.sidebar.markdown(f"### Total Conversation Cost: ${st.session_state.total_cost:.6f}")
\ No newline at end of file
+st.sidebar.markdown(f"### Total Conversation Cost: ${st.session_state.total_cost:.6f}")
+session_usage = st.session_state.usage
+st.sidebar.caption(
+    f"{len(session_usage.turns)} turns · {session_usage.input_tokens} input / {session_usage.output_tokens} output tokens · "
+    f"{session_usage.wall_seconds:.1f}s total"
+)
+if session_usage.turns:
+    with st.sidebar.expander("Last turn breakdown"):
+        st.json(session_usage.turns[-1].to_dict())
\ No newline at end of file
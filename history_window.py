@@ -0,0 +1,85 @@
+import os
+from typing import Callable, List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+
+
+class HistoryWindow:
+    """
+    Builds the chat_history sent to the agent from a transcript of {"role", "content"} dicts,
+    within a fixed token budget.
+
+    The newest messages are kept verbatim. Older ones are condensed into a single digest
+    system message (each truncated to `digest_chars`), which may use up to `digest_share`
+    of the budget; anything beyond that is dropped. Token counts and digest lines are cached
+    on each message dict, so a message is only counted once however long the session runs.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        digest_share: float = 0.25,
+        digest_chars: int = 200,
+    ):
+        self._count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.digest_share = digest_share
+        self.digest_chars = digest_chars
+
+    def tokens(self, message: dict) -> int:
+        cached = message.get("tokens")
+        if cached is None or cached[0] != len(message["content"]):
+            cached = (len(message["content"]), self._count_tokens(message["content"]))
+            message["tokens"] = cached
+        return cached[1]
+
+    def _digest_line(self, message: dict) -> tuple:
+        """(line, tokens) for the message's digest entry, cached like `tokens`."""
+        key = (len(message["content"]), self.digest_chars)
+        cached = message.get("digest")
+        if cached is None or cached[0] != key:
+            text = " ".join(message["content"].split())
+            if len(text) > self.digest_chars:
+                text = text[:self.digest_chars] + "…"
+            line = f"{'User' if message['role'] == 'user' else 'Assistant'}: {text}"
+            cached = (key, line, self._count_tokens(line))
+            message["digest"] = cached
+        return cached[1], cached[2]
+
+    def build(self, messages: List[dict]) -> List[BaseMessage]:
+        messages = [m for m in messages if m["role"] in ("user", "assistant")]
+        verbatim_budget = int(self.token_budget * (1 - self.digest_share))
+
+        # Keep the newest messages that fit, starting the window on a user turn
+        used, start = 0, len(messages)
+        while start > 0 and used + self.tokens(messages[start - 1]) <= verbatim_budget:
+            start -= 1
+            used += self.tokens(messages[start])
+        while start < len(messages) and messages[start]["role"] != "user":
+            used -= self.tokens(messages[start])
+            start += 1
+
+        history = []
+        older = messages[:start]
+        if older:
+            digest_budget = self.token_budget - used
+            lines = []
+            for message in reversed(older):
+                line, cost = self._digest_line(message)
+                if cost > digest_budget:
+                    break
+                lines.append(line)
+                digest_budget -= cost
+            if lines:
+                omitted = len(older) - len(lines)
+                header = "Condensed earlier conversation"
+                header += f" ({omitted} older messages omitted):" if omitted else ":"
+                # A system message, so the verbatim window's first user turn doesn't follow another user message
+                history.append(SystemMessage(content="\n".join([header] + lines[::-1])))
+
+        for message in messages[start:]:
+            cls = HumanMessage if message["role"] == "user" else AIMessage
+            history.append(cls(content=message["content"]))
+        return history
@@ -0,0 +1,117 @@
+"""
+Content-addressed on-disk cache for generated images, under agent_working/images/cache/.
+
+Entries are keyed by sha256(model, prompt) and evicted least-recently-used once the cache
+exceeds IMAGE_CACHE_MAX_MB. A hit is served to the requested filename by hardlink (copy
+when linking is not possible). Set IMAGE_CACHE=0 to disable.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from typing import Optional
+
+AGENT_DIR = "agent_working"
+CACHE_DIR = os.path.join(AGENT_DIR, "images", "cache")
+
+_MIME_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp", "image/gif": ".gif"}
+# Every extension a saved image can end in (.jpeg when the caller asked for it)
+IMAGE_EXTENSIONS = tuple(sorted(set(_MIME_EXTENSIONS.values()))) + (".jpeg",)
+
+
+def enabled() -> bool:
+    return os.getenv("IMAGE_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def extension_for(mime_type: Optional[str]) -> str:
+    return _MIME_EXTENSIONS.get((mime_type or "").lower(), ".png")
+
+
+def remove_file(path: str):
+    """Unlink `path` if present. Writing into a hardlinked file would also rewrite the cache entry."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ImageCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = None):
+        self.directory = directory
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("IMAGE_CACHE_MAX_MB", "500")) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached image for `key`, or None. Counts the hit/miss and refreshes LRU order."""
+        for ext in set(_MIME_EXTENSIONS.values()):
+            path = os.path.join(self.directory, key + ext)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return path
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, mime_type: Optional[str] = None) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key + extension_for(mime_type))
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._evict()
+        return path
+
+    @staticmethod
+    def materialize(cached_path: str, dest: str):
+        """Place a cached image at `dest` without re-encoding it."""
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        remove_file(dest)
+        try:
+            os.link(cached_path, dest)
+        except OSError:
+            shutil.copyfile(cached_path, dest)
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                remove_file(path)
+                total -= size
+
+    def stats(self) -> dict:
+        entries = self._entries() if os.path.isdir(self.directory) else []
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+cache = ImageCache()
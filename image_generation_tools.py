@@ -1,63 +1,141 @@
 from langchain.tools import tool
-from google import genai
-from google.genai import types
-from PIL import Image
-from io import BytesIO
+from typing import Optional
 import os
 import json
+import re
+import threading
 import time
+import image_cache
+import tracing
+from rate_limiter import TokenBucket, backoff_delay
 
 AGENT_DIR = "agent_working"
+MAX_ATTEMPTS = 4
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+# One limiter for every thread, and for every agent process sharing agent_working/
+_rpm = float(os.getenv("GEMINI_IMAGE_RPM", "10"))
+rate_limiter = TokenBucket(
+    rate_per_sec=_rpm / 60,
+    capacity=float(os.getenv("GEMINI_IMAGE_BURST", "2")),
+    state_file=os.path.join(AGENT_DIR, ".gemini_image_ratelimit.json"),
+)
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+def _get_client(key: str):
+    """Reuse one genai.Client (and its connection pool) per API key."""
+    global _client, _client_key
+    from google import genai  # heavy; only loaded once an image is requested
+    with _client_lock:
+        if _client is None or _client_key != key:
+            _client = genai.Client(api_key=key)
+            _client_key = key
+        return _client
+
+def _with_extension(path: str, ext: str) -> str:
+    """Make the file extension match the actual image format, since bytes are saved untouched."""
+    root, current = os.path.splitext(path)
+    if current.lower().replace(".jpeg", ".jpg") == ext:
+        return path
+    return root + ext
+
+def _retry_after(error) -> Optional[float]:
+    """Seconds the server asked us to wait, from a RetryInfo detail or a Retry-After header."""
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []):
+            delay = str(detail.get("retryDelay", ""))
+            if re.fullmatch(r"\d+(\.\d+)?s", delay):
+                return float(delay[:-1])
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _is_retryable(error) -> bool:
+    code = getattr(error, "code", None)
+    if code is not None:
+        return code in RETRYABLE_CODES
+    # No HTTP status: network-level failures (timeouts, dropped connections) are worth retrying
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__module__.startswith(("httpx", "httpcore"))
 
 @tool
 def generate_image_from_prompt(prompt: str, filename: str = "output.png") -> str:
     """
     Generates an image with Gemini 2.0 Flash preview and saves it, with retries.
+    The file extension is adjusted to the image format the model returns.
     """
     key = os.getenv("GEMINI_API_KEY")
     if not key:
         return "❌ GEMINI_API_KEY not set."
 
-    client = genai.Client(api_key=key)
     model_id = "gemini-2.0-flash-preview-image-generation"
-    cfg = types.GenerateContentConfig(response_modalities=['TEXT', 'IMAGE'])
 
-    retries = 3
-    for i in range(retries):
-        try:
-            # Add a small delay to avoid overwhelming the API
-            time.sleep(2)
+    if not filename.lower().endswith((".png", ".jpg", ".jpeg")):
+        filename += ".png"
+    os.makedirs(os.path.join(AGENT_DIR, "images"), exist_ok=True)
+    path = os.path.join(AGENT_DIR, "images", filename)
 
-            resp = client.models.generate_content(
-                model=model_id,
-                contents=prompt,
-                config=cfg
-            )
+    # Serve repeated prompts from the on-disk cache
+    cache_key = image_cache.ImageCache.key(model_id, prompt)
+    cached = image_cache.cache.get(cache_key) if image_cache.enabled() else None
+    tracing.annotate(cache="hit" if cached else "miss")
+    if cached:
+        path = _with_extension(path, os.path.splitext(cached)[1])
+        image_cache.ImageCache.materialize(cached, path)
+        return f"✅ Saved image → {path}"
 
-            if not filename.lower().endswith((".png", ".jpg", ".jpeg")):
-                filename += ".png"
+    from google.genai import types
+    client = _get_client(key)
+    cfg = types.GenerateContentConfig(response_modalities=['TEXT', 'IMAGE'])
 
-            os.makedirs(os.path.join(AGENT_DIR, "images"), exist_ok=True)
-            path = os.path.join(AGENT_DIR, "images", filename)
+    for i in range(MAX_ATTEMPTS):
+        try:
+            with tracing.span("gemini.rate_limit", kind="wait"):
+                rate_limiter.acquire()
+            with tracing.span("gemini.generate_content", kind="http", model=model_id, attempt=i + 1, request_bytes=len(prompt)) as span:
+                resp = client.models.generate_content(
+                    model=model_id,
+                    contents=prompt,
+                    config=cfg
+                )
 
-            for part in resp.candidates[0].content.parts:
+            candidate = resp.candidates[0] if resp.candidates else None
+            parts = candidate.content.parts if candidate and candidate.content else None
+            for part in parts or []:
                 if part.inline_data:
-                    img = Image.open(BytesIO(part.inline_data.data))
-                    img.save(path)
+                    # The bytes are already an encoded image; write them as-is instead of decoding/re-encoding
+                    path = _with_extension(path, image_cache.extension_for(part.inline_data.mime_type))
+                    image_cache.remove_file(path)
+                    span.set(response_bytes=len(part.inline_data.data))
+                    with tracing.span("save image", kind="io", bytes=len(part.inline_data.data)), open(path, "wb") as f:
+                        f.write(part.inline_data.data)
+                    if image_cache.enabled():
+                        image_cache.cache.put(cache_key, part.inline_data.data, part.inline_data.mime_type)
                     return f"✅ Saved image → {path}"
 
             # If no image is returned, log it and possibly retry
             raw = json.dumps(type(resp).to_dict(resp), indent=2)
             print(f"⚠️ Model returned no image on attempt {i+1}. Raw response:\n{raw}")
+            retry_after = None
 
         except Exception as e:
             print(f"An error occurred on attempt {i+1}: {e}")
-            if i < retries - 1:
-                print("Retrying...")
-                time.sleep(5)  # Wait longer before retrying
-            else:
-                return f"❌ Failed to generate image after {retries} attempts."
+            if not _is_retryable(e):
+                return f"❌ Failed to generate image: {e}"
+            if i == MAX_ATTEMPTS - 1:
+                return f"❌ Failed to generate image after {MAX_ATTEMPTS} attempts."
+            retry_after = _retry_after(e)
+
+        if i < MAX_ATTEMPTS - 1:
+            delay = backoff_delay(i, base=2.0, retry_after=retry_after)
+            print(f"Retrying in {delay:.1f}s...")
+            time.sleep(delay)
 
-    return f"⚠️ Failed to generate image after {retries} attempts."
+    return f"⚠️ Failed to generate image after {MAX_ATTEMPTS} attempts."
 
 
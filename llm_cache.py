@@ -0,0 +1,134 @@
+"""
+Opt-in persistent response cache for chat models (SQLite under agent_working/).
+
+Entries are keyed on the model's serialized config and call parameters, which include the
+bound tool schemas, plus the full message list, and expire after LLM_CACHE_TTL seconds.
+The cache is capped at LLM_CACHE_MAX_ENTRIES, evicting the least recently used entries.
+Responses that call a side-effecting tool (send an email, create an event, ...) are never
+stored unless LLM_CACHE_SIDE_EFFECTS=1, so a cache hit can't silently repeat an action.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Iterable, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+import sqlite_store
+
+AGENT_DIR = "agent_working"
+CACHE_PATH = os.path.join(AGENT_DIR, "llm_cache.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    expires_at REAL,
+    accessed_at REAL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+# Per-run message fields that would otherwise make every multi-step prompt unique
+_VOLATILE_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """Drop run-specific message metadata from a serialized message list before hashing."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    for message in messages:
+        kwargs = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(kwargs, dict):
+            for name in _VOLATILE_FIELDS:
+                kwargs.pop(name, None)
+    return json.dumps(messages, sort_keys=True)
+
+
+def enabled() -> bool:
+    return os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes")
+
+
+class TTLSQLiteCache(BaseCache):
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: float = None,
+        max_entries: int = None,
+        side_effect_tools: Iterable[str] = (),
+        cache_side_effects: bool = None,
+    ):
+        self.path = path
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.side_effect_tools = set(side_effect_tools)
+        if cache_side_effects is None:
+            cache_side_effects = os.getenv("LLM_CACHE_SIDE_EFFECTS", "").lower() in ("1", "true", "yes")
+        self.cache_side_effects = cache_side_effects
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        sqlite_store.create(path, _SCHEMA)
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{_normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def _has_side_effects(self, generations: Sequence[Generation]) -> bool:
+        for generation in generations:
+            for call in getattr(getattr(generation, "message", None), "tool_calls", None) or []:
+                if call.get("name") in self.side_effect_tools:
+                    return True
+        return False
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with sqlite_store.connect(self.path) as conn:
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        if not row or row[1] <= now:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        generations = [loads(value) for value in loads(row[0])]
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None and getattr(message, "usage_metadata", None):
+                message.usage_metadata = None  # a replayed response costs nothing
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not self.cache_side_effects and self._has_side_effects(return_val):
+            return
+        now = time.time()
+        value = dumps([dumps(generation) for generation in return_val])
+        with sqlite_store.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with sqlite_store.connect(self.path) as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with sqlite_store.connect(self.path) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "max_entries": self.max_entries}
@@ -1,21 +1,30 @@
 import os
 import re
+import contextlib
+import uuid
 import dotenv
+import functools
 import tiktoken
-from langchain_openai import ChatOpenAI
 from langchain_tavily import TavilySearch
-from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_experimental.tools.python.tool import PythonREPLTool
 from langchain.tools import tool
-from gmail_tools import send_gmail, read_gmail
-from calender_tools import create_calendar_event, list_calendar_events, delete_calendar_event, update_calendar_event, schedule_google_meet_event
-from gdrive_tools import upload_drive_file, download_drive_file, list_drive_files
-from image_generation_tools import generate_image_from_prompt
-from document_tools import create_pptx_presentation, create_docx_document
+from file_tools import write_to_file, read_from_file, search_file, file_info
+from tool_registry import registry as tool_registry
+import tool_router
 from pydantic import BaseModel, Field
+from agent_runtime import AgentRuntime
+from conversation_memory import ConversationMemory
+from history_window import HistoryWindow
+from metering import UsageMeter, SessionUsage, TurnUsage
+import metering
+import llm_cache
+import search_cache
+from search_cache import CachedTavilySearch
+import python_sandbox
+import tracing
+from python_sandbox import SandboxedPythonTool
 
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import MessagesPlaceholder
 from langchain_google_genai import ChatGoogleGenerativeAI
 dotenv.load_dotenv()  # expects .env in the current directory
@@ -32,30 +41,52 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 AGENT_DIR = "agent_working"
 os.makedirs(AGENT_DIR, exist_ok=True)
 
+# Tools that change things outside the agent. Model responses that call them are never
+# served from the LLM cache, so the live model always makes those decisions.
+SIDE_EFFECT_TOOLS = {
+    "send_gmail", "send_bulk_gmail", "create_calendar_event", "delete_calendar_event", "update_calendar_event",
+    "schedule_google_meet_event", "upload_drive_file", "write_to_file", "Python_REPL",
+}
+
+# Opt-in (LLM_CACHE=1) persistent response cache, for replaying benchmarks and regression runs
+response_cache = llm_cache.TTLSQLiteCache(side_effect_tools=SIDE_EFFECT_TOOLS) if llm_cache.enabled() else None
+
 # Gemini LLM initialization
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-pro",
-    google_api_key=GEMINI_API_KEY
+    google_api_key=GEMINI_API_KEY,
+    cache=response_cache,
+    # Streaming calls bypass LangChain's cache, so cached runs return whole responses
+    disable_streaming=response_cache is not None,
+)
+# Conversation summaries don't need the agent's model; a cheaper one keeps them fast
+summary_llm = ChatGoogleGenerativeAI(
+    model=os.getenv("SUMMARY_MODEL", "gemini-2.5-flash"),
+    google_api_key=GEMINI_API_KEY,
+    cache=response_cache,
 )
 
 # --- Token and cost tracking ---
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None  # encoding file unavailable (e.g. offline); fall back to a character estimate
+
 def count_tokens(text: str) -> int:
-    """Counts the number of tokens in a string."""
-    encoding = tiktoken.get_encoding("cl100k_base")
+    """
+    Estimates the number of tokens in a string, for history budgets. Billing and
+    usage reporting use the model's own usage metadata instead (see metering.py).
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
     return len(encoding.encode(text))
 
-def get_cost(prompt_tokens: int, completion_tokens: int) -> float:
+def get_cost(prompt_tokens: int, completion_tokens: int, model: str = "gemini-2.5-pro") -> float:
     """Calculates the cost of a prompt and completion."""
-    # Pricing for gemini-1.5-pro-latest (per 1 million tokens)
-    input_cost = 1.25
-    output_cost = 5.00
-
-    prompt_cost = (prompt_tokens / 1_000_000) * input_cost
-    completion_cost = (completion_tokens / 1_000_000) * output_cost
-
-    return prompt_cost + completion_cost
-
-from app import write_to_file, read_from_file
+    return metering.get_cost(prompt_tokens, completion_tokens, model)
 
 class GetCurrentDateTimeInput(BaseModel):
     pass
@@ -69,11 +100,13 @@ def get_current_date_time(input_data: GetCurrentDateTimeInput) -> str:
     return datetime.now().isoformat()
 
 # --- Other tools ---
-search_tool = TavilySearch(
+# Repeated and concurrent identical searches are answered from an in-memory cache (SEARCH_CACHE=0 disables it)
+search_tool = (CachedTavilySearch if search_cache.enabled() else TavilySearch)(
     tavily_api_key=TAVILY_API_KEY,
     max_results=5,
 )
-python_tool = PythonREPLTool()
+# Runs code in pre-warmed sandboxed worker processes, one per session, off the agent's process
+python_tool = SandboxedPythonTool()
 
 # --- All Tools ---
 tools = [
@@ -82,19 +115,10 @@ tools = [
     python_tool,
     write_to_file,
     read_from_file,
-    send_gmail,
-    read_gmail,
-    create_calendar_event,
-    list_calendar_events,
-    delete_calendar_event,
-    update_calendar_event,
-    schedule_google_meet_event,
-    upload_drive_file,
-    download_drive_file,
-    list_drive_files,
-    generate_image_from_prompt,
-    create_pptx_presentation,
-    create_docx_document,
+    search_file,
+    file_info,
+    # Google Workspace, image and document tools; their client libraries are imported on first use
+    *tool_registry.load_tools(),
 ]
 
 # Prompt
@@ -106,6 +130,7 @@ Your primary directive is to complete user requests fully and efficiently.
 - Always use current date/time tool for timestamps
 - Never access or modify anything outside that folder
 - Do NOT delete files
+- For large files, check `file_info` first, then read only the slices you need with `read_from_file` (line/byte ranges, tail_lines) or `search_file`, rather than the whole file.
 - Use required tools for tasks intelligently.
 - You can perform any task using Python. If a specific tool is not available, write and execute Python code to accomplish the task. Never say you don't have access or can't do something; instead, provide the Python code to solve the problem.
 - When creating a presentation, generate detailed and informative content for each slide. Go beyond simple bullet points; provide descriptive and well-structured text.
@@ -117,83 +142,182 @@ Your primary directive is to complete user requests fully and efficiently.
 """),
     MessagesPlaceholder(variable_name="chat_history"),
     ("user", "{input}"),
-    ("ai", "{agent_scratchpad}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
 ])
 
+# Compiled once and shared by every turn; call runtime.rebuild(tools=...) if the tool set changes
+runtime = AgentRuntime(llm=llm, tools=tools, prompt=prompt)
+
+# Binds the core tools plus the tool groups a request mentions (TOOL_ROUTING=0 binds all tools every time)
+router = tool_router.ToolRouter(count_tokens=count_tokens)
+
+def select_executor(user_input, chat_history):
+    """The compiled agent for this request's routed tool subset (the full set if routing is off)."""
+    if not tool_router.enabled():
+        return runtime.get_executor()
+    previous = next((m.content for m in reversed(chat_history) if isinstance(m, HumanMessage)), None)
+    return runtime.get_executor(router.route(user_input, runtime.tools, previous).tools)
+
 # --- Memory management via summarization ---
-conversation_history = []  # stores recent turns
-summary = ""        # cumulative summary
-
-def summarize_history():
-    global summary, conversation_history
-    # Combine previous summary with recent turns
-    content = f"Previous summary:\n{summary}\n\nRecent conversation:\n"
-    for turn in conversation_history:
+def summarize_history(previous_summary: str, turns: list) -> str:
+    """Folds the previous summary and recent turns into a new summary."""
+    content = f"Previous summary:\n{previous_summary}\n\nRecent conversation:\n"
+    for turn in turns:
         content += f"User: {turn['user']}\nAssistant: {turn['assistant']}\n"
 
-    summary = llm.invoke([
+    return summary_llm.invoke([
         SystemMessage(content="Please provide a concise summary of the following conversation without loosing knowledge."),
         HumanMessage(content=content)
     ]).content
-    try:
-        with open(os.path.join(AGENT_DIR, "summary.txt"), "w", encoding="utf-8") as f:
-            f.write(summary)
-    except Exception as e:
-        print(f"[Memory Save Error] Could not write summary: {e}")
-    # Clear the recent history buffer
-    conversation_history = []
-
-def get_agent_response(user_input, chat_history):
-    agent = create_tool_calling_agent(
-        llm=llm,
-        tools=tools,
-        prompt=prompt,
+
+def new_memory(session_id: str = None) -> ConversationMemory:
+    """
+    Memory for one chat session; summaries are written in the background once it exceeds
+    its token budget, to agent_working/summaries/<session_id>.txt.
+    """
+    return ConversationMemory(
+        summarize=summarize_history,
+        count_tokens=count_tokens,
+        summary_path=os.path.join(AGENT_DIR, "summaries", f"{session_id or uuid.uuid4().hex}.txt"),
     )
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True) # Add verbose=True for detailed logging
-    result = agent_executor.invoke({"input": user_input, "chat_history": chat_history})
-    response = result["output"]
-    
-    prompt_tokens = count_tokens(user_input)
-    completion_tokens = count_tokens(response)
-    cost = get_cost(prompt_tokens, completion_tokens)
 
-    return response, prompt_tokens, completion_tokens, cost
+class _Turn:
+    """State of one agent turn: callbacks to pass to the executor, its output and usage."""
+
+    def __init__(self, callbacks: list):
+        self.callbacks = callbacks
+        self.output = ""
+        self.usage = None
+
+@contextlib.contextmanager
+def _agent_turn(user_input, session_usage: SessionUsage = None, session_id: str = None):
+    """
+    Meters and traces one turn and runs it in `session_id`'s sandbox worker. The block
+    sets `turn.output`; on exit `turn.usage` is filled in and added to `session_usage`.
+    """
+    meter = UsageMeter()
+    tracer = tracing.Tracer(user_input, session_id) if tracing.enabled() else None
+    turn = _Turn([meter, tracer] if tracer else [meter])
+    try:
+        with python_sandbox.session(session_id):
+            yield turn
+    except BaseException as e:
+        if tracer:
+            tracer.finish(error=e)
+        raise
+    turn.usage = meter.finish()
+    if tracer:
+        tracer.finish(output_chars=len(turn.output), input_tokens=turn.usage.input_tokens, output_tokens=turn.usage.output_tokens)
+    if session_usage is not None:
+        session_usage.add(turn.usage)
+
+async def aget_agent_response(user_input, chat_history, session_usage: SessionUsage = None, session_id: str = None):
+    """
+    Runs one agent turn. Tool calls emitted together in one model step run concurrently.
+    Token counts and cost are the totals reported by the model across every LLM call of
+    the turn; the turn's full breakdown is added to `session_usage`. Python_REPL calls run
+    in `session_id`'s sandbox worker.
+    """
+    agent_executor = select_executor(user_input, chat_history)
+    with _agent_turn(user_input, session_usage, session_id) as turn:
+        result = await agent_executor.ainvoke(
+            {"input": user_input, "chat_history": chat_history}, config={"callbacks": turn.callbacks}
+        )
+        turn.output = result["output"]
+    usage = turn.usage
+    return turn.output, usage.input_tokens, usage.output_tokens, usage.cost
+
+def get_agent_response(user_input, chat_history, session_usage: SessionUsage = None, session_id: str = None):
+    """Synchronous version of `aget_agent_response`."""
+    return runtime.run(aget_agent_response(user_input, chat_history, session_usage, session_id))
+
+def _chunk_text(chunk) -> str:
+    """Text of a streamed model chunk; Gemini may send a string or a list of content parts."""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+async def astream_agent_response(user_input, chat_history, session_usage: SessionUsage = None, session_id: str = None):
+    """
+    Runs the agent and yields events as they happen:
+      {"type": "token", "text": ...}                    streamed model text
+      {"type": "tool_start", "name": ..., "input": ...}
+      {"type": "tool_end", "name": ..., "output": ...}
+      {"type": "final", "output": ..., "prompt_tokens": ..., "completion_tokens": ..., "cost": ..., "usage": TurnUsage}
+    """
+    agent_executor = select_executor(user_input, chat_history)
+    with _agent_turn(user_input, session_usage, session_id) as turn:
+        async for event in agent_executor.astream_events(
+            {"input": user_input, "chat_history": chat_history}, config={"callbacks": turn.callbacks}, version="v2"
+        ):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = _chunk_text(event["data"]["chunk"])
+                if text:
+                    yield {"type": "token", "text": text}
+            elif kind == "on_tool_start":
+                yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                yield {"type": "tool_end", "name": event["name"], "output": str(event["data"].get("output"))}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                turn.output = event["data"]["output"]["output"]
+
+    usage = turn.usage
+    yield {
+        "type": "final",
+        "output": turn.output,
+        "prompt_tokens": usage.input_tokens,
+        "completion_tokens": usage.output_tokens,
+        "cost": usage.cost,
+        "usage": usage,
+    }
+
+def stream_agent_response(user_input, chat_history, session_usage: SessionUsage = None, session_id: str = None):
+    """Synchronous version of `astream_agent_response`, for the CLI loop and Streamlit."""
+    yield from runtime.iterate(astream_agent_response(user_input, chat_history, session_usage, session_id))
 
 # --- Reactive chat loop ---
 def main():
     print("Agent is running. Type 'exit' or 'quit' to stop.")
-    chat_history = []
-    total_cost = 0
+    messages = []
+    window = HistoryWindow(count_tokens=count_tokens)
+    memory = new_memory()
+    session_usage = SessionUsage()
     while True:
         user_input = input("User: ").strip()
         if user_input.lower() in ("exit", "quit"):
             # Clear memory and exit
-            conversation_history.clear()
-            global summary
-            summary = ""
+            memory.clear()
             print("Memory cleared. Exiting agent.")
             break
 
         # Prepend summary if available
-        if summary:
-            full_input = f"Summary of previous conversation:\n{summary}\n\nRecent messages:\n"
-            for turn in conversation_history[-2:]:
-                full_input += f"User: {turn['user']}\nAssistant: {turn['assistant']}\n"
-            full_input += f"\nUser: {user_input}"
-        else:
-            full_input = user_input
-
-        response, prompt_tokens, completion_tokens, cost = get_agent_response(full_input, chat_history)
-        total_cost += cost
-        print(f"Assistant: {response}")
-        print(f"(Prompt Tokens: {prompt_tokens}, Completion Tokens: {completion_tokens}, Cost: ${cost:.6f}, Total Cost: ${total_cost:.6f})")
-
-        # Update memory buffer
-        chat_history.extend([HumanMessage(content=user_input), AIMessage(content=response)])
-        conversation_history.append({"user": user_input, "assistant": response})
-        # Summarize every 6 turns to keep context manageable
-        if len(conversation_history) >= 5:
-            summarize_history()
+        full_input = memory.build_input(user_input)
+
+        # Recent turns verbatim, older ones condensed, within a fixed token budget (as in the GUI)
+        chat_history = window.build(messages)
+
+        print("Assistant: ", end="", flush=True)
+        streamed = False
+        response, usage = "", TurnUsage()
+        for event in stream_agent_response(full_input, chat_history, session_usage):
+            if event["type"] == "token":
+                print(event["text"], end="", flush=True)
+                streamed = True
+            elif event["type"] == "tool_start":
+                print(f"\n[Running tool: {event['name']}]", flush=True)
+            elif event["type"] == "final":
+                response = event["output"]
+                usage = event["usage"]
+        # The final answer may not have been streamed (e.g. the model returned it in one piece)
+        print("" if streamed else response)
+        print(f"({usage.summary()}\n Session: {session_usage.input_tokens} in / {session_usage.output_tokens} out tokens, Total Cost: ${session_usage.cost:.6f})")
+
+        # Update memory buffer; summarization (if due) runs in the background
+        messages.extend([{"role": "user", "content": user_input}, {"role": "assistant", "content": response}])
+        memory.add_turn(user_input, response)
+        memory.maybe_summarize()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+"""
+Token, latency and cost accounting for agent runs.
+
+`UsageMeter` is a LangChain callback handler: attach one per turn and it records the real
+`usage_metadata` of every LLM call the agent makes (every step, not just the final answer)
+together with the wall time of each LLM and tool call. Turns roll up into a `SessionUsage`.
+"""
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+# USD per 1M tokens (input, output); prompts up to 200k tokens
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+DEFAULT_MODEL = "gemini-2.5-pro"
+
+
+def get_cost(prompt_tokens: int, completion_tokens: int, model: str = DEFAULT_MODEL) -> float:
+    """Cost in USD of a call to `model`; unknown models are priced like DEFAULT_MODEL."""
+    model = (model or DEFAULT_MODEL).removeprefix("models/")
+    price = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0])) if model.startswith(name)), None)
+    input_cost, output_cost = price or MODEL_PRICES[DEFAULT_MODEL]
+    return (prompt_tokens / 1_000_000) * input_cost + (completion_tokens / 1_000_000) * output_cost
+
+
+@dataclass
+class CallRecord:
+    kind: str  # "llm" or "tool"
+    name: str
+    seconds: float
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    error: bool = False
+
+
+@dataclass
+class TurnUsage:
+    calls: List[CallRecord] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    def _sum(self, attr, kind=None):
+        return sum(getattr(c, attr) for c in self.calls if kind is None or c.kind == kind)
+
+    @property
+    def input_tokens(self) -> int:
+        return self._sum("input_tokens")
+
+    @property
+    def output_tokens(self) -> int:
+        return self._sum("output_tokens")
+
+    @property
+    def cost(self) -> float:
+        return self._sum("cost")
+
+    @property
+    def llm_calls(self) -> int:
+        return sum(1 for c in self.calls if c.kind == "llm")
+
+    @property
+    def llm_seconds(self) -> float:
+        return self._sum("seconds", "llm")
+
+    @property
+    def tool_seconds(self) -> float:
+        return self._sum("seconds", "tool")
+
+    def by_tool(self) -> Dict[str, dict]:
+        tools = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "errors": 0})
+        for c in self.calls:
+            if c.kind == "tool":
+                tools[c.name]["calls"] += 1
+                tools[c.name]["seconds"] += c.seconds
+                tools[c.name]["errors"] += int(c.error)
+        return dict(tools)
+
+    def summary(self) -> str:
+        line = (
+            f"{self.llm_calls} LLM calls: {self.input_tokens} in / {self.output_tokens} out tokens, "
+            f"{self.llm_seconds:.1f}s | tools: {self.tool_seconds:.1f}s | turn: {self.wall_seconds:.1f}s | ${self.cost:.6f}"
+        )
+        tools = self.by_tool()
+        if tools:
+            line += "\n" + ", ".join(f"{name} x{t['calls']} {t['seconds']:.1f}s" for name, t in tools.items())
+        return line
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_seconds": self.wall_seconds,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": self.cost,
+            "llm_calls": self.llm_calls,
+            "llm_seconds": self.llm_seconds,
+            "tool_seconds": self.tool_seconds,
+            "tools": self.by_tool(),
+        }
+
+
+@dataclass
+class SessionUsage:
+    turns: List[TurnUsage] = field(default_factory=list)
+
+    def add(self, turn: TurnUsage):
+        self.turns.append(turn)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(t.input_tokens for t in self.turns)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(t.output_tokens for t in self.turns)
+
+    @property
+    def cost(self) -> float:
+        return sum(t.cost for t in self.turns)
+
+    @property
+    def wall_seconds(self) -> float:
+        return sum(t.wall_seconds for t in self.turns)
+
+    def to_dict(self) -> dict:
+        return {
+            "turns": len(self.turns),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": self.cost,
+            "wall_seconds": self.wall_seconds,
+        }
+
+
+def _usage_from_result(response) -> tuple:
+    """(input_tokens, output_tokens) reported by the provider for one LLM call."""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class UsageMeter(BaseCallbackHandler):
+    """Collects a `TurnUsage` for one agent run. Safe to use from the agent's tool threads."""
+
+    run_inline = True  # keep timings accurate; don't hop to a thread pool for async runs
+
+    def __init__(self):
+        self.turn = TurnUsage()
+        self._started = time.perf_counter()
+        self._open: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def finish(self) -> TurnUsage:
+        self.turn.wall_seconds = time.perf_counter() - self._started
+        return self.turn
+
+    def _start(self, run_id: UUID, name: str):
+        with self._lock:
+            self._open[run_id] = (name, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> Optional[tuple]:
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return None
+        name, started = entry
+        return name, time.perf_counter() - started
+
+    def _record(self, record: CallRecord):
+        with self._lock:
+            self.turn.calls.append(record)
+
+    @staticmethod
+    def _model_name(serialized: Optional[dict], kwargs: dict) -> str:
+        metadata = kwargs.get("metadata") or {}
+        params = kwargs.get("invocation_params") or {}
+        return metadata.get("ls_model_name") or params.get("model") or (serialized or {}).get("name") or "llm"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any):
+        self._start(run_id, self._model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs: Any):
+        self._start(run_id, self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        model, seconds = ended
+        input_tokens, output_tokens = _usage_from_result(response)
+        self._record(CallRecord(
+            "llm", model, seconds, input_tokens, output_tokens, get_cost(input_tokens, output_tokens, model)
+        ))
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        ended = self._end(run_id)
+        if ended:
+            self._record(CallRecord("llm", ended[0], ended[1], error=True))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs: Any):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        ended = self._end(run_id)
+        if ended:
+            self._record(CallRecord("tool", ended[0], ended[1]))
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        ended = self._end(run_id)
+        if ended:
+            self._record(CallRecord("tool", ended[0], ended[1], error=True))
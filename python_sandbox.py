@@ -0,0 +1,258 @@
+"""
+Sandboxed Python execution for the agent, in a pool of pre-warmed worker processes.
+
+Each worker is a separate interpreter. It is started with the usual document and data
+libraries already imported, runs with agent_working/ as its working directory, and has
+an address-space limit (PYTHON_MEMORY_LIMIT_MB). A call that runs longer than
+PYTHON_TIMEOUT seconds gets its worker killed. Workers are sticky per session, so
+variables survive between calls in one chat. A session's worker is retired once the
+session has been idle for PYTHON_SESSION_IDLE seconds, or when more than
+PYTHON_MAX_WORKERS sessions are active (least recently used first, never while it is
+running code; a new session waits up to PYTHON_TIMEOUT for one to finish). PYTHON_POOL_SIZE
+warm workers are kept ready, so a new session doesn't wait for interpreter startup.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import re
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import BaseTool
+
+AGENT_DIR = "agent_working"
+PRELOAD_MODULES = ("csv", "json", "math", "numpy", "fpdf", "docx", "pptx")
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+# The session whose worker runs Python_REPL calls; set it around an agent turn with `session()`
+current_session: contextvars.ContextVar[str] = contextvars.ContextVar("python_session", default="default")
+
+
+@contextlib.contextmanager
+def session(session_id: Optional[str]):
+    """Route Python_REPL calls made inside the block to `session_id`'s worker."""
+    if session_id is None:
+        yield
+        return
+    token = current_session.set(session_id)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+
+class WorkerError(Exception):
+    """The worker died or timed out; its state is gone."""
+
+
+class PoolBusy(Exception):
+    """Every worker is running code for another session."""
+
+
+class PythonWorker:
+    def __init__(self, cwd: str, memory_limit_mb: int):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", WORKER_SCRIPT, str(memory_limit_mb), *PRELOAD_MODULES],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+            text=True,
+            start_new_session=True,  # keep terminal signals (Ctrl-C) away from running code
+        )
+        self.lock = threading.Lock()
+        self.users = 0  # calls checked out to this worker; guarded by the pool's lock
+        self.calls = 0
+        self.last_used = time.monotonic()
+        self._ready = False
+
+    def _read(self, timeout: Optional[float]) -> dict:
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not ready:
+            self.kill()
+            raise WorkerError(f"timed out after {timeout:g}s")
+        line = self.proc.stdout.readline()
+        if not line:
+            self.kill()
+            raise WorkerError("the Python process exited (probably out of memory or killed)")
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float = 120):
+        if not self._ready:
+            self._read(timeout)  # the worker announces itself once its imports are done
+            self._ready = True
+
+    def execute(self, code: str, timeout: float) -> str:
+        with self.lock:
+            self.wait_ready()
+            self.calls += 1
+            self.last_used = time.monotonic()
+            try:
+                self.proc.stdin.write(json.dumps({"code": code}) + "\n")
+                self.proc.stdin.flush()
+            except OSError:
+                self.kill()
+                raise WorkerError("the Python process exited")
+            return self._read(timeout)["output"]
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        size: int = None,
+        max_workers: int = None,
+        timeout: float = None,
+        memory_limit_mb: int = None,
+        session_idle: float = None,
+        cwd: str = AGENT_DIR,
+    ):
+        self.size = size if size is not None else int(os.getenv("PYTHON_POOL_SIZE", "2"))
+        self.max_workers = max_workers or int(os.getenv("PYTHON_MAX_WORKERS", "8"))
+        self.timeout = timeout or float(os.getenv("PYTHON_TIMEOUT", "60"))
+        self.memory_limit_mb = memory_limit_mb or int(os.getenv("PYTHON_MEMORY_LIMIT_MB", "1024"))
+        self.session_idle = session_idle or float(os.getenv("PYTHON_SESSION_IDLE", "900"))
+        self.cwd = os.path.abspath(cwd)
+        os.makedirs(self.cwd, exist_ok=True)
+        self._idle: List[PythonWorker] = []
+        self._sessions: Dict[str, PythonWorker] = {}
+        self._lock = threading.Lock()
+        self._freed = threading.Condition(self._lock)  # notified when a call returns its worker
+        self._warming = threading.Lock()
+        atexit.register(self.shutdown)
+        if self.size:
+            threading.Thread(target=self.warm, daemon=True).start()
+
+    def _spawn(self) -> PythonWorker:
+        return PythonWorker(self.cwd, self.memory_limit_mb)
+
+    def warm(self):
+        """Top the pool of ready workers up to `size`; interpreters start in the background."""
+        if not self._warming.acquire(blocking=False):
+            return  # another thread is already refilling
+        try:
+            with self._lock:
+                self._idle = [w for w in self._idle if w.alive()]
+                missing = self.size - len(self._idle)
+            for _ in range(max(missing, 0)):
+                worker = self._spawn()
+                with self._lock:
+                    self._idle.append(worker)
+        finally:
+            self._warming.release()
+
+    def _retire(self, workers):
+        for worker in workers:
+            worker.kill()
+
+    def _checkout(self, session_id: str) -> PythonWorker:
+        """
+        The session's worker, marked as in use. Only workers not running code are retired
+        to make room; if every one is busy this waits up to `timeout` before raising PoolBusy.
+        """
+        retired = []
+        try:
+            with self._lock:
+                now = time.monotonic()
+                for sid, worker in list(self._sessions.items()):
+                    if sid != session_id and not worker.users and (now - worker.last_used > self.session_idle or not worker.alive()):
+                        retired.append(self._sessions.pop(sid))
+                worker = self._sessions.get(session_id)
+                refill = worker is None or not worker.alive()
+                if refill:
+                    deadline = now + self.timeout
+                    while len(self._sessions) >= self.max_workers:
+                        free = [sid for sid, w in self._sessions.items() if not w.users]
+                        if free:
+                            lru = min(free, key=lambda sid: self._sessions[sid].last_used)
+                            retired.append(self._sessions.pop(lru))
+                            continue
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolBusy(f"all {self.max_workers} Python workers are busy with other conversations")
+                        self._freed.wait(remaining)
+                    worker = self._idle.pop(0) if self._idle else None
+                    if worker is None or not worker.alive():
+                        worker = self._spawn()
+                    self._sessions[session_id] = worker
+                worker.users += 1
+        finally:
+            self._retire(retired)
+        if refill and self.size:
+            threading.Thread(target=self.warm, daemon=True).start()
+        return worker
+
+    def run(self, code: str, session_id: str = None) -> str:
+        session_id = session_id or current_session.get()
+        try:
+            worker = self._checkout(session_id)
+        except PoolBusy as e:
+            return f"[Python Error] {e}; try again shortly."
+        try:
+            return worker.execute(code, self.timeout)
+        except WorkerError as e:
+            with self._lock:
+                if self._sessions.get(session_id) is worker:
+                    del self._sessions[session_id]
+            return f"[Python Error] Execution stopped: {e}. Variables from earlier calls were lost."
+        finally:
+            with self._lock:
+                worker.users -= 1
+                self._freed.notify_all()
+
+    def end_session(self, session_id: str):
+        with self._lock:
+            worker = self._sessions.pop(session_id, None)
+        if worker:
+            worker.kill()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"idle": len(self._idle), "sessions": len(self._sessions)}
+
+    def shutdown(self):
+        with self._lock:
+            workers = self._idle + list(self._sessions.values())
+            self._idle, self._sessions = [], {}
+        self._retire(workers)
+
+
+def sanitize_input(query: str) -> str:
+    """Strip surrounding whitespace, backticks and a leading "python", as PythonREPLTool does."""
+    query = re.sub(r"^(\s|`)*(?i:python)?\s*", "", query)
+    return re.sub(r"(\s|`)*$", "", query)
+
+
+class SandboxedPythonTool(BaseTool):
+    """Drop-in replacement for PythonREPLTool that runs code in the worker pool."""
+
+    name: str = "Python_REPL"
+    description: str = (
+        "A Python shell. Use this to execute python commands. "
+        "Input should be a valid python command. "
+        "If you want to see the output of a value, you should print it out "
+        "with `print(...)`. "
+        "Runs in the agent_working directory; variables persist between calls in the same conversation."
+    )
+    pool: Any = None
+
+    def __init__(self, pool: WorkerPool = None, **kwargs: Any):
+        super().__init__(pool=pool or WorkerPool(), **kwargs)
+
+    def _run(self, query: str, run_manager=None) -> str:
+        return self.pool.run(sanitize_input(query))
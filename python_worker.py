@@ -0,0 +1,50 @@
+"""
+Worker process for python_sandbox: runs agent code sent as JSON lines on stdin.
+
+Usage: python python_worker.py <memory_limit_mb> [module ...]
+The listed modules are imported up front, then the address-space limit is applied. Every
+request's stdout/stderr is captured and returned as {"output": ...} on the original stdout.
+Globals persist between requests, like an interactive session.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import traceback
+
+
+def main(memory_limit_mb: int, preload):
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)  # output written straight to fd 1 by C code can't corrupt the protocol
+
+    for module in preload:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+    protocol.write(json.dumps({"ready": True}) + "\n")
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    for line in sys.stdin:
+        code = json.loads(line)["code"]
+        buffer = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+                exec(compile(code, "<agent>", "exec"), namespace)
+        except MemoryError:
+            buffer.write(f"MemoryError: exceeded the {memory_limit_mb} MB memory limit\n")
+        except BaseException:
+            buffer.write(traceback.format_exc(limit=-3))
+        protocol.write(json.dumps({"output": buffer.getvalue()}) + "\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]), sys.argv[2:])
@@ -0,0 +1,82 @@
+"""
+Rate control shared by the tools that call quota-limited APIs.
+
+`TokenBucket` throttles callers across threads and, when given a state file, across every
+process on the machine that uses the same file. `backoff_delay` computes exponential
+backoff with jitter, honoring a server-supplied retry-after hint when there is one.
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the bucket is shared across threads only
+    fcntl = None
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: float, state_file: Optional[str] = None):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.state_file = state_file if fcntl else None
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = time.time()
+
+    @contextmanager
+    def _state(self):
+        """Yield the current (tokens, updated) state and persist whatever the caller stores back."""
+        if not self.state_file:
+            yield self
+            return
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        with open(self.state_file, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    data = json.loads(f.read() or "{}")
+                except ValueError:
+                    data = {}
+                self._tokens = data.get("tokens", self.capacity)
+                self._updated = data.get("updated", time.time())
+                yield self
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": self._tokens, "updated": self._updated}))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take `tokens` if available and return 0, otherwise return the seconds to wait."""
+        with self._lock, self._state():
+            now = time.time()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until `tokens` are available."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): exponential backoff with full
+    jitter, or the server's retry-after hint (plus a little jitter) when it is given.
+    """
+    if retry_after is not None:
+        return min(cap, retry_after) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,154 @@
+"""
+TTL cache with single-flight request coalescing for Tavily web search.
+
+`CachedTavilySearch` is a drop-in `TavilySearch`: results are cached in memory, keyed by
+the normalized query plus every search parameter, for SEARCH_CACHE_TTL seconds, and at most
+SEARCH_CACHE_MAX_ENTRIES are kept (least recently used evicted first). Identical searches
+that arrive while one is in flight wait for it instead of calling the API again. Errors are
+never cached.
+"""
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict
+from langchain_tavily import TavilySearch
+from pydantic import Field
+import tracing
+
+
+def enabled() -> bool:
+    return os.getenv("SEARCH_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """Thread-safe LRU of search results with a per-entry TTL, plus the set of in-flight searches."""
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("SEARCH_CACHE_TTL", "900"))
+        self.max_entries = max_entries or int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value):
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def claim(self, key: str):
+        """
+        Returns ("hit", value), ("wait", future) when an identical search is in flight,
+        or ("lead", future) when the caller must run the search and `settle` the future.
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self.hits += 1
+                return "hit", value
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return "wait", future
+            self.misses += 1
+            future = Future()
+            self._inflight[key] = future
+            return "lead", future
+
+    def settle(self, key: str, future: Future, value=None, error: BaseException = None, cache: bool = True):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None and cache:
+                self._put(key, value)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "entries": len(self._entries), "max_entries": self.max_entries,
+            }
+
+
+def _cacheable(result) -> bool:
+    return isinstance(result, dict) and "error" not in result
+
+
+class CachedTavilySearch(TavilySearch):
+    """TavilySearch that answers repeated and concurrent identical queries from a shared `SearchCache`."""
+
+    search_cache: SearchCache = Field(default_factory=SearchCache, exclude=True)
+
+    def _cache_key(self, query: str, params: dict) -> str:
+        config = {
+            name: getattr(self, name, None)
+            for name in (
+                "max_results", "topic", "search_depth", "time_range", "country", "include_domains",
+                "exclude_domains", "include_images", "include_answer", "include_raw_content",
+                "include_image_descriptions", "auto_parameters",
+            )
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        return json.dumps([normalize_query(query), params, config], sort_keys=True, default=str)
+
+    def _run(self, query: str, run_manager=None, **kwargs: Any) -> Dict[str, Any]:
+        key = self._cache_key(query, kwargs)
+        state, value = self.search_cache.claim(key)
+        tracing.annotate(cache={"hit": "hit", "wait": "coalesced"}.get(state, "miss"))
+        if state == "hit":
+            return copy.deepcopy(value)
+        if state == "wait":
+            return copy.deepcopy(value.result())
+        try:
+            result = super()._run(query, run_manager=run_manager, **kwargs)
+        except BaseException as e:
+            self.search_cache.settle(key, value, error=e)
+            raise
+        self.search_cache.settle(key, value, result, cache=_cacheable(result))
+        return copy.deepcopy(result)
+
+    async def _arun(self, query: str, run_manager=None, **kwargs: Any) -> Dict[str, Any]:
+        key = self._cache_key(query, kwargs)
+        state, value = self.search_cache.claim(key)
+        tracing.annotate(cache={"hit": "hit", "wait": "coalesced"}.get(state, "miss"))
+        if state == "hit":
+            return copy.deepcopy(value)
+        if state == "wait":
+            return copy.deepcopy(await asyncio.wrap_future(value))
+        try:
+            result = await super()._arun(query, run_manager=run_manager, **kwargs)
+        except BaseException as e:
+            self.search_cache.settle(key, value, error=e)
+            raise
+        self.search_cache.settle(key, value, result, cache=_cacheable(result))
+        return copy.deepcopy(result)
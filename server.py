@@ -0,0 +1,375 @@
+"""
+Multi-session HTTP API for the agent, on asyncio and the standard library only.
+
+    python server.py [--host 127.0.0.1] [--port 8000]
+
+Endpoints (JSON in, JSON out):
+    POST   /sessions                      -> {"session_id"}
+    POST   /sessions/<id>/messages        {"message": "..."} -> {"response", "usage"}
+           add ?stream=1 to receive the agent's events as NDJSON while it runs
+    GET    /sessions/<id>                 -> session usage
+    DELETE /sessions/<id>
+    GET    /health
+    GET    /metrics
+
+Every session has its own history window, usage totals and Python sandbox worker; the
+LLM, the compiled agent and the Google clients are shared. At most
+SERVER_MAX_CONCURRENT_RUNS agent turns run at once. One session runs one turn at a time, and
+up to SERVER_MAX_QUEUED turns wait, for a slot or for their session's previous turn; beyond
+that requests are refused with 503 and Retry-After. Sessions idle for SERVER_SESSION_TTL
+seconds are dropped.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from main import aget_agent_response, astream_agent_response, count_tokens, runtime, python_tool, search_tool, response_cache, router
+from history_window import HistoryWindow
+from metering import SessionUsage
+
+MAX_CONCURRENT_RUNS = int(os.getenv("SERVER_MAX_CONCURRENT_RUNS", "8"))
+MAX_QUEUED = int(os.getenv("SERVER_MAX_QUEUED", "32"))
+SESSION_TTL = float(os.getenv("SERVER_SESSION_TTL", "3600"))
+MAX_BODY_BYTES = 1024 * 1024
+HEADER_TIMEOUT = 30
+
+_REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+@dataclass
+class Session:
+    id: str
+    window: HistoryWindow
+    messages: List[dict] = field(default_factory=list)
+    usage: SessionUsage = field(default_factory=SessionUsage)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_active: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> dict:
+        return {"session_id": self.id, "messages": len(self.messages), "usage": self.usage.to_dict()}
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.by_status: Dict[int, int] = {}
+        self.turns = 0
+        self.turn_errors = 0
+        self.rejected = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.turn_seconds = deque(maxlen=1000)
+
+    def latency(self) -> dict:
+        samples = sorted(self.turn_seconds)
+        if not samples:
+            return {}
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+        return {"mean": statistics.fmean(samples), "p50": pick(0.5), "p95": pick(0.95), "max": samples[-1]}
+
+
+class AgentServer:
+    def __init__(self, max_concurrent_runs: int = MAX_CONCURRENT_RUNS, max_queued: int = MAX_QUEUED, session_ttl: float = SESSION_TTL):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_queued = max_queued
+        self.session_ttl = session_ttl
+        self.sessions: Dict[str, Session] = {}
+        self.metrics = Metrics()
+        self._slots = asyncio.Semaphore(max_concurrent_runs)
+        self._running = 0
+        self._waiting = 0
+
+    # --- Sessions ---
+
+    def create_session(self) -> Session:
+        session = Session(id=uuid.uuid4().hex, window=HistoryWindow(count_tokens=count_tokens))
+        self.sessions[session.id] = session
+        return session
+
+    def get_session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HttpError(404, f"Unknown session {session_id}")
+        session.last_active = time.monotonic()
+        return session
+
+    async def end_session(self, session_id: str):
+        if self.sessions.pop(session_id, None) is None:
+            raise HttpError(404, f"Unknown session {session_id}")
+        # Stopping the worker can block for seconds; keep it off the event loop
+        await asyncio.to_thread(python_tool.pool.end_session, session_id)
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if now - session.last_active > self.session_ttl and not session.lock.locked():
+                    self.sessions.pop(session.id, None)
+                    await asyncio.to_thread(python_tool.pool.end_session, session.id)
+
+    # --- Agent turns ---
+
+    async def _admit(self, session: Session):
+        """
+        Take the session's lock, then a run slot. The session lock comes first, so turns queued
+        behind the same session don't hold run slots; waiting for either counts toward max_queued.
+        """
+        if self._waiting >= self.max_queued and (session.lock.locked() or self._slots.locked()):
+            self.metrics.rejected += 1
+            raise HttpError(503, "Server is busy, retry later", {"Retry-After": "5"})
+        self._waiting += 1
+        try:
+            await session.lock.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                session.lock.release()
+                raise
+        finally:
+            self._waiting -= 1
+        self._running += 1
+
+    def _release(self, session: Session):
+        self._running -= 1
+        self._slots.release()
+        session.lock.release()
+
+    def _record_turn(self, session: Session, message: str, response: str, usage, seconds: float):
+        session.messages.append({"role": "user", "content": message})
+        session.messages.append({"role": "assistant", "content": response})
+        self.metrics.turns += 1
+        self.metrics.turn_seconds.append(seconds)
+        self.metrics.input_tokens += usage.input_tokens
+        self.metrics.output_tokens += usage.output_tokens
+        self.metrics.cost += usage.cost
+
+    async def run_turn(self, session: Session, message: str) -> dict:
+        await self._admit(session)
+        try:
+            started = time.perf_counter()
+            chat_history = session.window.build(session.messages)
+            try:
+                response, *_ = await aget_agent_response(message, chat_history, session.usage, session.id)
+            except Exception:
+                self.metrics.turn_errors += 1
+                raise
+            usage = session.usage.turns[-1]
+            self._record_turn(session, message, response, usage, time.perf_counter() - started)
+            return {"response": response, "usage": usage.to_dict()}
+        finally:
+            self._release(session)
+
+    async def stream_turn(self, session: Session, message: str):
+        """
+        Like `run_turn`, but yields the agent's events as they happen. The first item is None,
+        yielded once the turn is admitted; `route` consumes it before any header goes out.
+        """
+        await self._admit(session)
+        try:
+            yield None
+            started = time.perf_counter()
+            chat_history = session.window.build(session.messages)
+            try:
+                async for event in astream_agent_response(message, chat_history, session.usage, session.id):
+                    if event["type"] == "final":
+                        usage = event.pop("usage")
+                        self._record_turn(session, message, event["output"], usage, time.perf_counter() - started)
+                        event["usage"] = usage.to_dict()
+                    yield event
+            except Exception:
+                self.metrics.turn_errors += 1
+                raise
+        finally:
+            self._release(session)
+
+    # --- HTTP ---
+
+    def health(self) -> dict:
+        return {"status": "ok", "sessions": len(self.sessions), "running": self._running, "queued": self._waiting}
+
+    def metrics_snapshot(self) -> dict:
+        m = self.metrics
+        snapshot = {
+            "uptime_seconds": time.time() - m.started,
+            "requests": m.requests,
+            "responses_by_status": m.by_status,
+            "sessions": len(self.sessions),
+            "runs": {"running": self._running, "queued": self._waiting, "max_concurrent": self.max_concurrent_runs,
+                     "max_queued": self.max_queued, "rejected": m.rejected},
+            "turns": {"completed": m.turns, "errors": m.turn_errors, "latency_seconds": m.latency()},
+            "usage": {"input_tokens": m.input_tokens, "output_tokens": m.output_tokens, "cost": m.cost},
+            "python_workers": python_tool.pool.stats(),
+            "tool_routing": router.stats.to_dict(),
+        }
+        if hasattr(search_tool, "search_cache"):
+            snapshot["search_cache"] = search_tool.search_cache.stats()
+        if response_cache is not None:
+            snapshot["llm_cache"] = response_cache.stats()
+        return snapshot
+
+    async def route(self, method: str, path: str, query: dict, body: Optional[dict]):
+        """Returns a JSON-able result, or an async iterator of events for streaming responses."""
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return 200, self.health()
+        if parts == ["metrics"] and method == "GET":
+            return 200, self.metrics_snapshot()
+        if parts == ["sessions"] and method == "POST":
+            return 201, {"session_id": self.create_session().id}
+        if len(parts) == 2 and parts[0] == "sessions":
+            if method == "GET":
+                return 200, self.get_session(parts[1]).to_dict()
+            if method == "DELETE":
+                await self.end_session(parts[1])
+                return 204, None
+            raise HttpError(405, "Use GET or DELETE")
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages":
+            if method != "POST":
+                raise HttpError(405, "Use POST")
+            session = self.get_session(parts[1])
+            message = (body or {}).get("message")
+            if not isinstance(message, str) or not message.strip():
+                raise HttpError(400, 'Body must be {"message": "<text>"}')
+            if query.get("stream", ["0"])[0] in ("1", "true"):
+                events = self.stream_turn(session, message)
+                await events.__anext__()  # wait for admission, so a full queue gets a 503 instead of a 200
+                return 200, events
+            return 200, await self.run_turn(session, message)
+        raise HttpError(404, f"No route for {method} {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request_line: bytes, reader, writer) -> bool:
+        self.metrics.requests += 1
+        keep_alive = False
+        try:
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                raise HttpError(400, "Malformed request line")
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                keep_alive = False
+                raise HttpError(413, "Request body too large")
+            body = None
+            if length:
+                try:
+                    body = json.loads(await reader.readexactly(length))
+                except ValueError:
+                    raise HttpError(400, "Body must be JSON")
+            url = urlsplit(target)
+            status, result = await self.route(method.upper(), url.path, parse_qs(url.query), body)
+        except HttpError as e:
+            await self._send(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+            return keep_alive
+        except Exception as e:
+            print(f"[Server Error] {e}")
+            await self._send(writer, 500, {"error": str(e)}, False)
+            return False
+        if hasattr(result, "__aiter__"):
+            await self._send_stream(writer, result)
+            return False
+        await self._send(writer, status, result, keep_alive)
+        return keep_alive
+
+    async def _send(self, writer, status: int, payload, keep_alive: bool, extra_headers: Optional[dict] = None):
+        self.metrics.by_status[status] = self.metrics.by_status.get(status, 0) + 1
+        body = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {}),
+        }
+        head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer, events):
+        """Write events as NDJSON over a chunked response; the connection closes afterwards."""
+        self.metrics.by_status[200] = self.metrics.by_status.get(200, 0) + 1
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+            )
+            try:
+                async for event in events:
+                    line = json.dumps(event, default=str).encode("utf-8") + b"\n"
+                    writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+                    await writer.drain()
+            except Exception as e:
+                print(f"[Server Error] {e}")
+                line = json.dumps({"type": "error", "error": str(e)}).encode("utf-8") + b"\n"
+                writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        finally:
+            await events.aclose()  # releases the turn's session and run slot
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int):
+    # Sync tools run on the runtime's bounded tool pool, as they do for the CLI and GUI
+    asyncio.get_running_loop().set_default_executor(runtime.tool_pool)
+    app = AgentServer()
+    server = await asyncio.start_server(app.handle, host, port)
+    asyncio.get_running_loop().create_task(app.expire_sessions())
+    print(f"Agent server listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the agent over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
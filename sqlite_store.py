@@ -0,0 +1,38 @@
+"""
+SQLite plumbing shared by the local stores under agent_working/ (calendar store, Gmail
+mirror, LLM response cache): WAL-mode connections that commit on success, and a small
+key/value `state` table for sync checkpoints and similar bookkeeping.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+STATE_SCHEMA = "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);"
+
+
+@contextmanager
+def connect(path: str):
+    """A connection in WAL mode (readers don't block the writer), committed on success and rolled back on error."""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def create(path: str, schema: str):
+    """Create the database file (and its directory) if needed, and apply `schema` plus the state table."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with connect(path) as conn:
+        conn.executescript(schema + STATE_SCHEMA)
+
+
+def get_state(conn, key: str):
+    row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn, **values):
+    conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
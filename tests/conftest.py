@@ -0,0 +1,23 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test from an empty directory with its own agent_working/, as the tools expect."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("agent_working")
+    return tmp_path
+
+
+@pytest.fixture
+def main(workdir, monkeypatch):
+    """The `main` module, imported with placeholder API keys and no Python worker pool, LLM cache or tracing."""
+    for name in ("OPENROUTER_API_KEY", "TAVILY_API_KEY", "GEMINI_API_KEY"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("PYTHON_POOL_SIZE", "0")
+    monkeypatch.setenv("LLM_CACHE", "0")
+    monkeypatch.setenv("TRACING", "0")
+    return importlib.import_module("main")
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+
+from agent_runtime import AgentRuntime
+from benchmark_fakes import ScriptedChatModel
+
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Test agent."),
+    MessagesPlaceholder("chat_history", optional=True),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
+
+running = []
+peak = []
+lock = threading.Lock()
+
+
+@tool
+def slow_lookup(key: str) -> str:
+    """Look up a key slowly."""
+    with lock:
+        running.append(key)
+        peak.append(len(running))
+    time.sleep(0.3)
+    with lock:
+        running.remove(key)
+    return f"value of {key}"
+
+
+@tool
+def other_tool(text: str) -> str:
+    """Echo text."""
+    return text
+
+
+SCRIPTS = {
+    "Look up a, b and c.": [
+        [("slow_lookup", {"key": "a"}), ("slow_lookup", {"key": "b"}), ("slow_lookup", {"key": "c"})],
+        "Done.",
+    ],
+}
+
+
+@pytest.fixture
+def runtime():
+    peak.clear()
+    return AgentRuntime(ScriptedChatModel(scripts=SCRIPTS), [slow_lookup, other_tool], PROMPT, verbose=False)
+
+
+def test_tool_calls_of_one_step_run_concurrently(runtime):
+    executor = runtime.get_executor()
+    executor.return_intermediate_steps = True
+    started = time.perf_counter()
+    result = runtime.run(executor.ainvoke({"input": "Look up a, b and c.", "chat_history": []}))
+    assert time.perf_counter() - started < 0.8
+    assert max(peak) == 3
+    assert result["output"] == "Done."
+    assert [observation for _, observation in result["intermediate_steps"]] == ["value of a", "value of b", "value of c"]
+
+
+def test_executors_are_compiled_once_per_tool_set(runtime):
+    assert runtime.get_executor() is runtime.get_executor()
+    subset = runtime.get_executor([other_tool])
+    assert subset is runtime.get_executor([other_tool]) and subset is not runtime.get_executor()
+    rebuilt = runtime.rebuild(llm=ScriptedChatModel(scripts={}, output_tokens=1))
+    assert rebuilt is runtime.get_executor() and runtime.get_executor([other_tool]) is not subset
+
+
+def test_iterate_yields_items_then_raises(runtime):
+    async def items():
+        yield 1
+        yield 2
+        raise ValueError("broken")
+
+    received = []
+    with pytest.raises(ValueError):
+        for item in runtime.iterate(items()):
+            received.append(item)
+    assert received == [1, 2]
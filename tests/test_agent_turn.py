@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from benchmark_fakes import ScriptedChatModel
+from metering import SessionUsage
+
+SCRIPTS = {
+    "Tell me a joke.": ["Light attracts bugs."],
+    "Save a note.": [[("write_to_file", {"filename": "note.txt", "content": "remember"})], "Saved it."],
+}
+
+
+@pytest.fixture(autouse=True)
+def scripted_model(main):
+    main.runtime.rebuild(llm=ScriptedChatModel(scripts=SCRIPTS))
+
+
+def test_chunk_text_joins_content_parts(main):
+    assert main._chunk_text(AIMessageChunk(content="plain")) == "plain"
+    assert main._chunk_text(AIMessageChunk(content=[{"type": "text", "text": "a"}, "b"])) == "ab"
+
+
+def test_get_agent_response_records_usage(main):
+    usage = SessionUsage()
+    response, input_tokens, output_tokens, cost = main.get_agent_response("Tell me a joke.", [], usage)
+    assert response == "Light attracts bugs."
+    assert output_tokens == 40
+    assert len(usage.turns) == 1 and usage.output_tokens == 40
+
+
+def test_stream_agent_response_reports_tools_and_final(main, workdir):
+    usage = SessionUsage()
+    events = list(main.stream_agent_response("Save a note.", [], usage))
+    kinds = [e["type"] for e in events]
+    assert kinds.index("tool_start") < kinds.index("tool_end") < kinds.index("final") == len(kinds) - 1
+    final = events[-1]
+    assert final["output"] == "Saved it."
+    assert final["usage"] is usage.turns[-1]
+    assert final["completion_tokens"] == 80  # two model calls
+    assert (workdir / "agent_working" / "note.txt").read_text() == "remember"
+
+
+def test_failed_turn_is_not_added_to_usage(main, monkeypatch):
+    class FailingExecutor:
+        async def ainvoke(self, *args, **kwargs):
+            raise RuntimeError("model down")
+
+    monkeypatch.setattr(main, "select_executor", lambda *args: FailingExecutor())
+    usage = SessionUsage()
+    with pytest.raises(RuntimeError):
+        main.get_agent_response("Tell me a joke.", [], usage)
+    assert usage.turns == []
+
+
+def test_cli_history_stays_within_the_window(main, monkeypatch, capsys):
+    from conversation_memory import ConversationMemory
+    from history_window import HISTORY_TOKEN_BUDGET
+
+    inputs = iter([f"question {i} " + "word " * 400 for i in range(30)] + ["exit"])
+    sent = []
+
+    def fake_stream(user_input, chat_history, session_usage=None, session_id=None):
+        sent.append(sum(main.count_tokens(m.content) for m in chat_history))
+        yield {"type": "final", "output": "answer " * 400, "usage": main.TurnUsage()}
+
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(inputs))
+    monkeypatch.setattr(main, "stream_agent_response", fake_stream)
+    monkeypatch.setattr(main, "new_memory", lambda: ConversationMemory(lambda summary, turns: "summary", main.count_tokens))
+    main.main()
+    assert len(sent) == 30 and sent[0] == 0
+    assert max(sent) <= HISTORY_TOKEN_BUDGET + 20  # plus the digest header line
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+import benchmark
+
+
+def test_summarize():
+    summary = benchmark._summarize([0.3, 0.1, 0.2])
+    assert summary == {"n": 3, "mean_ms": 200.0, "p50_ms": 200.0, "p90_ms": 300.0, "p99_ms": 300.0, "max_ms": 300.0}
+
+
+def test_every_scenario_runs_its_tools_offline(tmp_path):
+    report_path = tmp_path / "report.json"
+    env = dict(os.environ, PYTHON_POOL_SIZE="0", TRACING="0")
+    subprocess.run(
+        [sys.executable, benchmark.__file__, "--output", str(report_path), "agent", "--iterations", "1", "--warmup", "0"],
+        cwd=tmp_path, env=env, check=True, capture_output=True, timeout=300,
+    )
+    report = json.loads(report_path.read_text())
+    assert set(report["by_scenario"]) == set(benchmark.SCENARIOS)
+    scripted = {name for _, steps in benchmark.SCENARIOS.values() for step in steps if not isinstance(step, str) for name, _ in step}
+    assert scripted <= set(report["per_tool"])
+    assert not (tmp_path / "agent_working").exists()  # the benchmark works in its own scratch directory
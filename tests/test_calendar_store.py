@@ -0,0 +1,111 @@
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import calendar_store
+import calender_tools
+from benchmark_fakes import FakeCalendar, Latency
+from calendar_store import CalendarStore
+
+
+def _iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+class SyncingCalendar(FakeCalendar):
+    """FakeCalendar whose list() honors syncToken: it returns only events changed since that token."""
+
+    def __init__(self, **kwargs):
+        super().__init__(Latency(), **kwargs)
+        self.version = 0
+        self.changed = {}  # event id -> version it last changed at
+        self.cancelled = {}
+        self.lists = []
+        self.expired_tokens = set()
+
+    def change(self, event: dict):
+        self.version += 1
+        self.changed[event["id"]] = self.version
+        if event.get("status") == "cancelled":
+            self.store.pop(event["id"], None)
+            self.cancelled[event["id"]] = event
+        else:
+            self.store[event["id"]] = event
+
+    def _list(self, maxResults: int = 250, **kwargs):
+        token = kwargs.get("syncToken")
+        self.lists.append(token)
+        if token in self.expired_tokens:
+            raise HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid")
+        items = list(self.store.values())
+        if token:
+            since = int(token)
+            items = [e for e in items if self.changed.get(e["id"], 0) > since]
+            items += [e for e in self.cancelled.values() if self.changed[e["id"]] > since]
+        return {"items": items, "nextSyncToken": str(self.version)}
+
+
+@pytest.fixture
+def store(workdir):
+    return CalendarStore(path="agent_working/calendar.sqlite3", max_age=3600)
+
+
+def test_upcoming_is_ordered_and_skips_ended_events(store):
+    service = SyncingCalendar(events=5)
+    now = time.time()
+    service.change({"id": "past", "summary": "Done", "start": {"dateTime": _iso(now - 7200)}, "end": {"dateTime": _iso(now - 3600)}})
+    service.change({"id": "allday", "summary": "Holiday", "start": {"date": "2999-01-01"}, "end": {"date": "2999-01-02"}})
+    events = store.upcoming(service, max_results=10)
+    assert [e["id"] for e in events] == ["e0000", "e0001", "e0002", "e0003", "e0004", "allday"]
+
+
+def test_sync_is_skipped_while_fresh(store):
+    service = SyncingCalendar(events=3)
+    store.upcoming(service)
+    store.get(service, "e0001")
+    assert service.lists == [None]
+
+
+def test_sync_applies_deltas_and_cancellations(store):
+    service = SyncingCalendar(events=3)
+    store.sync(service)
+    renamed = dict(service.store["e0001"], summary="Renamed")
+    service.change(renamed)
+    service.change({"id": "e0002", "status": "cancelled"})
+    store.sync(service, force=True)
+    assert service.lists[-1] == "0"
+    assert store.get(service, "e0001")["summary"] == "Renamed"
+    assert store.get(service, "e0002") is None
+
+
+def test_expired_sync_token_triggers_a_full_resync(store):
+    service = SyncingCalendar(events=3)
+    store.sync(service)
+    service.expired_tokens.add("0")
+    del service.store["e0000"]  # a deletion the store can only learn about from a full listing
+    store.sync(service, force=True)
+    assert service.lists == [None, "0", None]
+    assert store.get(service, "e0000") is None
+    assert store.get(service, "e0001") is not None
+
+
+def test_update_patches_only_the_changed_fields(store, monkeypatch):
+    service = SyncingCalendar(events=2)
+    store.sync(service)
+    service.store["e0000"]["description"] = "edited elsewhere"
+    monkeypatch.setattr(calender_tools, "get_calendar_service", lambda: service)
+    monkeypatch.setattr(calendar_store, "get_store", lambda: store)
+
+    result = calender_tools.update_calendar_event.invoke({"event_id": "e0000", "new_summary": "New title"})
+    assert result.startswith("Event updated")
+    assert service.store["e0000"]["description"] == "edited elsewhere"
+    assert service.store["e0000"]["summary"] == "New title"
+    assert store.get(service, "e0000")["summary"] == "New title"
+
+
+def test_update_without_changes_does_not_call_the_api(monkeypatch):
+    monkeypatch.setattr(calender_tools, "get_calendar_service", lambda: pytest.fail("API called"))
+    result = calender_tools.update_calendar_event.invoke({"event_id": "e0000"})
+    assert result.startswith("Nothing to update")
@@ -0,0 +1,102 @@
+import threading
+
+from conversation_memory import ConversationMemory
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def summarize_to(summary: str):
+    calls = []
+
+    def summarize(previous, turns):
+        calls.append((previous, [t["user"] for t in turns]))
+        return summary
+
+    summarize.calls = calls
+    return summarize
+
+
+def test_summarizes_only_once_over_budget():
+    summarize = summarize_to("short summary")
+    memory = ConversationMemory(summarize, count_words, token_budget=20)
+    memory.add_turn("one two three", "four five")  # 7 tokens with the role prefixes
+    assert memory.maybe_summarize() is None
+    memory.add_turn("six seven eight nine ten", "eleven twelve thirteen fourteen fifteen sixteen")
+    memory.maybe_summarize().result()
+    assert summarize.calls == [("", ["one two three", "six seven eight nine ten"])]
+    assert memory.summary == "short summary"
+    assert memory.turns == []
+    assert memory.history_tokens() == 2
+
+
+def test_a_long_summary_does_not_retrigger_every_turn():
+    summarize = summarize_to(" ".join(["word"] * 40))  # longer than the whole budget
+    memory = ConversationMemory(summarize, count_words, token_budget=20)
+    for i in range(10):
+        memory.add_turn(f"question {i}", f"answer {i}")
+        memory.maybe_summarize()
+        memory.wait()
+    # Turns are 6 words each: the first summary comes after 4 turns, then the summary
+    # counts for half the budget (10) and every 2 turns fill the rest
+    assert [len(turns) for _, turns in summarize.calls] == [4, 2, 2, 2]
+
+
+def test_turns_added_during_a_summary_are_kept():
+    release = threading.Event()
+
+    def summarize(previous, turns):
+        release.wait(5)
+        return "summary"
+
+    memory = ConversationMemory(summarize, count_words, token_budget=5)
+    memory.add_turn("a b c", "d e f")
+    pending = memory.maybe_summarize()
+    memory.add_turn("late", "turn")
+    assert memory.maybe_summarize() is None  # one summary at a time
+    release.set()
+    pending.result()
+    assert [t["user"] for t in memory.turns] == ["late"]
+
+
+def test_clear_discards_an_in_flight_summary():
+    release = threading.Event()
+    memory = ConversationMemory(lambda previous, turns: release.wait(5) and "stale", count_words, token_budget=1)
+    memory.add_turn("a", "b")
+    pending = memory.maybe_summarize()
+    memory.clear()
+    release.set()
+    pending.result()
+    assert memory.summary == "" and memory.turns == []
+
+
+def test_failed_summary_keeps_the_history(capsys):
+    def summarize(previous, turns):
+        raise RuntimeError("model down")
+
+    memory = ConversationMemory(summarize, count_words, token_budget=1)
+    memory.add_turn("a", "b")
+    memory.maybe_summarize().result()
+    assert len(memory.turns) == 1
+    assert "[Memory Summary Error]" in capsys.readouterr().out
+
+
+def test_summary_is_written_to_its_own_path(tmp_path):
+    paths = [tmp_path / "summaries" / f"{name}.txt" for name in ("a", "b")]
+    for path, text in zip(paths, ("first session", "second session")):
+        memory = ConversationMemory(summarize_to(text), count_words, token_budget=1, summary_path=str(path))
+        memory.add_turn("x", "y")
+        memory.maybe_summarize().result()
+    assert [p.read_text() for p in paths] == ["first session", "second session"]
+
+
+def test_build_input_prefixes_summary_and_recent_turns():
+    memory = ConversationMemory(summarize_to("s"), count_words, token_budget=1000)
+    assert memory.build_input("hi") == "hi"
+    memory.summary = "User likes tea."
+    for i in range(3):
+        memory.add_turn(f"q{i}", f"a{i}")
+    text = memory.build_input("hi")
+    assert text.startswith("Summary of previous conversation:\nUser likes tea.")
+    assert "q0" not in text and "User: q1\nAssistant: a1" in text and text.endswith("User: hi")
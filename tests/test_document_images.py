@@ -0,0 +1,88 @@
+import threading
+import time
+
+from docx import Document
+from PIL import Image
+
+import document_tools
+from document_tools import create_docx_document, generate_images, prepare_image
+
+
+def _save(path, mode, size):
+    Image.new(mode, size).save(path)
+    return path
+
+
+def test_large_images_are_downscaled_to_their_placement(workdir):
+    source = _save("agent_working/photo.png", "RGB", (1536, 1024))
+    prepared = prepare_image(source, width_in=2, dpi=100)
+    assert prepared.endswith(".jpg")
+    with Image.open(prepared) as img:
+        assert img.size == (200, 133)
+    assert prepare_image(source, width_in=2, dpi=100) == prepared
+
+
+def test_transparent_images_stay_png(workdir):
+    source = _save("agent_working/logo.png", "RGBA", (800, 800))
+    prepared = prepare_image(source, width_in=1, dpi=100)
+    assert prepared.endswith(".png")
+    with Image.open(prepared) as img:
+        assert img.mode == "RGBA" and img.size == (100, 100)
+
+
+def test_small_or_unreadable_images_are_used_as_is(workdir):
+    small = _save("agent_working/small.png", "RGB", (100, 50))
+    assert prepare_image(small, width_in=5, dpi=150) == small
+    with open("agent_working/broken.png", "wb") as f:
+        f.write(b"not an image")
+    assert prepare_image("agent_working/broken.png", width_in=1) == "agent_working/broken.png"
+
+
+class FakeImageModel:
+    """Stands in for _generate_image: records peak concurrency; prompts starting with "fail"/"none" fail."""
+
+    def __init__(self):
+        self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, filename):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(0.05)
+            if prompt.startswith("fail"):
+                raise RuntimeError("model error")
+            if prompt.startswith("none"):
+                return None
+            return _save(f"agent_working/{filename}", "RGB", (64, 64))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_generate_images_runs_concurrently_and_drops_failures(workdir, monkeypatch):
+    model = FakeImageModel()
+    monkeypatch.setattr(document_tools, "_generate_image", model)
+    monkeypatch.setattr(document_tools, "IMAGE_CONCURRENCY", 3)
+    jobs = {i: (f"picture {i}", f"img_{i}.png") for i in range(6)}
+    jobs.update({"a": ("fail", "a.png"), "b": ("none", "b.png")})
+    paths = generate_images(jobs)
+    assert sorted(paths) == list(range(6)) and paths[4] == "agent_working/img_4.png"
+    assert model.peak == 3
+    assert generate_images({}) == {}
+
+
+def test_docx_keeps_paragraph_order_and_skips_failed_images(workdir, monkeypatch):
+    monkeypatch.setattr(document_tools, "_generate_image", FakeImageModel())
+    content = [
+        {"text": "One", "image_prompt": "a chart"},
+        {"text": "Two", "image_prompt": "fail"},
+        {"text": "Three"},
+        {"text": "Four", "image_prompt": "a photo"},
+    ]
+    reply = create_docx_document.invoke({"title": "Report", "content": content})
+    assert reply == "✅ Document saved to agent_working/document.docx"
+    document = Document("agent_working/document.docx")
+    assert [p.text for p in document.paragraphs if p.text] == ["Report", "One", "Two", "Three", "Four"]
+    assert len(document.inline_shapes) == 2
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+import file_tools
+from file_tools import file_info, read_from_file, resolve_path, search_file, write_to_file
+
+
+def _write(name: str, data: bytes):
+    with open(os.path.join("agent_working", name), "wb") as f:
+        f.write(data)
+
+
+def _read(**kwargs) -> str:
+    return read_from_file.invoke(kwargs)
+
+
+@pytest.fixture
+def numbered(workdir):
+    _write("lines.txt", b"".join(f"line {i}\n".encode() for i in range(1, 101)))
+    return "lines.txt"
+
+
+def test_resolve_path_stays_inside_agent_working(workdir):
+    assert resolve_path("a/b.txt") == str(workdir / "agent_working" / "a" / "b.txt")
+    assert resolve_path("../secret") is None
+    assert resolve_path("/etc/passwd") is None
+    assert resolve_path("a/../../agent_working_other/x") is None
+
+
+def test_small_files_are_returned_whole(numbered):
+    assert _read(filename=numbered) == "".join(f"line {i}\n" for i in range(1, 101))
+
+
+def test_line_range(numbered):
+    assert _read(filename=numbered, start_line=3, end_line=5) == "[lines 3-5 of lines.txt]\nline 3\nline 4\nline 5\n"
+    assert _read(filename=numbered, start_line=99) == "[lines 99-100 of lines.txt]\nline 99\nline 100\n"
+    assert _read(filename=numbered, start_line=500) == "[lines none of lines.txt]\n"
+
+
+def test_line_range_is_cut_at_max_bytes(numbered):
+    result = _read(filename=numbered, start_line=1, end_line=50, max_bytes=20)
+    assert result == "[lines 1-2 of lines.txt]\nline 1\nline 2\n\n[cut at 20 bytes; continue with start_line=3]"
+
+
+def test_a_line_longer_than_max_bytes_continues_by_offset(workdir):
+    _write("long.txt", b"short\n" + b"x" * 100_000 + b"\nend\n")
+    result = _read(filename="long.txt", start_line=2, max_bytes=1000)
+    header, body, note = result.split("\n")
+    assert header == "[line 2 of long.txt is longer than 1000 bytes; bytes 6-1006 of 100011]"
+    assert body == "x" * 1000
+    assert note == "[continue with byte_offset=1006]"
+
+
+def test_tail_lines(numbered):
+    assert _read(filename=numbered, tail_lines=2) == "[last 2 lines of lines.txt, bytes 775-792 of 792]\nline 99\nline 100\n"
+    assert _read(filename=numbered, tail_lines=1000).endswith("line 1\nline 2\n" + "".join(f"line {i}\n" for i in range(3, 101)))
+
+
+def test_tail_across_read_blocks(workdir, monkeypatch):
+    monkeypatch.setattr(file_tools, "CHUNK_BYTES", 7)
+    _write("t.txt", b"alpha\nbeta\ngamma\ndelta")  # no trailing newline
+    assert _read(filename="t.txt", tail_lines=2).endswith("\ngamma\ndelta")
+
+
+def test_byte_ranges(numbered):
+    result = _read(filename=numbered, byte_offset=7, max_bytes=14)
+    assert result == "[bytes 7-21 of 792 of lines.txt]\nline 2\nline 3\n\n[bytes 7-21 of 792; continue with byte_offset=21]"
+    assert _read(filename=numbered, byte_offset=783).endswith("line 100\n")
+
+
+def test_reads_never_exceed_the_limit(workdir, monkeypatch):
+    monkeypatch.setattr(file_tools, "MAX_READ_BYTES", 50)
+    _write("big.txt", b"y" * 1000)
+    result = _read(filename="big.txt", max_bytes=10_000)
+    assert "\n" + "y" * 50 + "\n" in result and "continue with byte_offset=50" in result
+
+
+@pytest.mark.parametrize("argument", ["tail_lines", "start_line", "end_line"])
+def test_line_arguments_must_be_positive(numbered, argument):
+    assert _read(filename=numbered, **{argument: 0}) == f"Read failed: {argument} must be at least 1."
+
+
+def test_reads_outside_agent_working_are_refused(workdir):
+    assert _read(filename="../x").startswith("Error: Attempt to read outside agent_working")
+
+
+def test_search_file(numbered):
+    assert search_file.invoke({"filename": numbered, "pattern": "line 4"}) == "4: line 4\n40: line 40\n41: line 41\n42: line 42\n43: line 43\n44: line 44\n45: line 45\n46: line 46\n47: line 47\n48: line 48\n49: line 49"
+    assert search_file.invoke({"filename": numbered, "pattern": r"^line 1\d$", "regex": True, "max_matches": 2}) == "10: line 10\n11: line 11\n[stopped after 2 matches]"
+    assert search_file.invoke({"filename": numbered, "pattern": "LINE 100", "ignore_case": True}) == "100: line 100"
+    assert search_file.invoke({"filename": numbered, "pattern": "nothing"}) == "No matches for 'nothing' in lines.txt."
+    assert search_file.invoke({"filename": numbered, "pattern": "(", "regex": True}).startswith("Search failed: invalid regular expression")
+
+
+def test_search_counts_lines_across_chunks(workdir, monkeypatch):
+    monkeypatch.setattr(file_tools, "CHUNK_BYTES", 3)
+    _write("s.txt", b"a\nbb\nccc target\nd target target\n")
+    assert search_file.invoke({"filename": "s.txt", "pattern": "target"}) == "3: ccc target\n4: d target target"
+
+
+def test_file_info(numbered):
+    info = file_info.invoke({"filename": numbered})
+    assert info.startswith("lines.txt: 792 bytes, 100 lines, modified ")
+    assert info.endswith("First line: line 1")
+    _write("blob.bin", b"\0\1\2")
+    assert "binary" in file_info.invoke({"filename": "blob.bin"})
+
+
+def test_write_overwrites_atomically_and_appends(workdir):
+    path = workdir / "agent_working" / "out" / "log.csv"
+    assert write_to_file.invoke({"filename": "out/log.csv", "content": "a,b\n"}) == "Successfully wrote to out/log.csv."
+    os.chmod(path, 0o640)
+    write_to_file.invoke({"filename": "out/log.csv", "content": "c,d\n"})
+    assert path.read_text() == "c,d\n"
+    assert path.stat().st_mode & 0o777 == 0o640
+    write_to_file.invoke({"filename": "out/log.csv", "content": "e,f\n", "mode": "append"})
+    assert path.read_text() == "c,d\ne,f\n"
+    assert os.listdir(path.parent) == ["log.csv"]  # no temporary files left behind
+
+
+def test_writes_outside_agent_working_are_refused(workdir):
+    assert write_to_file.invoke({"filename": "../x.txt", "content": "x"}).startswith("Error")
+    assert not (workdir / "x.txt").exists()
@@ -0,0 +1,157 @@
+import os
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import gmail_tools
+from benchmark_fakes import FakeGmail, Latency
+
+
+def _http_error(status: int, **headers) -> HttpError:
+    return HttpError(httplib2.Response({"status": status, **headers}), b"{}")
+
+
+class FlakySendGmail(FakeGmail):
+    """
+    FakeGmail whose sends fail with the scripted errors first. An error scripted as
+    (error, True) is raised after the message was accepted, like a 5xx on a send that
+    went through; sent messages are found again by their Message-ID.
+    """
+
+    def __init__(self, *errors, lookup_error=None):
+        super().__init__(Latency(), messages=0)
+        self.errors = list(errors)
+        self.lookup_error = lookup_error
+        self.message_ids = []
+        self.attempts = []
+
+    def _send(self, body, media_body=None):
+        mime = media_body.getbytes(0, media_body.size())
+        message_id = next(line for line in mime.split(b"\r\n") if line.startswith(b"Message-ID: "))[12:].decode()
+        self.attempts.append(message_id)
+        error, accepted = (self.errors.pop(0) if self.errors else (None, True))
+        if accepted:
+            self.message_ids.append(message_id)
+            result = super()._send(body, media_body)
+        if error is not None:
+            raise error
+        return result
+
+    def _list(self, q: str = "", **kwargs) -> dict:
+        if self.lookup_error is not None:
+            raise self.lookup_error
+        wanted = q.removeprefix("rfc822msgid:")
+        return {"messages": [{"id": f"sent{i + 1}"} for i, m in enumerate(self.message_ids) if m.strip("<>") == wanted]}
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(workdir, monkeypatch):
+    delays = []
+    monkeypatch.setattr(gmail_tools.time, "sleep", delays.append)
+    monkeypatch.setattr(gmail_tools.send_limiter, "acquire", lambda tokens=1: None)
+    return delays
+
+
+MESSAGE = {"recipient": "ana@example.com", "subject": "Hi", "body": "Hello", "attachments": []}
+
+
+def test_render_fills_placeholders_and_skips_bad_rows(workdir):
+    (workdir / "agent_working" / "invoice_7.pdf").write_bytes(b"%PDF")
+    rows = [
+        {"email": "ana@example.com", "name": "Ana", "file": "invoice_7.pdf"},
+        {"email": "not-an-address", "name": "Bo"},
+        {"email": "cy@example.com"},
+        {"email": "di@example.com", "name": "Di", "file": "../../etc/passwd"},
+        {"email": "ed@example.com", "name": "Ed", "file": "missing.pdf"},
+    ]
+    messages = gmail_tools.render_messages(rows, "Invoice for {name}", "Dear {name}, {{see below}}", attachment_column="file")
+    assert [m["status"] for m in messages] == ["ready", "skipped", "skipped", "skipped", "skipped"]
+    first = messages[0]
+    assert (first["subject"], first["body"]) == ("Invoice for Ana", "Dear Ana, {see below}")
+    assert first["attachments"] == [str(workdir / "agent_working" / "invoice_7.pdf")]
+    assert messages[1]["error"] == "invalid address in column 'email': 'not-an-address'"
+    assert messages[2]["error"] == "no column 'name' for a template placeholder"
+    assert messages[3]["error"] == "attachment outside agent_working: ../../etc/passwd"
+    assert messages[4]["error"].startswith("attachment not found: ")
+
+
+def test_shared_attachments_must_be_inside_agent_working(workdir):
+    (workdir / "agent_working" / "terms.pdf").write_bytes(b"%PDF")
+    rows = [{"email": "ana@example.com"}]
+    messages = gmail_tools.render_messages(rows, "Hi", "Hello", attachments=["terms.pdf"])
+    assert messages[0]["attachments"] == [str(workdir / "agent_working" / "terms.pdf")]
+    with pytest.raises(ValueError, match="attachment outside agent_working: /etc/passwd"):
+        gmail_tools.render_messages(rows, "Hi", "Hello", attachments=["/etc/passwd"])
+    reply = gmail_tools.send_bulk_gmail.invoke({
+        "subject_template": "Hi", "body_template": "Hello", "rows": rows, "attachments": ["../token.pickle"],
+    })
+    assert reply == "Failed to send emails: attachment outside agent_working: ../token.pickle"
+
+
+def test_sent_on_the_first_attempt():
+    service = FlakySendGmail()
+    assert gmail_tools._send_with_retries(service, MESSAGE) == {"status": "sent", "message_id": "sent1", "attempts": 1, "error": ""}
+
+
+def test_rate_limits_are_retried_after_retry_after(no_waiting):
+    service = FlakySendGmail((_http_error(429, **{"retry-after": "7"}), False))
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result["status"] == "sent" and result["attempts"] == 2
+    assert len(service.sent) == 1 and 7 <= no_waiting[0] < 8
+
+
+def test_a_5xx_on_an_accepted_send_is_not_resent():
+    service = FlakySendGmail((_http_error(503), True))
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result == {"status": "sent", "message_id": "sent1", "attempts": 1, "error": ""}
+    assert len(service.sent) == 1
+
+
+def test_a_5xx_on_a_lost_send_is_resent_with_the_same_message_id():
+    service = FlakySendGmail((_http_error(503), False))
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result["status"] == "sent" and result["attempts"] == 2
+    assert len(service.sent) == 1 and len(set(service.attempts)) == 1
+
+
+def test_failed_lookup_reports_a_possible_send():
+    service = FlakySendGmail((_http_error(502), False), lookup_error=RuntimeError("offline"))
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result["status"] == "failed" and result["error"].startswith("may have been sent (lookup failed: offline)")
+
+
+def test_client_errors_fail_without_retrying(no_waiting):
+    service = FlakySendGmail((_http_error(400), False))
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result["status"] == "failed" and result["attempts"] == 1 and no_waiting == []
+
+
+def test_gives_up_after_max_attempts():
+    service = FlakySendGmail(*[(_http_error(429), False)] * gmail_tools.BULK_MAX_ATTEMPTS)
+    result = gmail_tools._send_with_retries(service, MESSAGE)
+    assert result["status"] == "failed" and result["attempts"] == gmail_tools.BULK_MAX_ATTEMPTS
+    assert service.sent == []
+
+
+def test_dry_run_previews_without_sending(monkeypatch):
+    monkeypatch.setattr(gmail_tools, "get_gmail_service", pytest.fail)
+    reply = gmail_tools.send_bulk_gmail.invoke({
+        "subject_template": "Hi {name}", "body_template": "Hello {name}",
+        "rows": [{"email": "ana@example.com", "name": "Ana"}, {"email": "bad", "name": "Bo"}], "dry_run": True,
+    })
+    assert reply.splitlines() == [
+        "Dry run: 1 of 2 rows ready to send.",
+        "First message, to ana@example.com:", "Subject: Hi Ana", "Hello Ana",
+        "Row 2 skipped: invalid address in column 'email': 'bad'",
+    ]
+
+
+def test_send_bulk_writes_a_report(workdir, monkeypatch):
+    monkeypatch.setattr(gmail_tools, "get_gmail_service", FlakySendGmail)
+    (workdir / "agent_working" / "people.csv").write_text("email,name\nana@example.com,Ana\nbo@example.com,Bo\nbad,Cy\n")
+    reply = gmail_tools.send_bulk_gmail.invoke({"subject_template": "Hi {name}", "body_template": "Hello", "csv_file": "people.csv"})
+    assert reply.startswith("Sent 2 of 3 emails in ") and "(0 failed, 1 skipped, 0 needed retries)" in reply
+    report = reply.splitlines()[0].split("Report: ")[1]
+    assert os.path.isfile(report)
+    assert reply.splitlines()[1] == "Row 3 bad: skipped: invalid address in column 'email': 'bad'"
@@ -0,0 +1,107 @@
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark_fakes import FakeGmail, Latency
+from gmail_mirror import GmailMirror, _translate
+
+
+@pytest.mark.parametrize("query", [
+    "label:Receipts",
+    "has:attachment",
+    "after:yesterday",
+    "-is:unread",
+    "(report OR invoice)",
+    "{report invoice}",
+    "report OR",
+    "OR report",
+    "is:unread OR report",
+])
+def test_translate_leaves_untranslatable_queries_to_the_api(query):
+    assert _translate(query) is None
+
+
+def test_translate_text_to_one_fts_match():
+    clauses, params = _translate('from:alice@example.com subject:"q3 plan" report OR invoice is:unread -draft')
+    assert "labels LIKE ?" in clauses
+    assert "doc IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)" in clauses
+    assert "doc NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)" in clauses
+    assert params == [
+        "% UNREAD %",
+        'sender : "alice example com" AND subject : "q3 plan" AND ("report" OR "invoice")',
+        '"draft"',
+    ]
+
+
+def test_translate_is_read_and_dates():
+    clauses, params = _translate("is:read after:2024/01/31 older_than:2d")
+    assert "labels NOT LIKE '% UNREAD %'" in clauses
+    assert "internal_date >= ?" in clauses and "internal_date < ?" in clauses
+    assert all(isinstance(p, int) for p in params)
+
+
+def test_empty_query_excludes_spam_and_trash():
+    clauses, params = _translate("")
+    assert clauses == ["labels NOT LIKE '% SPAM %'", "labels NOT LIKE '% TRASH %'"]
+    assert params == []
+
+
+@pytest.fixture
+def mirror(workdir):
+    return GmailMirror(path="agent_working/mirror.sqlite3", max_age=3600, initial_messages=100)
+
+
+def test_search_answers_from_a_complete_mirror(mirror):
+    service = FakeGmail(Latency(), messages=20)
+    results = mirror.search(service, "is:unread", max_results=3)
+    assert [r["id"] for r in results] == ["m00000", "m00003", "m00006"]
+    assert mirror.search(service, "from:sender1@example.com", max_results=5)[0]["id"] == "m00001"
+
+
+def _set_body(service, msg_id, subject, text):
+    payload = service.store[msg_id]["payload"]
+    payload["headers"] = [h for h in payload["headers"] if h["name"] != "Subject"] + [{"name": "Subject", "value": subject}]
+    payload["parts"] = [{"mimeType": "text/plain", "body": {"data": base64.urlsafe_b64encode(text.encode()).decode()}}]
+
+
+def test_search_matches_whole_words_in_headers_and_bodies(mirror):
+    service = FakeGmail(Latency(), messages=20)
+    _set_body(service, "m00004", "Dinner on Friday", "Table for four at Café Luz.")
+    _set_body(service, "m00008", "Dinnerware sale", "Plates and bowls.")
+    _set_body(service, "m00009", "Plans", "Are we still on for dinner?")
+
+    def ids(query):
+        return [r["id"] for r in mirror.search(service, query, max_results=5)]
+
+    assert ids("subject:dinner") == ["m00004"]
+    assert ids("dinner") == ["m00004", "m00009"]
+    assert ids("cafe") == ["m00004"]  # diacritics are folded, as in Gmail
+    assert ids('"table for four"') == ["m00004"]
+    assert ids("bowls OR cafe") == ["m00004", "m00008"]
+    assert ids("dinner -friday") == ["m00009"]
+    # Messages without a text body (like the other fakes) are indexed by their snippet
+    assert ids("quarterly report") == ["m00000", "m00001", "m00002", "m00003", "m00005"]
+
+
+def test_search_falls_back_when_a_partial_mirror_has_too_few_matches(workdir):
+    mirror = GmailMirror(path="agent_working/mirror.sqlite3", max_age=3600, initial_messages=10)
+    service = FakeGmail(Latency(), messages=20)
+    assert len(mirror.search(service, "", max_results=5)) == 5
+    # Only 4 of the 10 mirrored messages are unread; older ones may match too
+    assert mirror.search(service, "is:unread", max_results=5) is None
+
+
+def test_incremental_sync_applies_history(mirror):
+    service = FakeGmail(Latency(), messages=5)
+    mirror.sync(service)
+    records = [
+        {"messagesDeleted": [{"message": {"id": "m00000"}}]},
+        {"labelsRemoved": [{"message": {"id": "m00003", "labelIds": ["INBOX"]}}]},
+    ]
+    response = SimpleNamespace(execute=lambda: {"history": records, "historyId": "2000"})
+    service.history = lambda: SimpleNamespace(list=lambda **kwargs: response)
+    mirror.sync(service, force=True)
+    assert mirror.search(service, "is:unread", max_results=5) == []
+    assert [r["id"] for r in mirror.search(service, "in:inbox", max_results=5)] == ["m00001", "m00002", "m00003", "m00004"]
+
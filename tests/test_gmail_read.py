@@ -0,0 +1,55 @@
+import pytest
+
+import gmail_tools
+from benchmark_fakes import FakeGmail, Latency
+
+
+class FlakyBatchGmail(FakeGmail):
+    """FakeGmail whose batched calls fail (as rate-limited) whenever `fails(message_id, batch_number)`."""
+
+    def __init__(self, fails, **kwargs):
+        super().__init__(Latency(), **kwargs)
+        self.fails = fails
+        self.batches = 0
+
+    def new_batch_http_request(self, callback=None):
+        self.batches += 1
+        number = self.batches
+
+        def flaky(request_id, response, exception):
+            if self.fails(request_id, number):
+                callback(request_id, None, RuntimeError("rateLimitExceeded"))
+            else:
+                callback(request_id, response, exception)
+
+        return super().new_batch_http_request(flaky)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(gmail_tools.time, "sleep", delays.append)
+    return delays
+
+
+def test_fetch_metadata_keeps_order_and_dedupes(sleeps):
+    service = FakeGmail(Latency(), messages=120)
+    ids = ["m00007", "m00003", "m00007", "m00110"]
+    result = gmail_tools.fetch_message_metadata(service, ids)
+    assert [m["id"] for m in result] == ["m00007", "m00003", "m00007", "m00110"]
+    assert sleeps == []
+
+
+def test_fetch_metadata_rebatches_failures_after_backoff(sleeps):
+    service = FlakyBatchGmail(lambda msg_id, batch: batch <= 2 and int(msg_id[1:]) % 2, messages=30)
+    ids = sorted(service.store)
+    result = gmail_tools.fetch_message_metadata(service, ids)
+    assert [m["id"] for m in result] == ids
+    assert len(sleeps) == 2
+
+
+def test_fetch_metadata_gives_up_after_retries(sleeps):
+    service = FlakyBatchGmail(lambda msg_id, batch: msg_id == "m00003", messages=8)
+    result = gmail_tools.fetch_message_metadata(service, sorted(service.store))
+    assert [m["id"] for m in result] == ["m00000", "m00001", "m00002", "m00004", "m00005", "m00006", "m00007"]
+    assert len(sleeps) == gmail_tools.GMAIL_BATCH_RETRIES
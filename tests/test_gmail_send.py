@@ -0,0 +1,95 @@
+import email
+import io
+from email import policy
+
+import pytest
+
+import gmail_tools
+from benchmark_fakes import FakeGmail, Latency
+
+
+class RecordingGmail(FakeGmail):
+    """FakeGmail that keeps the uploaded MIME bytes and upload settings of each send."""
+
+    def __init__(self):
+        super().__init__(Latency(), messages=0)
+        self.uploads = []
+
+    def _send(self, body, media_body=None):
+        self.uploads.append({
+            "mime": media_body.getbytes(0, media_body.size()),
+            "mimetype": media_body.mimetype(),
+            "resumable": media_body.resumable(),
+        })
+        return super()._send(body, media_body)
+
+
+def _parse(data: bytes):
+    return email.message_from_bytes(data, policy=policy.default)
+
+
+@pytest.fixture
+def attachment(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(bytes(range(256)) * 1000)
+    return path
+
+
+def test_write_mime_round_trips(attachment):
+    out = io.BytesIO()
+    gmail_tools.write_mime(out, "ana@example.com", "Grüße zum Bericht", "Hallo Ana,\nsiehe Anhang.", [str(attachment)],
+                           message_id="<fixed@example.com>")
+    message = _parse(out.getvalue())
+    assert message["To"] == "ana@example.com"
+    assert message["Subject"] == "Grüße zum Bericht"
+    assert message["Message-ID"] == "<fixed@example.com>"
+    assert message.get_content_type() == "multipart/mixed"
+    body, attached = message.iter_parts()
+    assert body.get_content() == "Hallo Ana,\nsiehe Anhang."
+    assert attached.get_filename() == "report.pdf" and attached.get_content_type() == "application/pdf"
+    assert attached.get_content() == attachment.read_bytes()
+
+
+def test_write_mime_generates_a_message_id():
+    out = io.BytesIO()
+    gmail_tools.write_mime(out, "ana@example.com", "Hi", "Body")
+    message = _parse(out.getvalue())
+    assert message["Message-ID"].startswith("<") and [p.get_content() for p in message.iter_parts()] == ["Body"]
+
+
+def test_base64_lines_stay_short(attachment):
+    out = io.BytesIO()
+    gmail_tools.write_mime(out, "ana@example.com", "Hi", "Body", [str(attachment)])
+    assert max(len(line) for line in out.getvalue().split(b"\r\n")) <= 78
+
+
+def test_send_message_uploads_rfc822(attachment, monkeypatch):
+    monkeypatch.setattr(gmail_tools, "MIME_SPOOL_BYTES", 1024)  # spool to a temp file
+    service = RecordingGmail()
+    result = gmail_tools.send_message(service, "ana@example.com", "Report", "See attached.", [str(attachment)])
+    assert result["id"] == "sent1"
+    upload, = service.uploads
+    assert upload["mimetype"] == "message/rfc822" and not upload["resumable"]
+    assert list(_parse(upload["mime"]).iter_attachments())[0].get_content() == attachment.read_bytes()
+
+
+def test_large_messages_upload_resumably(attachment, monkeypatch):
+    monkeypatch.setattr(gmail_tools, "GMAIL_RESUMABLE_THRESHOLD", 1024)
+    service = RecordingGmail()
+    gmail_tools.send_message(service, "ana@example.com", "Report", "See attached.", [str(attachment)])
+    assert service.uploads[0]["resumable"]
+
+
+def test_oversized_messages_are_refused_before_upload(attachment, monkeypatch):
+    monkeypatch.setattr(gmail_tools, "GMAIL_MAX_MESSAGE_BYTES", 100_000)
+    service = RecordingGmail()
+    with pytest.raises(ValueError, match="Gmail accepts at most"):
+        gmail_tools.send_message(service, "ana@example.com", "Report", "See attached.", [str(attachment)])
+    assert service.uploads == []
+
+
+def test_send_gmail_reports_failures(monkeypatch):
+    monkeypatch.setattr(gmail_tools, "get_gmail_service", RecordingGmail)
+    assert gmail_tools.send_gmail.invoke({"recipient": "ana@example.com", "subject": "Hi", "body": "Hello"}) == "Email sent! Message ID: sent1"
+    reply = gmail_tools.send_gmail.invoke({"recipient": "ana@example.com", "subject": "Hi", "body": "Hello", "attachments": ["/no/such/file"]})
+    assert reply.startswith("Failed to send email: ")
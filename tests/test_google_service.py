@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import get_google_service as google
+
+
+class FakeCredentials:
+    def __init__(self, expires_in: timedelta):
+        self.valid = True
+        self.expiry = datetime.utcnow() + expires_in
+        self.refresh_token = "refresh"
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(google, "_creds", None)
+    monkeypatch.setattr(google, "_services", {})
+    monkeypatch.setattr(google, "_local", threading.local())
+    monkeypatch.setattr(google, "_save_credentials", lambda creds: None)
+    monkeypatch.setattr(google, "_start_refresher", lambda: None)
+
+
+def test_needs_refresh_within_the_margin():
+    assert not google._needs_refresh(FakeCredentials(timedelta(hours=1)))
+    assert google._needs_refresh(FakeCredentials(google.REFRESH_MARGIN / 2))
+    assert google._needs_refresh(SimpleNamespace(valid=False, expiry=None))
+    assert not google._needs_refresh(SimpleNamespace(valid=True, expiry=None))
+
+
+def test_credentials_load_once_and_refresh_before_expiry(monkeypatch):
+    creds = FakeCredentials(timedelta(hours=1))
+    loads = []
+    monkeypatch.setattr(google, "_load_credentials", lambda scopes: loads.append(scopes) or creds)
+    assert google.get_google_credentials() is creds and google.get_google_credentials() is creds
+    assert loads == [google.GOOGLE_SCOPES] and creds.refreshes == 0
+
+    creds.expiry = datetime.utcnow() + google.REFRESH_MARGIN / 2
+    assert google.get_google_credentials() is creds
+    assert creds.refreshes == 1 and loads == [google.GOOGLE_SCOPES]
+
+
+def test_each_thread_gets_its_own_http(monkeypatch):
+    creds = FakeCredentials(timedelta(hours=1))
+    monkeypatch.setattr(google, "get_google_credentials", lambda: creds)
+    main_http = google._thread_http()
+    assert google._thread_http() is main_http and main_http.credentials is creds
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(google._thread_http).result() is not main_http
+
+    monkeypatch.setattr(google, "get_google_credentials", lambda: FakeCredentials(timedelta(hours=1)))
+    assert google._thread_http() is not main_http  # rebuilt for new credentials
+
+
+def test_clients_are_built_once_per_api(monkeypatch):
+    builds = []
+    monkeypatch.setattr(google, "_thread_http", lambda: None)
+    monkeypatch.setattr(google, "build", lambda api, version, **kwargs: builds.append(api) or object())
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        services = list(pool.map(lambda _: google.get_service("gmail", "v1"), range(16)))
+    assert len({id(s) for s in services}) == 1
+    google.get_service("calendar", "v3")
+    assert builds == ["gmail", "calendar"]
+
+
+def test_set_service_installs_and_drops_a_stand_in(monkeypatch):
+    monkeypatch.setattr(google, "_thread_http", lambda: None)
+    monkeypatch.setattr(google, "build", lambda api, version, **kwargs: "built")
+    stand_in = object()
+    google.set_service("drive", "v3", stand_in)
+    assert google.get_service("drive", "v3") is stand_in
+    google.set_service("drive", "v3", None)
+    assert google.get_service("drive", "v3") == "built"
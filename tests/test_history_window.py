@@ -0,0 +1,83 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from history_window import HistoryWindow
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def transcript(*contents):
+    roles = ("user", "assistant")
+    return [{"role": roles[i % 2], "content": text} for i, text in enumerate(contents)]
+
+
+def test_short_history_is_kept_verbatim():
+    window = HistoryWindow(count_words, token_budget=100)
+    history = window.build(transcript("hello there", "hi", "how are you", "fine"))
+    assert [type(m) for m in history] == [HumanMessage, AIMessage, HumanMessage, AIMessage]
+    assert [m.content for m in history] == ["hello there", "hi", "how are you", "fine"]
+
+
+def test_older_messages_are_condensed_into_a_digest():
+    window = HistoryWindow(count_words, token_budget=20, digest_share=0.5)
+    messages = transcript("one " * 6, "two " * 6, "three " * 4, "four " * 4)
+    history = window.build(messages)
+    assert [m.content for m in history[1:]] == ["three " * 4, "four " * 4]
+    digest = history[0]
+    assert isinstance(digest, SystemMessage)
+    # The digest gets the budget the verbatim part leaves (12): room for one 7-token line
+    assert digest.content == "Condensed earlier conversation (1 older messages omitted):\nAssistant: two two two two two two"
+
+
+def test_window_starts_on_a_user_turn():
+    window = HistoryWindow(count_words, token_budget=8, digest_share=0.0)
+    history = window.build(transcript("a b c d", "e f g", "h", "i j"))
+    # "e f g" fits the budget but would open the window on an assistant message
+    assert [m.content for m in history[1:]] == ["h", "i j"]
+    assert "Assistant: e f g" in history[0].content
+
+
+def test_digest_drops_the_oldest_lines_beyond_its_share():
+    window = HistoryWindow(count_words, token_budget=20, digest_share=0.5, digest_chars=20)
+    messages = transcript(*[f"message {i} " + "x " * 8 for i in range(6)]) + transcript("now", "ok")
+    digest = window.build(messages)[0].content
+    assert "older messages omitted" in digest
+    assert "message 5" in digest and "message 0" not in digest
+
+
+def test_token_counts_are_cached_per_message():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return count_words(text)
+
+    window = HistoryWindow(count, token_budget=100)
+    messages = transcript("hello there", "hi")
+    window.build(messages)
+    window.build(messages)
+    assert counted == ["hi", "hello there"]
+    messages[0]["content"] = "edited message"
+    window.build(messages)
+    assert counted[-1] == "edited message"
+
+
+def test_digest_lines_are_cached_per_message():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return count_words(text)
+
+    window = HistoryWindow(count, token_budget=20, digest_share=0.5)
+    messages = transcript("one " * 6, "two " * 6, "three " * 4, "four " * 4)
+    first = window.build(messages)
+    calls = len(counted)
+    assert window.build(messages) == first and len(counted) == calls
+
+
+def test_other_roles_are_ignored():
+    window = HistoryWindow(count_words, token_budget=100)
+    history = window.build([{"role": "system", "content": "x"}] + transcript("hi", "hello"))
+    assert [m.content for m in history] == ["hi", "hello"]
@@ -0,0 +1,41 @@
+import os
+
+from image_cache import IMAGE_EXTENSIONS, ImageCache, extension_for
+
+
+def test_key_depends_on_model_and_prompt():
+    assert ImageCache.key("m1", "a cat") == ImageCache.key("m1", "a cat")
+    assert ImageCache.key("m1", "a cat") != ImageCache.key("m2", "a cat")
+
+
+def test_put_get_and_materialize(workdir):
+    cache = ImageCache(directory="agent_working/cache", max_bytes=10_000)
+    key = ImageCache.key("model", "a cat")
+    assert cache.get(key) is None
+    path = cache.put(key, b"jpeg bytes", "image/jpeg")
+    assert path.endswith(".jpg")
+    assert cache.get(key) == path
+
+    ImageCache.materialize(path, "agent_working/out/cat.jpg")
+    with open("agent_working/out/cat.jpg", "rb") as f:
+        assert f.read() == b"jpeg bytes"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used_over_budget(workdir):
+    cache = ImageCache(directory="agent_working/cache", max_bytes=250)
+    paths = {}
+    for i, name in enumerate("abc"):
+        paths[name] = cache.put(name, b"x" * 100)
+        os.utime(paths[name], (1000 + i, 1000 + i))
+    assert not os.path.exists(paths["a"])
+
+    os.utime(paths["b"], (2000, 2000))  # b used more recently than c
+    paths["d"] = cache.put("d", b"x" * 100)
+    assert os.path.exists(paths["b"]) and os.path.exists(paths["d"])
+    assert not os.path.exists(paths["c"])
+
+
+def test_extension_for_mime_types():
+    assert [extension_for(m) for m in ("image/png", "IMAGE/JPEG", "image/webp", "image/gif", None)] == [".png", ".jpg", ".webp", ".gif", ".png"]
+    assert {".png", ".jpg", ".jpeg", ".webp", ".gif"} == set(IMAGE_EXTENSIONS)
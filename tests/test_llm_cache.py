@@ -0,0 +1,74 @@
+import pytest
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+
+import llm_cache
+from llm_cache import TTLSQLiteCache
+
+
+def _prompt(*messages) -> str:
+    return dumps(list(messages))
+
+
+def _generation(content="hi", tool_calls=None):
+    usage = {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+    return ChatGeneration(message=AIMessage(content=content, tool_calls=tool_calls or [], usage_metadata=usage))
+
+
+@pytest.fixture
+def cache(workdir):
+    return TTLSQLiteCache(path="agent_working/llm.sqlite3", ttl=60, max_entries=3, side_effect_tools={"send_gmail"})
+
+
+def test_round_trip_replays_without_usage(cache):
+    prompt = _prompt(HumanMessage(content="hello"))
+    assert cache.lookup(prompt, "model-a") is None
+    cache.update(prompt, "model-a", [_generation("hi there")])
+    [generation] = cache.lookup(prompt, "model-a")
+    assert generation.message.content == "hi there"
+    assert generation.message.usage_metadata is None
+    assert cache.lookup(prompt, "model-b") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_key_ignores_per_run_message_metadata(cache):
+    first = _prompt(HumanMessage(content="q"), AIMessage(content="a", id="run-1", usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2}))
+    second = _prompt(HumanMessage(content="q"), AIMessage(content="a", id="run-2"))
+    cache.update(first, "m", [_generation()])
+    assert cache.lookup(second, "m") is not None
+
+
+def test_side_effecting_responses_are_not_stored(cache, workdir):
+    prompt = _prompt(HumanMessage(content="email bob"))
+    call = {"name": "send_gmail", "args": {"recipient": "bob@example.com"}, "id": "1", "type": "tool_call"}
+    cache.update(prompt, "m", [_generation("", [call])])
+    assert cache.lookup(prompt, "m") is None
+
+    permissive = TTLSQLiteCache(path="agent_working/other.sqlite3", side_effect_tools={"send_gmail"}, cache_side_effects=True)
+    permissive.update(prompt, "m", [_generation("", [call])])
+    assert permissive.lookup(prompt, "m") is not None
+
+
+def test_entries_expire(cache, monkeypatch):
+    prompt = _prompt(HumanMessage(content="hello"))
+    cache.update(prompt, "m", [_generation()])
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+    assert cache.lookup(prompt, "m") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: clock[0])
+    prompts = [_prompt(HumanMessage(content=f"q{i}")) for i in range(4)]
+    for prompt in prompts[:3]:
+        clock[0] += 1
+        cache.update(prompt, "m", [_generation()])
+    clock[0] += 1
+    cache.lookup(prompts[0], "m")  # q0 is now the most recently used
+    clock[0] += 1
+    cache.update(prompts[3], "m", [_generation()])
+    assert cache.lookup(prompts[1], "m") is None
+    assert all(cache.lookup(p, "m") is not None for p in (prompts[0], prompts[2], prompts[3]))
+    assert cache.stats()["entries"] == 3
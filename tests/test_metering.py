@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from metering import MODEL_PRICES, SessionUsage, UsageMeter, get_cost
+
+
+def test_get_cost_uses_the_longest_matching_price():
+    assert get_cost(1_000_000, 0, "gemini-2.5-flash-lite") == pytest.approx(MODEL_PRICES["gemini-2.5-flash-lite"][0])
+    assert get_cost(0, 1_000_000, "models/gemini-2.5-flash-001") == pytest.approx(MODEL_PRICES["gemini-2.5-flash"][1])
+    assert get_cost(1_000_000, 1_000_000, "unknown") == pytest.approx(sum(MODEL_PRICES["gemini-2.5-pro"]))
+
+
+def _chat_result(input_tokens, output_tokens):
+    usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+    return LLMResult(generations=[[ChatGeneration(message=AIMessage(content="x", usage_metadata=usage))]])
+
+
+def test_meter_records_llm_and_tool_calls():
+    meter = UsageMeter()
+    llm_run, tool_run, failed_run = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    meter.on_chat_model_start({}, [[]], run_id=llm_run, metadata={"ls_model_name": "gemini-2.5-flash"})
+    meter.on_tool_start({"name": "read_gmail"}, "", run_id=tool_run)
+    meter.on_tool_end("ok", run_id=tool_run)
+    meter.on_llm_end(_chat_result(1000, 200), run_id=llm_run)
+    meter.on_tool_start({"name": "read_gmail"}, "", run_id=failed_run)
+    meter.on_tool_error(RuntimeError("x"), run_id=failed_run)
+    turn = meter.finish()
+
+    assert (turn.llm_calls, turn.input_tokens, turn.output_tokens) == (1, 1000, 200)
+    assert turn.cost == pytest.approx(get_cost(1000, 200, "gemini-2.5-flash"))
+    assert turn.by_tool()["read_gmail"]["calls"] == 2
+    assert turn.by_tool()["read_gmail"]["errors"] == 1
+    assert turn.wall_seconds > 0
+
+
+def test_meter_falls_back_to_llm_output_token_usage():
+    meter = UsageMeter()
+    run = uuid.uuid4()
+    meter.on_llm_start({"name": "openrouter"}, ["hi"], run_id=run)
+    meter.on_llm_end(LLMResult(generations=[[]], llm_output={"token_usage": {"prompt_tokens": 7, "completion_tokens": 3}}), run_id=run)
+    assert (meter.turn.input_tokens, meter.turn.output_tokens) == (7, 3)
+
+
+def test_end_without_start_is_ignored():
+    meter = UsageMeter()
+    meter.on_llm_end(_chat_result(5, 5), run_id=uuid.uuid4())
+    meter.on_tool_end("ok", run_id=uuid.uuid4())
+    assert meter.finish().calls == []
+
+
+def test_session_usage_sums_turns():
+    session = SessionUsage()
+    for tokens in (100, 50):
+        meter = UsageMeter()
+        run = uuid.uuid4()
+        meter.on_chat_model_start({}, [[]], run_id=run)
+        meter.on_llm_end(_chat_result(tokens, 10), run_id=run)
+        session.add(meter.finish())
+    assert (session.input_tokens, session.output_tokens) == (150, 20)
+    assert session.to_dict()["turns"] == 2
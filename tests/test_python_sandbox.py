@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+import python_sandbox
+from python_sandbox import SandboxedPythonTool, WorkerPool, sanitize_input
+
+
+@pytest.fixture
+def pool(workdir):
+    pool = WorkerPool(size=0, max_workers=2, timeout=20, cwd="agent_working")
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.parametrize("query, code", [
+    ("```python\nprint(1)\n```", "print(1)"),
+    ("  Python print(2)  ", "print(2)"),
+    ("print('python')", "print('python')"),
+])
+def test_sanitize_input(query, code):
+    assert sanitize_input(query) == code
+
+
+def test_variables_persist_per_session(pool):
+    assert pool.run("x = 41", "a") == ""
+    assert pool.run("print(x + 1)", "a").strip() == "42"
+    assert "NameError" in pool.run("print(x)", "b")
+
+
+def test_code_runs_in_agent_working(pool, workdir):
+    pool.run("open('out.txt', 'w').write('hi')", "a")
+    assert (workdir / "agent_working" / "out.txt").read_text() == "hi"
+
+
+def test_timeout_kills_the_worker_and_resets_the_session(workdir):
+    pool = WorkerPool(size=0, timeout=1, cwd="agent_working")
+    try:
+        pool.run("y = 1", "a")
+        result = pool.run("import time; time.sleep(30)", "a")
+        assert result.startswith("[Python Error] Execution stopped: timed out")
+        assert "NameError" in pool.run("print(y)", "a")
+    finally:
+        pool.shutdown()
+
+
+def test_least_recently_used_session_is_retired(pool):
+    for session in ("a", "b", "c"):
+        pool.run(f"name = {session!r}", session)
+    assert pool.stats()["sessions"] == 2
+    assert "NameError" in pool.run("print(name)", "a")
+    pool.end_session("c")
+    assert pool.stats()["sessions"] == 1
+
+
+def _run_in_background(pool, code, session):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("output", pool.run(code, session)))
+    thread.start()
+    return thread, result
+
+
+def test_busy_workers_are_not_retired(workdir):
+    pool = WorkerPool(size=0, max_workers=1, timeout=20, cwd="agent_working")
+    try:
+        pool.run("pass", "a")  # started and imported, so the next call runs at once
+        thread, result = _run_in_background(pool, "import time; time.sleep(1); print('done')", "a")
+        while not pool._sessions["a"].lock.locked():
+            pass
+        assert pool.run("print('b')", "b").strip() == "b"  # waits for a's call instead of killing it
+        thread.join()
+        assert result["output"].strip() == "done"
+    finally:
+        pool.shutdown()
+
+
+def test_pool_busy_when_no_worker_frees_up(workdir):
+    pool = WorkerPool(size=0, max_workers=1, timeout=20, cwd="agent_working")
+    try:
+        pool.run("pass", "a")
+        thread, result = _run_in_background(pool, "import time; time.sleep(1); print('done')", "a")
+        while not pool._sessions["a"].lock.locked():
+            pass
+        pool.timeout = 0.1  # how long "b" waits for a free worker
+        assert pool.run("print('b')", "b").startswith("[Python Error] all 1 Python workers are busy")
+        thread.join()
+        assert result["output"].strip() == "done"
+    finally:
+        pool.shutdown()
+
+
+def test_tool_uses_the_current_session(pool):
+    tool = SandboxedPythonTool(pool=pool)
+    with python_sandbox.session("s1"):
+        tool.invoke({"query": "z = 'one'"})
+    with python_sandbox.session("s2"):
+        assert "NameError" in tool.invoke({"query": "print(z)"})
+    with python_sandbox.session("s1"):
+        assert tool.invoke({"query": "print(z)"}).strip() == "one"
@@ -0,0 +1,57 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import TokenBucket, backoff_delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.time() for the bucket."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate_per_sec=2, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert bucket.try_acquire() == 0
+    clock[0] += 100
+    assert [bucket.try_acquire() for _ in range(4)][-1] == pytest.approx(0.5)  # refills only up to capacity
+
+
+def test_bucket_state_file_is_shared(clock, tmp_path):
+    state = str(tmp_path / "bucket.json")
+    first = TokenBucket(rate_per_sec=1, capacity=2, state_file=state)
+    second = TokenBucket(rate_per_sec=1, capacity=2, state_file=state)
+    assert first.try_acquire() == 0
+    assert second.try_acquire() == 0
+    assert first.try_acquire() == pytest.approx(1.0)
+
+
+def test_acquire_sleeps_until_a_token_is_free(clock, monkeypatch):
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    bucket = TokenBucket(rate_per_sec=4, capacity=1)
+    bucket.acquire()
+    bucket.acquire()
+    assert slept == [pytest.approx(0.25)]
+
+
+def test_backoff_grows_and_is_capped():
+    for attempt in range(8):
+        delay = backoff_delay(attempt, base=1.0, cap=10.0)
+        assert 0 <= delay <= min(10.0, 2 ** attempt)
+
+
+def test_backoff_honors_retry_after():
+    delay = backoff_delay(0, base=0.5, retry_after=7)
+    assert 7 <= delay <= 7.5
+    assert backoff_delay(0, base=0.5, cap=3, retry_after=120) <= 3.5
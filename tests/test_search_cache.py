@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import search_cache
+from benchmark_fakes import FakeTavily, Latency
+from search_cache import CachedTavilySearch, SearchCache, normalize_query
+
+
+class CountingTavily(FakeTavily):
+    def __init__(self, seconds: float = 0.0, fail: bool = False):
+        super().__init__(Latency(tavily=seconds))
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def raw_results(self, query: str, **kwargs) -> dict:
+        with self._lock:
+            self.calls.append(query)
+        if self.fail:
+            raise ConnectionError("tavily down")
+        return super().raw_results(query, **kwargs)
+
+    async def raw_results_async(self, query: str, **kwargs) -> dict:
+        self.calls.append(query)
+        return await super().raw_results_async(query, **kwargs)
+
+
+def _search_tool(api, **kwargs):
+    tool = CachedTavilySearch(tavily_api_key="test", search_cache=SearchCache(ttl=60, max_entries=10), **kwargs)
+    object.__setattr__(tool, "api_wrapper", api)
+    return tool
+
+
+def test_normalize_query():
+    assert normalize_query("  Latest   PYTHON release ") == "latest python release"
+
+
+def test_claim_and_settle():
+    cache = SearchCache(ttl=60, max_entries=10)
+    state, future = cache.claim("k")
+    assert state == "lead"
+    assert cache.claim("k")[0] == "wait"
+    cache.settle("k", future, {"results": []})
+    assert cache.claim("k") == ("hit", {"results": []})
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 1, "entries": 1, "max_entries": 10}
+
+
+def test_errors_are_passed_to_waiters_but_not_cached():
+    cache = SearchCache(ttl=60, max_entries=10)
+    _, future = cache.claim("k")
+    _, waiting = cache.claim("k")
+    cache.settle("k", future, error=RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        waiting.result()
+    assert cache.claim("k")[0] == "lead"
+
+
+def test_entries_expire_and_lru_is_evicted(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(search_cache.time, "time", lambda: clock[0])
+    cache = SearchCache(ttl=10, max_entries=2)
+    for key in ("a", "b"):
+        cache.settle(key, cache.claim(key)[1], key)
+    cache.claim("a")  # a is now more recent than b
+    cache.settle("c", cache.claim("c")[1], "c")
+    assert [cache.claim(k)[0] for k in ("a", "c")] == ["hit", "hit"]
+    assert cache.claim("b")[0] == "lead"
+    clock[0] += 11
+    assert cache.claim("a")[0] == "lead"
+
+
+def test_concurrent_identical_searches_call_the_api_once():
+    api = CountingTavily(seconds=0.2)
+    tool = _search_tool(api)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda q: tool.invoke({"query": q}), ["Python release", "python  RELEASE"] * 3))
+    assert len(api.calls) == 1
+    assert all(r == results[0] for r in results)
+    assert tool.search_cache.stats()["coalesced"] + tool.search_cache.stats()["hits"] == 5
+
+
+def test_cached_results_are_copies():
+    tool = _search_tool(CountingTavily())
+    first = tool.invoke({"query": "q"})
+    first["results"].clear()
+    assert tool.invoke({"query": "q"})["results"]
+
+
+def test_different_parameters_are_cached_separately():
+    api = CountingTavily()
+    tool = _search_tool(api)
+    tool.invoke({"query": "q"})
+    tool.invoke({"query": "q", "topic": "news"})
+    assert len(api.calls) == 2
+
+
+def test_failed_searches_are_retried():
+    api = CountingTavily(fail=True)
+    tool = _search_tool(api)
+    for _ in range(2):
+        result = tool.invoke({"query": "q"})
+        assert "error" in result
+    assert len(api.calls) == 2
+
+
+def test_async_searches_share_the_cache():
+    api = CountingTavily(seconds=0.1)
+    tool = _search_tool(api)
+
+    async def run():
+        return await asyncio.gather(*(tool.ainvoke({"query": "q"}) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(api.calls) == 1 and results[0] == results[2]
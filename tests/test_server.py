@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from metering import TurnUsage
+
+
+@pytest.fixture
+def server(main, monkeypatch):
+    """The server module with the agent replaced by a turn that sleeps 0.1s and echoes."""
+    import server
+
+    async def fake_response(message, chat_history, session_usage, session_id):
+        await asyncio.sleep(0.1)
+        session_usage.add(TurnUsage())
+        return f"echo: {message}", 0, 0, 0.0
+
+    async def fake_stream(message, chat_history, session_usage, session_id):
+        await asyncio.sleep(0.1)
+        yield {"type": "token", "text": "echo"}
+        usage = TurnUsage()
+        session_usage.add(usage)
+        yield {"type": "final", "output": f"echo: {message}", "usage": usage}
+
+    monkeypatch.setattr(server, "aget_agent_response", fake_response)
+    monkeypatch.setattr(server, "astream_agent_response", fake_stream)
+    return server
+
+
+def test_turns_of_one_session_do_not_hold_run_slots(server):
+    async def scenario():
+        app = server.AgentServer(max_concurrent_runs=1, max_queued=10)
+        busy, other = app.create_session(), app.create_session()
+        finished = {}
+        started = time.perf_counter()
+
+        async def turn(session, name):
+            await app.run_turn(session, name)
+            finished[name] = time.perf_counter() - started
+
+        jobs = [asyncio.create_task(turn(busy, f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        jobs.append(asyncio.create_task(turn(other, "b")))
+        await asyncio.gather(*jobs)
+        return busy, finished
+
+    busy, finished = asyncio.run(scenario())
+    # b waits for one of the busy session's turns, not for all three
+    assert finished["b"] < finished["a2"]
+    assert [m["content"] for m in busy.messages if m["role"] == "user"] == ["a0", "a1", "a2"]
+
+
+def test_full_queue_is_refused_with_503(server):
+    async def scenario():
+        app = server.AgentServer(max_concurrent_runs=1, max_queued=0)
+        first = asyncio.create_task(app.run_turn(app.create_session(), "one"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(server.HttpError) as refused:
+            await app.run_turn(app.create_session(), "two")
+        await first
+        return refused.value, app
+
+    error, app = asyncio.run(scenario())
+    assert error.status == 503 and error.headers["Retry-After"]
+    assert app.metrics.rejected == 1 and app.metrics.turns == 1
+
+
+def test_turns_queued_on_one_session_count_toward_the_queue(server):
+    async def scenario():
+        app = server.AgentServer(max_concurrent_runs=8, max_queued=2)
+        session = app.create_session()
+        jobs = [asyncio.create_task(app.run_turn(session, f"m{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert app.health()["queued"] == 2
+        with pytest.raises(server.HttpError) as refused:
+            await app.run_turn(session, "one too many")
+        await asyncio.gather(*jobs)
+        return refused.value, app
+
+    error, app = asyncio.run(scenario())
+    assert error.status == 503 and app.metrics.rejected == 1 and app.metrics.turns == 3
+    assert app.health()["running"] == 0 and app.health()["queued"] == 0
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"" if body is None else json.dumps(body).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(body) if body else None
+
+
+def test_http_session_lifecycle(server):
+    async def scenario():
+        app = server.AgentServer()
+        listener = await asyncio.start_server(app.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            status, created = await _request(port, "POST", "/sessions")
+            session = f"/sessions/{created['session_id']}"
+            results = [
+                (status, created),
+                await _request(port, "POST", session + "/messages", {"message": "hello"}),
+                await _request(port, "POST", session + "/messages", {}),
+                await _request(port, "GET", session),
+                await _request(port, "DELETE", session),
+                await _request(port, "GET", session),
+            ]
+        finally:
+            listener.close()
+            await listener.wait_closed()
+        return results
+
+    created, reply, bad, info, deleted, gone = asyncio.run(scenario())
+    assert created[0] == 201
+    assert reply == (200, {"response": "echo: hello", "usage": TurnUsage().to_dict()})
+    assert bad[0] == 400
+    assert info[0] == 200 and info[1]["messages"] == 2
+    assert deleted == (204, None)
+    assert gone[0] == 404
+
+
+def test_streamed_turns_are_admitted_before_the_header(server):
+    async def scenario():
+        app = server.AgentServer(max_concurrent_runs=1, max_queued=0)
+        listener = await asyncio.start_server(app.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            first = asyncio.create_task(app.run_turn(app.create_session(), "busy"))
+            await asyncio.sleep(0.01)
+            refused = await _request(port, "POST", f"/sessions/{app.create_session().id}/messages?stream=1", {"message": "hi"})
+            await first
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            payload = json.dumps({"message": "hi"}).encode()
+            writer.write(
+                f"POST /sessions/{app.create_session().id}/messages?stream=1 HTTP/1.1\r\nHost: test\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+            )
+            streamed = await reader.read()
+            writer.close()
+        finally:
+            listener.close()
+            await listener.wait_closed()
+        return refused, streamed, app
+
+    refused, streamed, app = asyncio.run(scenario())
+    assert refused[0] == 503
+    assert streamed.startswith(b"HTTP/1.1 200 OK") and b'"type": "final"' in streamed and b"null" not in streamed
+    assert app.health()["running"] == 0 and app.metrics.turns == 2
@@ -0,0 +1,56 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+from langchain_core.tools import tool
+
+from tool_registry import LazyTool, ToolRegistry, ToolSpec
+
+
+@pytest.fixture
+def heavy_dep(tmp_path, monkeypatch):
+    """A module that records which thread imported it."""
+    (tmp_path / "heavy_dep_for_tests.py").write_text("import threading\nIMPORTED_BY = threading.current_thread()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "heavy_dep_for_tests"
+    sys.modules.pop("heavy_dep_for_tests", None)
+
+
+@tool
+def shout(text: str) -> str:
+    """Repeat the text in capitals."""
+    return text.upper()
+
+
+def test_lazy_tool_keeps_the_schema_and_imports_on_first_call(heavy_dep):
+    registry = ToolRegistry(specs=[])
+    lazy = LazyTool(shout, [heavy_dep], registry=registry)
+    assert (lazy.name, lazy.description, lazy.args_schema) == (shout.name, shout.description, shout.args_schema)
+    assert heavy_dep not in sys.modules
+    assert lazy.invoke({"text": "hi"}) == "HI"
+    assert heavy_dep in sys.modules and lazy.loaded
+    assert registry.report()["shout"]["first_use_import_seconds"] is not None
+
+
+def test_async_first_call_imports_off_the_event_loop(heavy_dep):
+    lazy = LazyTool(shout, [heavy_dep])
+
+    async def call():
+        return await lazy.ainvoke({"text": "hi"}), threading.current_thread()
+
+    result, loop_thread = asyncio.run(call())
+    assert result == "HI"
+    assert sys.modules[heavy_dep].IMPORTED_BY is not loop_thread
+
+
+def test_load_tools_registers_the_named_tools():
+    registry = ToolRegistry(specs=[
+        ToolSpec("file_tools", "read_from_file"),
+        ToolSpec("file_tools", "write_to_file"),
+    ])
+    tools = registry.load_tools(["write_to_file"])
+    assert [t.name for t in tools] == ["write_to_file"]
+    assert isinstance(tools[0], LazyTool)
+    assert list(registry.report()) == ["write_to_file"]
+    assert registry.report()["write_to_file"]["first_use_import_seconds"] is None
@@ -0,0 +1,73 @@
+import pytest
+from langchain_core.tools import StructuredTool
+
+from tool_router import TOOL_GROUPS, ToolRouter
+
+UNGROUPED = ("get_current_datetime", "tavily_search", "Python_REPL", "read_from_file")
+
+
+def _tool(name: str):
+    return StructuredTool.from_function(lambda text="": text, name=name, description=f"The {name} tool.")
+
+
+ALL_TOOLS = [_tool(name) for name in dict.fromkeys(
+    [name for tools, _ in TOOL_GROUPS.values() for name in tools] + list(UNGROUPED)
+)]
+
+
+@pytest.fixture
+def router():
+    return ToolRouter(count_tokens=lambda text: len(text) // 4)
+
+
+def _names(decision):
+    return {t.name for t in decision.tools}
+
+
+def test_matching_groups_plus_ungrouped_tools(router):
+    decision = router.route("Any unread emails from Alice?", ALL_TOOLS)
+    assert decision.groups == ["gmail"] and not decision.fallback
+    assert _names(decision) == {"send_gmail", "read_gmail", "send_bulk_gmail", *UNGROUPED}
+    assert 0 < decision.schema_tokens < decision.full_schema_tokens
+
+
+def test_several_groups(router):
+    decision = router.route("Schedule a meeting tomorrow and email the agenda", ALL_TOOLS)
+    assert decision.groups == ["gmail", "calendar"]
+    assert "update_calendar_event" in _names(decision) and "upload_drive_file" not in _names(decision)
+
+
+def test_no_match_falls_back_to_the_core_tools(router):
+    decision = router.route("What's the capital of Peru?", ALL_TOOLS)
+    assert decision.fallback and decision.saved_tokens > 0
+    assert _names(decision) == set(UNGROUPED)
+
+
+@pytest.mark.parametrize("text", [
+    "Send me a short summary of this file",
+    "What's the weather tomorrow in Lima?",
+    "Write a report on the data in sales.csv",
+    "How long is the drive to Cusco?",
+    "I look forward to your reply",
+    "Is the new iPhone available yet?",
+])
+def test_generic_requests_get_only_the_core_tools(router, text):
+    assert router.route(text, ALL_TOOLS).groups == []
+
+
+def test_follow_ups_keep_the_previous_request_tools(router):
+    decision = router.route("Yes, do it", ALL_TOOLS, previous="Draft a slide deck about Q3")
+    assert decision.groups == ["documents"]
+    assert "generate_image_from_prompt" in _names(decision)
+
+
+def test_words_match_whole_words_only(router):
+    assert router.route("Summarize this sentence", ALL_TOOLS).fallback  # "sent" inside a word
+
+
+def test_stats(router):
+    router.route("Check my inbox", ALL_TOOLS)
+    router.route("Hello", ALL_TOOLS)
+    stats = router.stats.to_dict()
+    assert stats["requests"] == 2 and stats["fallbacks"] == 1 and stats["by_group"] == {"gmail": 1}
+    assert stats["saved_schema_tokens"] > 0
@@ -0,0 +1,78 @@
+import time
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+
+import tracing
+from agent_runtime import AgentRuntime
+from benchmark_fakes import ScriptedChatModel
+
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Test agent."),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
+
+
+@tool
+def fetch(key: str) -> str:
+    """Fetch a value."""
+    with tracing.span("backend.get", kind="http", key=key) as s:
+        time.sleep(0.01)
+        s.set(status=200)
+    tracing.annotate(cache="miss")
+    return f"value of {key}"
+
+
+def _traced_turn(tmp_path):
+    scripts = {"Fetch a and b.": [[("fetch", {"key": "a"}), ("fetch", {"key": "b"})], "Done."]}
+    runtime = AgentRuntime(ScriptedChatModel(scripts=scripts), [fetch], PROMPT, verbose=False)
+    tracer = tracing.Tracer("Fetch a and b.", "session-1", trace_dir=str(tmp_path))
+    runtime.run(runtime.get_executor().ainvoke({"input": "Fetch a and b."}, config={"callbacks": [tracer]}))
+    path = tracer.finish(output_chars=5)
+    return tracing.load([path])[tracer.trace_id]
+
+
+def test_spans_nest_from_turn_to_tool_internals(tmp_path):
+    spans = _traced_turn(tmp_path)
+    by_id = {s["span_id"]: s for s in spans}
+    parent = lambda s: by_id.get(s["parent_id"])
+
+    root = next(s for s in spans if s["parent_id"] is None)
+    assert root["kind"] == "turn" and root["attrs"]["session_id"] == "session-1" and root["attrs"]["output_chars"] == 5
+    tools = [s for s in spans if s["kind"] == "tool"]
+    assert [t["name"] for t in tools] == ["fetch", "fetch"]
+    assert all(t["attrs"]["cache"] == "miss" and parent(t)["kind"] == "agent" for t in tools)
+    http = [s for s in spans if s["kind"] == "http"]
+    assert sorted(parent(s)["span_id"] for s in http) == sorted(t["span_id"] for t in tools)
+    assert {s["attrs"]["key"] for s in http} == {"a", "b"} and all(s["attrs"]["status"] == 200 for s in http)
+    assert [s["name"] for s in spans if s["kind"] == "step"] == ["step 1", "step 2"]
+    assert all(s["error"] is None for s in spans)
+
+
+def test_render_and_summary(tmp_path):
+    spans = _traced_turn(tmp_path)
+    timeline = tracing.render(spans)
+    assert timeline.startswith("trace ") and "tool:fetch" in timeline and "critical path:" in timeline
+    summary = tracing.summarize({"t": spans})
+    assert summary.splitlines()[0] == "1 traces" and "backend.get" in summary
+
+
+def test_span_is_a_no_op_outside_a_traced_turn():
+    with tracing.span("untraced") as s:
+        s.set(anything=1)
+    tracing.annotate(ignored=True)
+
+
+def test_critical_path_follows_the_last_finishing_children():
+    def span(span_id, parent, start, duration):
+        return {"span_id": span_id, "parent_id": parent, "start": start, "duration": duration}
+
+    spans = [
+        span("root", None, 0.0, 3.0),
+        span("fast", "root", 0.0, 0.5),
+        span("slow", "root", 0.0, 2.0),
+        span("final", "root", 2.0, 1.0),
+        span("inner", "slow", 0.5, 1.5),
+    ]
+    assert tracing.critical_path(spans) == {"root", "final", "slow", "inner"}
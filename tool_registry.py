@@ -0,0 +1,143 @@
+"""
+Registry of the agent's workspace tools, with their heavy libraries loaded on first use.
+
+Tool modules only define pydantic schemas and thin functions at import time, so
+registering a tool is cheap. The libraries a tool really needs are imported the first
+time the agent calls it. Of those, google-genai, python-pptx, python-docx and the OAuth
+flow are never loaded in sessions that don't use them. The Google API client and Pillow
+are listed too, but langchain_google_genai (the agent's model) already imports both at
+startup, so deferring them saves nothing today. `report()` shows what each tool cost to
+register and to load.
+"""
+import asyncio
+import importlib
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langchain_core.tools.base import _get_runnable_config_param
+import tracing
+
+GOOGLE_API = ("get_google_service", "googleapiclient.discovery", "google_auth_oauthlib.flow")
+GEMINI = ("google.genai", "google.genai.types")
+IMAGES = GEMINI + ("PIL.Image",)
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    module: str
+    name: str
+    deps: Tuple[str, ...] = ()  # imported on the tool's first call
+
+
+TOOL_SPECS = [
+    ToolSpec("gmail_tools", "send_gmail", GOOGLE_API + ("googleapiclient.http",)),
+    ToolSpec("gmail_tools", "read_gmail", GOOGLE_API),
+    ToolSpec("gmail_tools", "send_bulk_gmail", GOOGLE_API + ("googleapiclient.http",)),
+    ToolSpec("calender_tools", "create_calendar_event", GOOGLE_API),
+    ToolSpec("calender_tools", "list_calendar_events", GOOGLE_API),
+    ToolSpec("calender_tools", "delete_calendar_event", GOOGLE_API),
+    ToolSpec("calender_tools", "update_calendar_event", GOOGLE_API),
+    ToolSpec("calender_tools", "schedule_google_meet_event", GOOGLE_API),
+    ToolSpec("gdrive_tools", "upload_drive_file", GOOGLE_API + ("googleapiclient.http",)),
+    ToolSpec("gdrive_tools", "download_drive_file", GOOGLE_API + ("googleapiclient.http",)),
+    ToolSpec("gdrive_tools", "list_drive_files", GOOGLE_API),
+    ToolSpec("image_generation_tools", "generate_image_from_prompt", IMAGES),
+    ToolSpec("document_tools", "create_pptx_presentation", IMAGES + ("pptx",)),
+    ToolSpec("document_tools", "create_docx_document", IMAGES + ("docx",)),
+]
+
+
+class LazyTool(BaseTool):
+    """
+    Presents a registered tool's name, description and schema to the model and imports
+    the tool's dependencies before its first call, then delegates to the real tool.
+    """
+
+    tool: BaseTool
+    deps: Tuple[str, ...] = ()
+    registry: Any = None
+    loaded: bool = False
+
+    def __init__(self, tool: BaseTool, deps=(), registry=None, **kwargs: Any):
+        super().__init__(
+            tool=tool,
+            deps=tuple(deps),
+            registry=registry,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            **kwargs,
+        )
+
+    def load(self):
+        if not self.loaded:
+            with tracing.span("import dependencies", kind="import", modules=list(self.deps)):
+                if self.registry is not None:
+                    self.registry.import_deps(self.name, self.deps)
+                else:
+                    for dep in self.deps:
+                        importlib.import_module(dep)
+            self.loaded = True
+
+    @staticmethod
+    def _forward(method, args, config, run_manager, kwargs):
+        config_param = _get_runnable_config_param(method)
+        if config_param:
+            kwargs = kwargs | {config_param: config or {}}
+        return method(*args, run_manager=run_manager, **kwargs)
+
+    def _run(self, *args: Any, config: RunnableConfig = None, run_manager=None, **kwargs: Any) -> Any:
+        self.load()
+        return self._forward(self.tool._run, args, config, run_manager, kwargs)
+
+    async def _arun(self, *args: Any, config: RunnableConfig = None, run_manager=None, **kwargs: Any) -> Any:
+        if not self.loaded:
+            # First-call imports take hundreds of ms; keep them off the event loop other sessions share
+            await asyncio.to_thread(self.load)
+        return await self._forward(self.tool._arun, args, config, run_manager, kwargs)
+
+
+class ToolRegistry:
+    def __init__(self, specs: List[ToolSpec] = TOOL_SPECS):
+        self.specs = list(specs)
+        self.timings: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def load_tools(self, names: Optional[List[str]] = None) -> List[BaseTool]:
+        """Import the tool modules (cheap) and wrap each tool so its dependencies load on first call."""
+        tools = []
+        for spec in self.specs:
+            if names is not None and spec.name not in names:
+                continue
+            started = time.perf_counter()
+            module = importlib.import_module(spec.module)
+            self.timings[spec.name] = {
+                "module": spec.module,
+                "register_seconds": time.perf_counter() - started,
+                "first_use_import_seconds": None,
+            }
+            tools.append(LazyTool(getattr(module, spec.name), spec.deps, registry=self))
+        return tools
+
+    def import_deps(self, name: str, deps: Tuple[str, ...]):
+        # Serialized, so concurrent first calls don't race on half-imported modules
+        with self._lock:
+            started = time.perf_counter()
+            for dep in deps:
+                if dep not in sys.modules:
+                    importlib.import_module(dep)
+            timing = self.timings.setdefault(name, {"module": None, "register_seconds": 0.0})
+            if timing.get("first_use_import_seconds") is None:
+                timing["first_use_import_seconds"] = time.perf_counter() - started
+
+    def report(self) -> Dict[str, dict]:
+        """Per tool: time to register it, and time spent importing its dependencies on first call (None if never called)."""
+        return {name: dict(timing) for name, timing in self.timings.items()}
+
+
+registry = ToolRegistry()
@@ -0,0 +1,117 @@
+"""
+Per-request tool routing: bind only the tools a request plausibly needs.
+
+Every tool schema bound to the model is resent on every LLM call of a turn. The router
+matches the request (and the previous user message, for follow-ups) against keyword
+groups and binds the matching groups plus the core tools outside the groups (date/time,
+web search, Python, file access). The keywords name the service or the artifact, not
+generic verbs like "send" or "file", and a request that matches no group gets only the
+core tools. Set TOOL_ROUTING=0 to always bind everything.
+"""
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+TOOL_GROUPS = {
+    "gmail": (
+        ("send_gmail", "read_gmail", "send_bulk_gmail"),
+        r"e-?mails?|e-?mailed|g?mail|inbox|unread|recipients?|newsletters?|"
+        r"mail[- ]?merge|mailing list",
+    ),
+    "calendar": (
+        ("create_calendar_event", "list_calendar_events", "delete_calendar_event", "update_calendar_event",
+         "schedule_google_meet_event"),
+        r"calendar|events?|meetings?|google meet|schedul\w*|reschedul\w*|appointments?|agenda|reminders?|"
+        r"invites?|invitations?|availability",
+    ),
+    "drive": (
+        ("upload_drive_file", "download_drive_file", "list_drive_files"),
+        r"google drive|gdrive|my drive|drive (?:files?|folders?)|upload\w*|download\w*",
+    ),
+    "images": (
+        ("generate_image_from_prompt",),
+        r"images?|pictures?|photos?|draw|drawing|illustrations?|illustrate|logo|artwork|sketch|wallpaper",
+    ),
+    "documents": (
+        ("create_pptx_presentation", "create_docx_document", "generate_image_from_prompt"),
+        r"pptx?|powerpoint|presentations?|slides?|slide deck|deck|docx?|word document|documents?|brochure|handout",
+    ),
+}
+
+
+@dataclass
+class RoutingDecision:
+    tools: List
+    groups: List[str]
+    fallback: bool
+    schema_tokens: int
+    full_schema_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_schema_tokens - self.schema_tokens
+
+
+@dataclass
+class RouterStats:
+    requests: int = 0
+    fallbacks: int = 0
+    saved_tokens: int = 0
+    by_group: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "fallbacks": self.fallbacks, "saved_schema_tokens": self.saved_tokens,
+                "by_group": dict(self.by_group)}
+
+
+def enabled() -> bool:
+    return os.getenv("TOOL_ROUTING", "1").lower() not in ("0", "false", "no")
+
+
+class ToolRouter:
+    def __init__(self, count_tokens: Callable[[str], int], groups: Dict[str, tuple] = TOOL_GROUPS):
+        self._count_tokens = count_tokens
+        self.groups = {name: (set(tools), re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)) for name, (tools, pattern) in groups.items()}
+        self._schema_tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = RouterStats()
+
+    def schema_tokens(self, tool) -> int:
+        """Tokens of the tool's schema as sent to the model (counted once per tool)."""
+        tokens = self._schema_tokens.get(tool.name)
+        if tokens is None:
+            tokens = self._count_tokens(json.dumps(convert_to_openai_tool(tool)))
+            self._schema_tokens[tool.name] = tokens
+        return tokens
+
+    def route(self, text: str, tools: Sequence, previous: Optional[str] = None) -> RoutingDecision:
+        """Pick the tools for a request; `previous` is the last user message, so follow-ups keep their tools."""
+        haystack = f"{previous or ''}\n{text}"
+        groups = [name for name, (_, pattern) in self.groups.items() if pattern.search(haystack)]
+        grouped = set().union(*(names for names, _ in self.groups.values()))
+        wanted = set().union(*(self.groups[name][0] for name in groups))
+        # With no group matched, this is just the core tools; Python can cover the rest
+        selected = [t for t in tools if t.name not in grouped or t.name in wanted]
+        fallback = not groups
+
+        full = sum(self.schema_tokens(t) for t in tools)
+        decision = RoutingDecision(
+            tools=selected, groups=groups, fallback=fallback,
+            schema_tokens=sum(self.schema_tokens(t) for t in selected), full_schema_tokens=full,
+        )
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.fallbacks += int(fallback)
+            self.stats.saved_tokens += decision.saved_tokens
+            for name in groups:
+                self.stats.by_group[name] = self.stats.by_group.get(name, 0) + 1
+        print(
+            f"[Tool Router] {'no group matched, using the core tools' if fallback else 'groups: ' + ', '.join(groups)} "
+            f"| {len(selected)}/{len(tools)} tools | schema {decision.schema_tokens}/{full} tokens "
+            f"(saves ~{decision.saved_tokens} per LLM call)"
+        )
+        return decision
@@ -0,0 +1,394 @@
+"""
+Structured tracing of agent turns: nested, timed spans written as JSON lines.
+
+`Tracer` is a LangChain callback handler, attached per turn next to the `UsageMeter`. It
+records a span for the turn, each agent step (one model decision), each LLM call and each
+tool call. Code running inside a tool adds its own child spans with `span(...)`: the
+Google API HTTP requests (get_google_service.py), Gemini image calls, and document saves.
+The parent is found through the tool's run config, so no tracer has to be passed around.
+
+Spans go to agent_working/traces/<date>.jsonl, one JSON object per line:
+    {"trace_id", "span_id", "parent_id", "name", "kind", "start", "duration", "attrs", "error"}
+`start` is seconds since the turn began. TRACING=0 turns tracing off.
+
+    python tracing.py                 # timeline and critical path of the latest turn
+    python tracing.py --last 5        # the latest five turns
+    python tracing.py --trace <id>    # one turn
+    python tracing.py --summary       # time per kind/name across every turn in the file
+"""
+import argparse
+import contextlib
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+from metering import UsageMeter, _usage_from_result
+
+AGENT_DIR = "agent_working"
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(AGENT_DIR, "traces"))
+PREVIEW_CHARS = 200
+
+_active = contextvars.ContextVar("trace_span", default=None)  # (tracer, span) of the innermost manual span
+_write_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+
+
+def _size(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return len(str(value))
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "kind", "started", "ended", "attrs", "error")
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attrs: dict = None):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.ended = None
+        self.attrs = dict(attrs or {})
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, error=None):
+        if self.ended is None:
+            self.ended = time.perf_counter()
+            if error is not None:
+                self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+
+class _NoSpan:
+    """Stands in for a span when no turn is being traced."""
+
+    def set(self, **attrs):
+        pass
+
+
+class Tracer(BaseCallbackHandler):
+    """Records one turn's spans. Safe to use from the agent's tool threads."""
+
+    run_inline = True  # timings must not include a hop to the callback thread pool
+
+    def __init__(self, user_input: str = "", session_id: str = None, trace_dir: str = TRACE_DIR):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.trace_dir = trace_dir
+        self.began = time.time()
+        self.root = Span("turn", "turn", None, {
+            "input_chars": len(user_input), "input": user_input[:PREVIEW_CHARS], "session_id": session_id,
+        })
+        self.spans: List[Span] = [self.root]
+        self._runs: Dict[UUID, Span] = {}  # LangChain run id -> span
+        self._aliases: Dict[UUID, Optional[Span]] = {}  # untraced run id -> nearest traced ancestor
+        self._agent_run = None
+        self._steps = 0
+        self._lock = threading.Lock()
+
+    # --- span bookkeeping ---
+
+    def parent_for(self, run_id: Optional[UUID]) -> Span:
+        """The span a child of LangChain run `run_id` should hang under."""
+        with self._lock:
+            if run_id in self._runs:
+                return self._runs[run_id]
+            return self._aliases.get(run_id) or self.root
+
+    def start_span(self, name: str, kind: str, parent: Span = None, **attrs) -> Span:
+        span = Span(name, kind, (parent or self.root).span_id, attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attrs) -> Span:
+        span = self.start_span(name, kind, self.parent_for(parent_run_id), **attrs)
+        with self._lock:
+            self._runs[run_id] = span
+        return span
+
+    def _close(self, run_id: UUID, error=None, **attrs) -> Optional[Span]:
+        with self._lock:
+            span = self._runs.pop(run_id, None)
+        if span is not None:
+            span.set(**attrs)
+            span.end(error)
+        return span
+
+    # --- callbacks ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs: Any):
+        if parent_run_id is None and self._agent_run is None:
+            self._agent_run = run_id
+            self._open(run_id, None, kwargs.get("name") or "agent", "agent")
+        elif parent_run_id is not None and parent_run_id == self._agent_run:
+            self._steps += 1
+            self._open(run_id, parent_run_id, f"step {self._steps}", "step")
+        else:
+            # Prompt formatting, parsers and other plumbing: fold into the nearest traced span
+            parent = self.parent_for(parent_run_id)
+            with self._lock:
+                self._aliases[run_id] = parent
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        self._close(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs: Any):
+        flat = [m for batch in messages for m in batch]
+        self._open(
+            run_id, parent_run_id, UsageMeter._model_name(serialized, kwargs), "llm",
+            messages=len(flat), input_chars=sum(_size(m.content) for m in flat),
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._open(
+            run_id, parent_run_id, UsageMeter._model_name(serialized, kwargs), "llm",
+            input_chars=sum(len(p) for p in prompts),
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        input_tokens, output_tokens = _usage_from_result(response)
+        messages = [getattr(g, "message", None) for gens in response.generations for g in gens]
+        tool_calls = [c["name"] for m in messages for c in (getattr(m, "tool_calls", None) or [])]
+        self._close(
+            run_id, input_tokens=input_tokens, output_tokens=output_tokens,
+            output_chars=sum(_size(getattr(g, "text", "")) for gens in response.generations for g in gens),
+            **({"tool_calls": tool_calls} if tool_calls else {}),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._close(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._open(run_id, parent_run_id, name, "tool", input_chars=_size(input_str))
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._close(run_id, output_chars=_size(getattr(output, "content", output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._close(run_id, error)
+
+    # --- output ---
+
+    def records(self) -> List[dict]:
+        with self._lock:
+            spans = list(self.spans)
+        return [
+            {
+                "trace_id": self.trace_id,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "kind": s.kind,
+                "start": round(s.started - self.root.started, 6),
+                "duration": round((s.ended if s.ended is not None else s.started) - s.started, 6),
+                "attrs": s.attrs,
+                "error": s.error if s.ended is not None else "unfinished",
+            }
+            for s in spans
+        ]
+
+    def finish(self, error=None, **attrs) -> Optional[str]:
+        """End the turn and append its spans to today's trace file; returns the file path."""
+        self.root.set(began=datetime.fromtimestamp(self.began).isoformat(timespec="seconds"), **attrs)
+        self.root.end(error)
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            path = os.path.join(self.trace_dir, f"{datetime.fromtimestamp(self.began):%Y-%m-%d}.jsonl")
+            lines = "".join(json.dumps(r, default=str) + "\n" for r in self.records())
+            with _write_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            return path
+        except OSError as e:
+            print(f"[Tracing Error] Could not write trace {self.trace_id}: {e}")
+            return None
+
+
+def _current() -> tuple:
+    """(tracer, parent span) for code running now: the innermost manual span, else the calling tool's run."""
+    active = _active.get()
+    if active is not None:
+        return active
+    config = var_child_runnable_config.get() or {}
+    callbacks = config.get("callbacks")
+    for handler in getattr(callbacks, "handlers", None) or []:
+        if isinstance(handler, Tracer):
+            return handler, handler.parent_for(getattr(callbacks, "parent_run_id", None))
+    return None, None
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attrs):
+    """
+    Time the enclosed block as a child of the current span. A no-op outside a traced turn.
+
+        with tracing.span("gemini.generate_content", kind="http", model=model_id) as s:
+            resp = client.models.generate_content(...)
+            s.set(response_bytes=len(data))
+    """
+    tracer, parent = _current()
+    if tracer is None:
+        yield _NoSpan()
+        return
+    child = tracer.start_span(name, kind, parent, **attrs)
+    token = _active.set((tracer, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    finally:
+        _active.reset(token)
+        child.end()
+
+
+def annotate(**attrs):
+    """Add attributes to the current span (e.g. a cache hit inside a tool)."""
+    _, current = _current()
+    if current is not None:
+        current.set(**attrs)
+
+
+# --- Viewer ---
+
+def load(paths: List[str]) -> Dict[str, List[dict]]:
+    """Spans grouped by trace, in file order."""
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    traces[record["trace_id"]].append(record)
+    return dict(traces)
+
+
+def critical_path(spans: List[dict]) -> set:
+    """
+    Span ids on the critical path: starting from the root, walk back from its end through
+    the children that finished last, each bounded by the start of the one after it.
+    """
+    children = defaultdict(list)
+    for s in spans:
+        children[s["parent_id"]].append(s)
+    on_path = set()
+
+    def walk(node):
+        on_path.add(node["span_id"])
+        cursor = node["start"] + node["duration"]
+        for child in sorted(children[node["span_id"]], key=lambda c: c["start"] + c["duration"], reverse=True):
+            if child["start"] + child["duration"] <= cursor + 1e-6:
+                walk(child)
+                cursor = child["start"]
+
+    for root in children[None]:
+        walk(root)
+    return on_path
+
+
+def _describe(attrs: dict) -> str:
+    keys = ("input_tokens", "output_tokens", "tool_calls", "input_chars", "output_chars", "method", "status",
+            "request_bytes", "response_bytes", "bytes", "cache", "model")
+    return " ".join(f"{k}={attrs[k]}" for k in keys if attrs.get(k) not in (None, "", [], 0))
+
+
+def render(spans: List[dict]) -> str:
+    """An indented timeline of one trace; `*` marks the critical path."""
+    path = critical_path(spans)
+    children = defaultdict(list)
+    for s in spans:
+        children[s["parent_id"]].append(s)
+    root = next(s for s in spans if s["parent_id"] is None)
+    lines = [
+        f"trace {root['trace_id']}  {root['attrs'].get('began', '')}  {root['duration']:.2f}s  "
+        f"{root['attrs'].get('input', '')[:80]!r}",
+        f"{'':2}{'start':>8} {'took':>8}  span",
+    ]
+
+    def walk(node, depth):
+        mark = "*" if node["span_id"] in path else " "
+        error = f"  ERROR {node['error']}" if node["error"] else ""
+        lines.append(
+            f"{mark} {node['start']:7.2f}s {node['duration']:7.2f}s  {'  ' * depth}{node['kind']}:{node['name']}"
+            f"  {_describe(node['attrs'])}{error}".rstrip()
+        )
+        for child in sorted(children[node["span_id"]], key=lambda c: c["start"]):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+
+    # Where the critical path's time went, by the deepest span covering it (self time)
+    self_time = defaultdict(float)
+    for s in spans:
+        if s["span_id"] in path:
+            covered = sum(c["duration"] for c in children[s["span_id"]] if c["span_id"] in path)
+            self_time[s["kind"]] += max(s["duration"] - covered, 0.0)
+    total = root["duration"] or 1.0
+    lines.append("critical path: " + ", ".join(
+        f"{kind} {seconds:.2f}s ({seconds / total:.0%})" for kind, seconds in sorted(self_time.items(), key=lambda kv: -kv[1])
+    ))
+    return "\n".join(lines)
+
+
+def summarize(traces: Dict[str, List[dict]]) -> str:
+    """Totals per span kind and name over many traces."""
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0])
+    for spans in traces.values():
+        for s in spans:
+            entry = totals[(s["kind"], s["name"])]
+            entry[0] += 1
+            entry[1] += s["duration"]
+            entry[2] = max(entry[2], s["duration"])
+            entry[3] += int(bool(s["error"]))
+    lines = [f"{len(traces)} traces", f"{'kind':<9}{'name':<42}{'count':>6}{'total s':>10}{'mean s':>9}{'max s':>8}{'errors':>8}"]
+    for (kind, name), (count, seconds, longest, errors) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{kind:<9}{name[:41]:<42}{count:>6}{seconds:>10.2f}{seconds / count:>9.2f}{longest:>8.2f}{errors:>8}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show agent traces recorded under agent_working/traces.")
+    parser.add_argument("files", nargs="*", help=f"trace files (default: the newest in {TRACE_DIR})")
+    parser.add_argument("--trace", help="show only this trace id")
+    parser.add_argument("--last", type=int, default=1, help="show the latest N traces")
+    parser.add_argument("--summary", action="store_true", help="totals per span name instead of timelines")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(TRACE_DIR, "*.jsonl")))[-1:]
+    if not files:
+        print(f"No traces found in {TRACE_DIR}.")
+        return
+    traces = load(files)
+    if args.summary:
+        print(summarize(traces))
+        return
+    selected = [args.trace] if args.trace else list(traces)[-args.last:]
+    for trace_id in selected:
+        if trace_id not in traces:
+            print(f"Trace {trace_id} not found.")
+            continue
+        print(render(traces[trace_id]) + "\n")
+
+
+if __name__ == "__main__":
+    main()